@@ -1,14 +1,52 @@
-from fastapi import FastAPI
-from .routers import users, auth, orders
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from .routers import users, auth, orders, metrics
+from .utils.revocation_store import revocation_store
+from .utils.token_cache import token_cache
+from .utils.token_purge import token_purger
+from .utils.version_store import version_store
+from .utils.photo_variants import photo_variant_pipeline, photo_variant_backfill
+from .utils.storage import photo_storage
+from .middleware.body_limit import BodySizeLimitMiddleware
+from .middleware.compression import CompressionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e encerramento da aplicação"""
+    # Revogações feitas em qualquer worker limpam o cache de tokens deste processo
+    await revocation_store.subscribe(token_cache.invalidate_token_id)
+    # Limpeza periódica de tokens expirados/revogados em auth_tokens
+    token_purger.start()
+    # Variantes das fotos que ficaram sem (na inicialização e periodicamente)
+    photo_variant_backfill.start()
+    yield
+    await photo_variant_backfill.stop()
+    await token_purger.stop()
+    await revocation_store.close()
+    await version_store.close()
+    photo_variant_pipeline.shutdown()
+    await photo_storage.close()
+
 app = FastAPI(
     title="Sistema de Ordens de Serviço",
     description="API para gerenciamento de ordens de serviço",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Configuração do CORS
+# Middlewares: o último adicionado é o mais externo
+
+# Compressão brotli/gzip das respostas (JSON grandes; uploads ficam de fora)
+app.add_middleware(CompressionMiddleware)
+
+# Recusa uploads acima do limite antes de ler o corpo inteiro
+app.add_middleware(BodySizeLimitMiddleware)
+
+# Configuração do CORS (por fora de tudo: respostas de erro como o 413 do
+# limite de corpo também levam Access-Control-Allow-Origin)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Permitir requisições do frontend
@@ -17,10 +55,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Pool de conexões esgotado: responde 503 em vez de deixar a requisição pendurada"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado. Tente novamente em instantes."},
+        headers={"Retry-After": "1"}
+    )
+
 # Rotas
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(orders.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
@@ -1,31 +1,29 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from ..models.database import SessionLocal
+from ..models.database import get_db
 from ..models.auth import users_table
-from ..utils.security import verify_token, is_token_revoked, get_user_by_username
+from ..utils.security import verify_token, is_token_revoked, get_user_by_username, get_token_id
+from ..utils.token_cache import token_cache
 
 security = HTTPBearer()
 
-def get_db():
-    """Dependência para obter sessão do banco"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Dependência para obter usuário atual autenticado"""
     token = credentials.credentials
     
+    # Token já validado recentemente: dispensa as consultas ao banco
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
     # Verificar se token foi revogado
-    if is_token_revoked(db, token):
+    if await is_token_revoked(db, token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado",
@@ -50,7 +48,7 @@ def get_current_user(
         )
     
     # Buscar usuário
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,9 +56,10 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    token_cache.set(token, user, payload.get("exp"), get_token_id(token))
     return user
 
-def get_current_active_user(current_user = Depends(get_current_user)):
+async def get_current_active_user(current_user = Depends(get_current_user)):
     """Dependência para obter usuário ativo atual"""
     if not current_user.is_active:
         raise HTTPException(
@@ -69,7 +68,7 @@ def get_current_active_user(current_user = Depends(get_current_user)):
         )
     return current_user
 
-def require_admin(current_user = Depends(get_current_active_user)):
+async def require_admin(current_user = Depends(get_current_active_user)):
     """Dependência para verificar se usuário é administrador"""
     if current_user.role != "administrador":
         raise HTTPException(
@@ -0,0 +1,61 @@
+import re
+from typing import List, Tuple
+from fastapi.responses import JSONResponse
+
+from ..utils.uploads import MAX_FILE_SIZE, MAX_BULK_UPLOAD_FILES, file_too_large
+
+# Folga para os cabeçalhos e delimitadores do multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+# (método, rota, tamanho máximo do corpo)
+UPLOAD_BODY_LIMITS: List[Tuple[str, "re.Pattern", int]] = [
+    ("POST", re.compile(r"^/orders/\d+/photos$"), MAX_FILE_SIZE + MULTIPART_OVERHEAD),
+    ("POST", re.compile(r"^/orders/\d+/photos/bulk$"), MAX_BULK_UPLOAD_FILES * (MAX_FILE_SIZE + MULTIPART_OVERHEAD)),
+]
+
+
+class BodySizeLimitMiddleware:
+    """Interrompe uploads grandes antes de o corpo ser lido por inteiro.
+
+    Se o Content-Length já passa do limite a requisição é recusada com 413
+    sem ler o corpo; sem Content-Length (chunked), os bytes são contados
+    conforme chegam e a leitura é abortada ao passar do limite.
+    """
+
+    def __init__(self, app, limits: List[Tuple[str, "re.Pattern", int]] = UPLOAD_BODY_LIMITS):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_size = self._limit_for(scope)
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            error = file_too_large()
+            response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    raise file_too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _limit_for(self, scope):
+        if scope["type"] != "http":
+            return None
+        for method, pattern, max_size in self.limits:
+            if scope["method"] == method and pattern.match(scope["path"]):
+                return max_size
+        return None
@@ -0,0 +1,255 @@
+import os
+import re
+import time
+import zlib
+import threading
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # sem o pacote brotli, só gzip
+    brotli = None
+
+# Respostas menores que isto saem sem compressão (o ganho não paga a CPU)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Níveis escolhidos pelo custo de CPU x bytes em listagens JSON de ordens:
+# gzip 5 e brotli 5 ficam a ~7% do nível 6/9 com metade da CPU ou menos
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+# Pedaços a partir deste tamanho são comprimidos no threadpool: uma página de
+# 160 KB custa 1-3 ms de CPU, que no event loop param as demais requisições
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", "32768"))
+
+# Tipos de conteúdo comprimidos (imagens e demais binários já vêm comprimidos)
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+# Rotas nunca comprimidas: arquivos enviados (fotos JPEG/PNG/WebP)
+COMPRESSION_EXCLUDED_PATHS = re.compile(r"^/(orders/)?uploads/")
+
+
+class CompressionStats:
+    """Contadores da compressão de respostas para monitoramento"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings = {}
+        self.skipped_small = 0
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        """Registra uma resposta comprimida"""
+        with self._lock:
+            counters = self._encodings.setdefault(
+                encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            )
+            counters["responses"] += 1
+            counters["bytes_in"] += bytes_in
+            counters["bytes_out"] += bytes_out
+            counters["cpu_seconds"] += cpu_seconds
+
+    def record_skip(self):
+        """Resposta comprimível deixada sem compressão por estar abaixo do mínimo"""
+        with self._lock:
+            self.skipped_small += 1
+
+    def stats(self) -> dict:
+        """Bytes economizados e CPU média por codificação"""
+        with self._lock:
+            encodings = {}
+            for encoding, counters in self._encodings.items():
+                responses = counters["responses"]
+                encodings[encoding] = {
+                    "responses": responses,
+                    "bytes_in": counters["bytes_in"],
+                    "bytes_out": counters["bytes_out"],
+                    "bytes_saved": counters["bytes_in"] - counters["bytes_out"],
+                    "ratio": round(counters["bytes_out"] / counters["bytes_in"], 4) if counters["bytes_in"] else 0.0,
+                    "avg_cpu_ms": round(counters["cpu_seconds"] / responses * 1000, 3) if responses else 0.0
+                }
+            return {
+                "min_size": COMPRESSION_MIN_SIZE,
+                "gzip_level": COMPRESSION_GZIP_LEVEL,
+                "brotli_quality": COMPRESSION_BROTLI_QUALITY if brotli is not None else None,
+                "thread_min_size": COMPRESSION_THREAD_MIN_SIZE,
+                "skipped_small": self.skipped_small,
+                "encodings": encodings
+            }
+
+
+# Instância compartilhada pelo processo
+compression_stats = CompressionStats()
+
+
+class _Compressor:
+    """Compressor incremental: cada pedaço sai já decodificável (streaming)"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # CPU da thread que comprime (event loop ou threadpool)
+        started_at = time.thread_time()
+        if self.encoding == "br":
+            output = self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        else:
+            output = self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        self.cpu_seconds += time.thread_time() - started_at
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        return output
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Escolhe br ou gzip conforme o Accept-Encoding (ignora q=0)"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """Comprime respostas com brotli ou gzip.
+
+    Só comprime tipos da lista COMPRESSIBLE_CONTENT_TYPES com pelo menos
+    COMPRESSION_MIN_SIZE bytes e sem Content-Encoding próprio; uploads,
+    304/206 e HEAD passam intactos. Respostas em streaming são comprimidas
+    pedaço a pedaço (flush a cada pedaço, sem acumular o corpo). Pedaços
+    com thread_min_size bytes ou mais são comprimidos no threadpool, sem
+    parar o event loop (zlib e brotli liberam o GIL).
+    """
+
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE,
+                 thread_min_size: int = COMPRESSION_THREAD_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+        self.thread_min_size = thread_min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or COMPRESSION_EXCLUDED_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _accepted_encoding((_header(scope["headers"], b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                if not self._compressible(message):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                # Corpo inteiro em uma mensagem e pequeno: não vale comprimir
+                if not more_body and len(body) < self.min_size:
+                    passthrough = True
+                    compression_stats.record_skip()
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                compressed = await self._compress(compressor, body, final=not more_body)
+                await send(self._compressed_start(start_message, encoding, None if more_body else len(compressed)))
+            else:
+                compressed = await self._compress(compressor, body, final=not more_body)
+
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            if not more_body:
+                compression_stats.record(encoding, compressor.bytes_in, compressor.bytes_out, compressor.cpu_seconds)
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _compress(self, compressor: _Compressor, body: bytes, final: bool) -> bytes:
+        if len(body) >= self.thread_min_size:
+            return await run_in_threadpool(compressor.compress, body, final)
+        return compressor.compress(body, final)
+
+    def _compressible(self, message) -> bool:
+        if message["status"] in (204, 206, 304) or message["status"] < 200:
+            return False
+        headers = message.get("headers", [])
+        if _header(headers, b"content-encoding") is not None:
+            return False
+        content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        content_length = _header(headers, b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) < self.min_size:
+            compression_stats.record_skip()
+            return False
+        return True
+
+    def _compressed_start(self, message, encoding: str, content_length: Optional[int]):
+        """Cabeçalhos da resposta comprimida (tamanho, codificação, Vary e ETag fraca)"""
+        headers = []
+        vary = None
+        for key, value in message.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = value
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                # O corpo muda com a codificação: a ETag forte vira fraca
+                value = b"W/" + value
+            headers.append((key, value))
+
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"vary", _merge_vary(vary)))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**message, "headers": headers}
+
+
+def _merge_vary(vary: Optional[bytes]) -> bytes:
+    if not vary:
+        return b"Accept-Encoding"
+    values = [item.strip() for item in vary.split(b",")]
+    if any(item.lower() in (b"accept-encoding", b"*") for item in values):
+        return vary
+    return vary + b", Accept-Encoding"
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, String, Boolean, Text, TIMESTAMP, ForeignKey, MetaData
+from sqlalchemy import Table, Column, Integer, String, Boolean, Text, CHAR, TIMESTAMP, ForeignKey, MetaData
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -24,7 +24,7 @@ auth_tokens_table = Table(
     metadata,
     Column("id", Integer, primary_key=True),
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
-    Column("token", Text, unique=True, nullable=False),
+    Column("jti_hash", CHAR(64), unique=True, nullable=False),  # SHA-256 (hex) do jti
     Column("created_at", TIMESTAMP, default=func.current_timestamp()),
     Column("expires_at", TIMESTAMP),
     Column("is_revoked", Boolean, default=False)
@@ -1,6 +1,8 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from ..utils.pool_metrics import InstrumentedQueuePool, instrument_engine
 
 DB_USER = os.getenv("DB_USER", "admin")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
@@ -8,7 +10,53 @@ DB_NAME = os.getenv("DB_NAME", "postgres")
 DB_HOST = os.getenv("DB_HOST", "db-postgres")  # nome do serviço no docker-compose
 DB_PORT = os.getenv("DB_PORT", "5441")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Pool de conexões
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # -1 desativa
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 desativa
+
+# Métodos HTTP atendidos em transação somente leitura
+READ_ONLY_METHODS = {"GET", "HEAD"}
+
+DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    # statement_timeout aplicado pelo servidor a cada consulta da conexão
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+)
+instrument_engine(engine)
+
+# Mesmo pool, com as transações somente leitura: a opção é aplicada quando a
+# sessão pega a conexão, na primeira consulta
+readonly_engine = engine.execution_options(postgresql_readonly=True)
+
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_db(request: Request):
+    """Dependência que fornece a sessão do banco da requisição.
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    O FastAPI reaproveita o resultado da dependência dentro da mesma
+    requisição, então a autenticação e o handler compartilham uma única
+    sessão (e uma única conexão do pool). Requisições GET/HEAD rodam em
+    transação somente leitura. A conexão só sai do pool na primeira
+    consulta: requisições atendidas por caches não ocupam nenhuma.
+    """
+    bind = readonly_engine if request.method in READ_ONLY_METHODS else engine
+    async with SessionLocal(bind=bind) as db:
+        yield db
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # Modelos para Clientes
@@ -19,6 +19,11 @@ class ClientRead(ClientBase):
     class Config:
         from_attributes = True
 
+# Busca (typeahead): uma página das melhores correspondências
+class ClientSearchPage(BaseModel):
+    items: List[ClientRead]
+    has_more: bool = False
+
 
 
 
@@ -40,6 +45,10 @@ class EquipmentRead(EquipmentBase):
     class Config:
         from_attributes = True
 
+class EquipmentSearchPage(BaseModel):
+    items: List[EquipmentRead]
+    has_more: bool = False
+
 
 
 
@@ -77,6 +86,10 @@ class ServiceOrderRead(ServiceOrderBase):
     class Config:
         from_attributes = True
 
+class ServiceOrderPage(BaseModel):
+    items: List[ServiceOrderRead]
+    next_cursor: Optional[str] = None
+
 
 
 
@@ -147,6 +160,43 @@ class PhotoRead(PhotoBase):
     id: int
     service_order_id: int
     uploaded_at: Optional[datetime] = None
+    variants: Optional[Dict[str, str]] = None  # variante -> URL (quando já geradas)
+    thumbnail_url: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+# Upload em lote: resultado por arquivo, na ordem do envio
+class PhotoUploadResult(BaseModel):
+    filename: Optional[str] = None
+    status: str  # ok ou error
+    photo: Optional[PhotoRead] = None
+    detail: Optional[str] = None
+
+class PhotoBulkUploadResponse(BaseModel):
+    uploaded: int
+    failed: int
+    results: List[PhotoUploadResult]
+
+# Upload direto para o armazenamento (URL pré-assinada)
+class PhotoUploadUrlRequest(BaseModel):
+    filename: str
+    sha256: str = Field(pattern="^[0-9a-f]{64}$")  # SHA-256 do conteúdo em hexadecimal
+    size: int = Field(gt=0)
+
+class PhotoUploadUrl(BaseModel):
+    url: str
+    method: str
+    headers: Dict[str, str]  # cabeçalhos assinados que o cliente deve enviar
+    expires_in: int
+    upload_token: str  # enviado de volta em POST /orders/{id}/photos/complete
+
+class PhotoUploadComplete(BaseModel):
+    filename: str
+    sha256: str = Field(pattern="^[0-9a-f]{64}$")
+    upload_token: str
+
+# Detalhe da OS em uma requisição: ordem, relacionamentos, fotos e checklists
+class ServiceOrderDetail(ServiceOrderRead):
+    checklists: Optional[List[ChecklistRead]] = None
+    checklist_responses: Optional[List[ChecklistResponseRead]] = None
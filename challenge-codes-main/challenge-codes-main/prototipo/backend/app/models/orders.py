@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, Boolean, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Table, Column, Integer, BigInteger, String, Boolean, Text, CHAR, TIMESTAMP, ForeignKey, Computed, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from .auth import metadata
 
@@ -40,7 +41,14 @@ service_orders_table = Table(
     Column("activities_description", Text),  # Descrição das atividades realizadas
     Column("status", String(20), default="open"),
     Column("created_at", TIMESTAMP, default=func.current_timestamp()),
-    Column("updated_at", TIMESTAMP, default=func.current_timestamp())
+    Column("updated_at", TIMESTAMP, default=func.current_timestamp()),
+    # Vetor de busca textual gerado pelo banco (título, descrição e atividades)
+    Column("search_vector", TSVECTOR, Computed(
+        "setweight(to_tsvector('portuguese'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('portuguese'::regconfig, coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('portuguese'::regconfig, coalesce(activities_description, '')), 'C')",
+        persisted=True
+    ))
 )
 
 # Tabela de checklists
@@ -68,7 +76,19 @@ os_checklist_responses_table = Table(
     Column("service_order_id", Integer, ForeignKey("service_orders.id"), nullable=False),
     Column("checklist_item_id", Integer, ForeignKey("checklist_items.id"), nullable=False),
     Column("is_checked", Boolean, nullable=False),
-    Column("responded_at", TIMESTAMP, default=func.current_timestamp())
+    Column("responded_at", TIMESTAMP, default=func.current_timestamp()),
+    UniqueConstraint("service_order_id", "checklist_item_id", name="uq_os_checklist_responses_order_item")
+)
+
+# Conteúdo das fotos (endereçado pelo SHA-256), compartilhado entre fotos iguais
+photo_blobs_table = Table(
+    "photo_blobs",
+    metadata,
+    Column("digest", CHAR(64), primary_key=True),
+    Column("filename", Text, nullable=False),  # <digest><ext>
+    Column("size_bytes", BigInteger, nullable=False),
+    Column("ref_count", Integer, nullable=False, default=0),  # fotos que usam o conteúdo
+    Column("created_at", TIMESTAMP, default=func.current_timestamp())
 )
 
 # Tabela de fotos das OS
@@ -78,5 +98,21 @@ os_photos_table = Table(
     Column("id", Integer, primary_key=True),
     Column("service_order_id", Integer, ForeignKey("service_orders.id"), nullable=False),
     Column("photo_url", Text, nullable=False),
+    Column("blob_digest", CHAR(64), ForeignKey("photo_blobs.digest")),  # nulo em uploads antigos
     Column("uploaded_at", TIMESTAMP, default=func.current_timestamp())
 )
+
+# Variantes redimensionadas das fotos (miniatura, média, WebP)
+os_photo_variants_table = Table(
+    "os_photo_variants",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("photo_id", Integer, ForeignKey("os_photos.id", ondelete="CASCADE"), nullable=False),
+    Column("variant", String(20), nullable=False),  # thumb, medium, thumb_webp, medium_webp
+    Column("photo_url", Text, nullable=False),
+    Column("width", Integer),
+    Column("height", Integer),
+    Column("size_bytes", Integer),
+    Column("created_at", TIMESTAMP, default=func.current_timestamp()),
+    UniqueConstraint("photo_id", "variant")
+)
@@ -1,16 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 
-from ..models.database import SessionLocal
+from ..models.database import get_db
 from ..models.auth import users_table
 from ..models.auth_models import UserLogin, Token, UserRead
+from ..middleware.auth import get_current_user as get_authenticated_user
 from ..utils.security import (
     authenticate_user, 
     create_access_token, 
-    get_user_by_username,
     create_token_record,
     revoke_token,
     verify_token,
@@ -25,21 +25,14 @@ router = APIRouter(
 
 security = HTTPBearer()
 
-def get_db():
-    """Dependência para obter sessão do banco"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Endpoint para fazer login"""
     # Autenticar usuário
-    user = authenticate_user(db, user_credentials.username, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.username, user_credentials.password)
     
     if not user:
         raise HTTPException(
@@ -56,7 +49,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     
     # Salvar token no banco
     expires_at = datetime.utcnow() + access_token_expires
-    create_token_record(db, user.id, access_token, expires_at)
+    await create_token_record(db, user.id, access_token, expires_at)
     
     # Preparar dados do usuário para resposta
     user_data = {
@@ -79,84 +72,45 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout(
+async def logout(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint para fazer logout"""
     token = credentials.credentials
     
     # Revogar token no banco
-    revoke_token(db, token)
+    await revoke_token(db, token)
     
     return {"message": "Logout realizado com sucesso"}
 
 
 
 @router.get("/me", response_model=UserRead)
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
+async def get_current_user(current_user = Depends(get_authenticated_user)):
     """Endpoint para obter dados do usuário atual"""
-    token = credentials.credentials
-    
-    # Verificar se token foi revogado
-    if is_token_revoked(db, token):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Decodificar token
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    username = payload.get("sub")
-    if not username:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Buscar usuário
-    user = get_user_by_username(db, username)
-    if not user or not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuário não encontrado ou inativo",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     return {
-        "id": user.id,
-        "username": user.username,
-        "name": user.name,
-        "email": user.email,
-        "role": user.role,
-        "is_active": user.is_active,
-        "created_at": user.created_at
+        "id": current_user.id,
+        "username": current_user.username,
+        "name": current_user.name,
+        "email": current_user.email,
+        "role": current_user.role,
+        "is_active": current_user.is_active,
+        "created_at": current_user.created_at
     }
 
 
 
 @router.post("/verify-token")
-def verify_token_endpoint(
+async def verify_token_endpoint(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Endpoint para verificar se token é válido"""
     token = credentials.credentials
     
     # Verificar se token foi revogado
-    if is_token_revoked(db, token):
+    if await is_token_revoked(db, token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado"
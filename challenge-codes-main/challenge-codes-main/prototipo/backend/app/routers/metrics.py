@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..middleware.auth import require_admin
+from ..models.database import engine, get_db
+from ..utils.token_cache import token_cache
+from ..utils.token_purge import token_purger
+from ..utils.password_hasher import password_hasher
+from ..utils.pool_metrics import pool_metrics
+from ..utils.photo_variants import photo_variant_pipeline, photo_variant_backfill
+from ..utils.photo_blobs import storage_report
+from ..utils.storage import photo_storage
+from ..utils.checklist_cache import checklist_cache
+from ..utils.reference_cache import reference_cache
+from ..middleware.compression import compression_stats
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+@router.get("/")
+async def get_metrics(current_user = Depends(require_admin)):
+    """Métricas internas da API (requer privilégios de administrador)"""
+    return {
+        "token_cache": token_cache.stats(),
+        "token_purge": token_purger.stats(),
+        "password_hasher": password_hasher.stats(),
+        "db_pool": pool_metrics.stats(engine.pool),
+        "photo_variants": photo_variant_pipeline.stats(),
+        "photo_variant_backfill": photo_variant_backfill.stats(),
+        "storage": photo_storage.stats(),
+        "checklist_cache": checklist_cache.stats(),
+        "reference_cache": reference_cache.stats(),
+        "compression": compression_stats.stats()
+    }
+
+@router.get("/storage")
+async def get_storage_report(
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(require_admin)
+):
+    """Uso de armazenamento das fotos e bytes economizados pela deduplicação"""
+    return await storage_report(db)
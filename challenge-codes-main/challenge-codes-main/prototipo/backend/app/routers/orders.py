@@ -1,236 +1,248 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from typing import List, Optional
+from sqlalchemy.dialects.postgresql import insert
+from typing import List, Optional, Union
 from datetime import datetime
 import os
-import uuid
-import shutil
+import base64
+import asyncio
 
-from ..models.database import SessionLocal
+from ..models.database import get_db
 from ..models.orders import (
     service_orders_table, clients_table, equipments_table, 
     checklists_table, checklist_items_table,
-    os_checklist_responses_table, os_photos_table
+    os_checklist_responses_table, os_photos_table, os_photo_variants_table
 )
 from ..models.auth import users_table
+from ..models.auth_models import UserRead
 from ..models.order_models import (
     ServiceOrderCreate, 
     ServiceOrderRead, 
     ServiceOrderUpdate,
+    ServiceOrderPage,
+    ServiceOrderDetail,
     ClientCreate, 
     ClientRead, 
+    ClientSearchPage,
     EquipmentCreate, 
     EquipmentRead,
+    EquipmentSearchPage,
     ChecklistCreate, 
     ChecklistRead, 
     ChecklistItemCreate, 
     ChecklistItemRead,
     ChecklistResponseCreate,
+    ChecklistResponseRead,
     PhotoCreate,
-    PhotoRead
+    PhotoRead,
+    PhotoBulkUploadResponse,
+    PhotoUploadUrlRequest,
+    PhotoUploadUrl,
+    PhotoUploadComplete
 )
 from ..middleware.auth import get_current_active_user
+from ..utils.order_loader import (
+    ORDER_FIELDS, CLIENT_FIELDS, EQUIPMENT_FIELDS, ORDER_RELATIONS, orders_query, filter_orders, load_orders, load_order, load_photos, load_checklist_responses,
+    thumbnail_url
+)
+from ..utils.pagination import apply_keyset, build_page, order_by_key
+from ..utils.projection import parse_fields, partial_model
+from ..utils.serialization import fast_response
+from ..utils.reference_cache import reference_cache
+from ..utils.typeahead import (
+    TYPEAHEAD_MAX_LIMIT, TYPEAHEAD_MAX_SKIP, TYPEAHEAD_MIN_LENGTH, search_clients_query, search_equipments_query,
+    fetch_search, page
+)
+from ..utils.uploads import (
+    MAX_FILE_SIZE, MAX_BULK_UPLOAD_FILES, BULK_UPLOAD_CONCURRENCY,
+    is_allowed_file, save_upload_to_temp, discard_upload, file_too_large, file_sha256
+)
+from ..utils.image_variants import PHOTO_VARIANTS, variant_name, variant_filename
+from ..utils.photo_blobs import acquire_blob, acquire_blobs, release_blob, remove_orphan_files
+from ..utils.photo_variants import photo_variant_pipeline
+from ..utils.checklist_cache import checklist_cache
+from ..utils.storage import photo_storage
+from ..utils.security import create_upload_grant, verify_upload_grant
 
 router = APIRouter(
     prefix="/orders",
     tags=["service_orders"]
 )
 
-def get_db():
-    """Dependência para obter sessão do banco"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-
 
 
 # ===== ORDENS DE SERVIÇO =====
 
-@router.get("/", response_model=List[ServiceOrderRead])
-def list_orders(
+def _projected_orders_annotation(projection: dict, include_photos: bool, page: bool):
+    """Tipo da resposta de /orders/ com fields: modelos parciais da ordem e relacionamentos"""
+    nested = []
+    for name, model in (("client", ClientRead), ("equipment", EquipmentRead), ("user", UserRead)):
+        if name in projection:
+            nested.append((name, Optional[partial_model(model, tuple(projection[name]))]))
+    if include_photos:
+        nested.append(("photos", Optional[List[PhotoRead]]))
+    
+    item = partial_model(ServiceOrderRead, tuple(projection[""]), tuple(nested))
+    if page:
+        return partial_model(ServiceOrderPage, ("next_cursor",), (("items", List[item]),))
+    return List[item]
+
+@router.get("/", response_model=Union[List[ServiceOrderRead], ServiceOrderPage])
+async def list_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    status: Optional[str] = Query(None),
+    status: Optional[List[str]] = Query(None),
     user_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    client_id: Optional[int] = Query(None),
+    equipment_id: Optional[int] = Query(None),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    updated_from: Optional[datetime] = Query(None),
+    updated_to: Optional[datetime] = Query(None),
+    q: Optional[str] = Query(None, max_length=200),
+    include_photos: bool = Query(False),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = Query(None),
+    sort: str = Query("created_at", pattern="^(created_at|updated_at)$"),
+    direction: str = Query("desc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Campos da resposta, ex.: id,title,status,client.name,user.name"),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista ordens de serviço com filtros opcionais"""
-    query = select(service_orders_table)
+    """Lista ordens de serviço com filtros, busca textual e ordenação no servidor.
+
+    status pode ser repetido (?status=open&status=in_progress) e q faz busca
+    textual em título, descrição e atividades. Com pagination=cursor retorna
+    {"items", "next_cursor"} usando keyset sobre (sort, id); o next_cursor
+    deve ser enviado em cursor na próxima página. fields limita as colunas
+    consultadas e os campos da resposta (relacionamentos como client.name;
+    só os relacionamentos pedidos entram no JOIN).
+    """
+    projection = parse_fields(fields, ORDER_FIELDS, {name: spec[1] for name, spec in ORDER_RELATIONS.items()})
+    columns = projection
+    if projection is not None and pagination == "cursor" and sort not in projection[""]:
+        # O cursor é montado a partir da coluna de ordenação: ela é consultada,
+        # mas fica fora da resposta (o modelo parcial só tem os campos pedidos)
+        columns = {**projection, "": projection[""] + [sort]}
     
     # Aplicar filtros
-    if status:
-        query = query.where(service_orders_table.c.status == status)
-    if user_id:
-        query = query.where(service_orders_table.c.user_id == user_id)
+    query = filter_orders(
+        orders_query(fields=columns),
+        statuses=status,
+        user_id=user_id,
+        client_id=client_id,
+        equipment_id=equipment_id,
+        created_from=created_from,
+        created_to=created_to,
+        updated_from=updated_from,
+        updated_to=updated_to,
+        search=q
+    )
     
-    # Paginação
-    query = query.offset(skip).limit(limit)
+    sort_column = service_orders_table.c[sort]
+    searching = bool(q and q.strip())
     
-    # Executar query
-    result = db.execute(query).fetchall()
-    
-    orders = []
-    for row in result:
-        # Buscar dados relacionados
-        client = db.execute(
-            select(clients_table).where(clients_table.c.id == row.client_id)
-        ).first()
-        
-        equipment = db.execute(
-            select(equipments_table).where(equipments_table.c.id == row.equipment_id)
-        ).first()
-        
-        user = db.execute(
-            select(users_table).where(users_table.c.id == row.user_id)
-        ).first()
-        
-        order_data = {
-            "id": row.id,
-            "title": row.title,
-            "description": row.description,
-            "status": row.status,
-            "client_id": row.client_id,
-            "equipment_id": row.equipment_id,
-            "user_id": row.user_id,
-            "created_at": row.created_at,
-            "updated_at": row.updated_at,
-            "client": {
-                "id": client.id,
-                "name": client.name,
-                "email": client.email,
-                "phone": client.phone,
-                "address": client.address,
-                "created_at": client.created_at
-            } if client else None,
-            "equipment": {
-                "id": equipment.id,
-                "type": equipment.type,
-                "brand": equipment.brand,
-                "model": equipment.model,
-                "serial_number": equipment.serial_number,
-                "client_id": equipment.client_id,
-                "created_at": equipment.created_at
-            } if equipment else None,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "name": user.name,
-                "email": user.email,
-                "role": user.role,
-                "is_active": user.is_active,
-                "created_at": user.created_at
-            } if user else None
-        }
-        orders.append(order_data)
+    # Paginação por cursor (keyset): não descarta linhas como o OFFSET
+    if pagination == "cursor":
+        query = apply_keyset(
+            query, sort_column, service_orders_table.c.id, cursor, sort, limit, direction
+        )
+        orders = await load_orders(db, query, include_photos=include_photos, custom_plan=searching)
+        page = build_page(orders, sort, limit, direction)
+        if projection is not None:
+            return fast_response(_projected_orders_annotation(projection, include_photos, page=True), page)
+        return fast_response(ServiceOrderPage, page)
+    
+    # Paginação por offset com ordenação estável
+    query = order_by_key(query, sort_column, service_orders_table.c.id, direction)
+    query = query.offset(skip).limit(limit)
     
-    return orders
+    # Cliente, equipamento e técnico vêm no mesmo JOIN (sem N+1)
+    orders = await load_orders(db, query, include_photos=include_photos, custom_plan=searching)
+    if projection is not None:
+        return fast_response(_projected_orders_annotation(projection, include_photos, page=False), orders)
+    return fast_response(List[ServiceOrderRead], orders)
 
 @router.get("/{order_id}", response_model=ServiceOrderRead)
-def get_order(
+async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Busca uma ordem de serviço por ID"""
-    order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    order = await load_order(db, order_id, include_photos=True)
     
     if not order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
     
-    # Buscar dados relacionados
-    client = db.execute(
-        select(clients_table).where(clients_table.c.id == order.client_id)
-    ).first()
+    return fast_response(ServiceOrderRead, order)
+
+# Seções do detalhe da OS que podem ser pedidas em include
+ORDER_DETAIL_SECTIONS = (*ORDER_RELATIONS, "photos", "checklists", "checklist_responses")
+
+@router.get("/{order_id}/detail", response_model=ServiceOrderDetail)
+async def get_order_detail(
+    order_id: int,
+    include: Optional[str] = Query(
+        None, description=f"Seções separadas por vírgula (padrão: todas): {', '.join(ORDER_DETAIL_SECTIONS)}"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Tudo o que a tela de detalhe da OS usa, em uma requisição.
+
+    Ordem com cliente, equipamento e técnico (1 query), fotos com variantes
+    e miniatura (1 query), modelos de checklist (cache) e respostas
+    (1 query). Seções fora de include não são consultadas e saem como null.
+    """
+    sections = set(ORDER_DETAIL_SECTIONS)
+    if include is not None:
+        sections = {section.strip() for section in include.split(",") if section.strip()}
+        unknown = sections - set(ORDER_DETAIL_SECTIONS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Seções inválidas em include: {', '.join(sorted(unknown))}"
+            )
     
-    equipment = db.execute(
-        select(equipments_table).where(equipments_table.c.id == order.equipment_id)
-    ).first()
+    order = await load_order(
+        db,
+        order_id,
+        include_photos="photos" in sections,
+        relations=[name for name in ORDER_RELATIONS if name in sections]
+    )
     
-    user = db.execute(
-        select(users_table).where(users_table.c.id == order.user_id)
-    ).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
     
-    # Buscar fotos da ordem
-    photos = db.execute(
-        select(os_photos_table).where(os_photos_table.c.service_order_id == order_id)
-        .order_by(os_photos_table.c.uploaded_at.desc())
-    ).fetchall()
+    if "checklists" in sections:
+        order["checklists"] = await checklist_cache.get(db)
+    if "checklist_responses" in sections:
+        order["checklist_responses"] = await load_checklist_responses(db, order_id)
     
-    return {
-        "id": order.id,
-        "title": order.title,
-        "description": order.description,
-        "activities_description": order.activities_description,
-        "status": order.status,
-        "client_id": order.client_id,
-        "equipment_id": order.equipment_id,
-        "user_id": order.user_id,
-        "created_at": order.created_at,
-        "updated_at": order.updated_at,
-        "client": {
-            "id": client.id,
-            "name": client.name,
-            "email": client.email,
-            "phone": client.phone,
-            "address": client.address,
-            "created_at": client.created_at
-        } if client else None,
-        "equipment": {
-            "id": equipment.id,
-            "type": equipment.type,
-            "brand": equipment.brand,
-            "model": equipment.model,
-            "serial_number": equipment.serial_number,
-            "client_id": equipment.client_id,
-            "created_at": equipment.created_at
-        } if equipment else None,
-        "user": {
-            "id": user.id,
-            "username": user.username,
-            "name": user.name,
-            "email": user.email,
-            "role": user.role,
-            "is_active": user.is_active,
-            "created_at": user.created_at
-        } if user else None,
-        "photos": [
-            {
-                "id": photo.id,
-                "service_order_id": photo.service_order_id,
-                "photo_url": photo.photo_url,
-                "uploaded_at": photo.uploaded_at
-            }
-            for photo in photos
-        ]
-    }
+    return fast_response(ServiceOrderDetail, order)
 
 @router.post("/", response_model=ServiceOrderRead)
-def create_order(
+async def create_order(
     order: ServiceOrderCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Cria uma nova ordem de serviço"""
     # Verificar se cliente existe
-    client = db.execute(
+    client = (await db.execute(
         select(clients_table).where(clients_table.c.id == order.client_id)
-    ).first()
+    )).first()
     
     if not client:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     
     # Verificar se equipamento existe
-    equipment = db.execute(
+    equipment = (await db.execute(
         select(equipments_table).where(equipments_table.c.id == order.equipment_id)
-    ).first()
+    )).first()
     
     if not equipment:
         raise HTTPException(status_code=404, detail="Equipamento não encontrado")
@@ -246,68 +258,28 @@ def create_order(
     )
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
         
-        # Buscar a ordem criada
-        new_order = db.execute(
-            select(service_orders_table).where(service_orders_table.c.id == result.inserted_primary_key[0])
-        ).first()
-        
-        return {
-            "id": new_order.id,
-            "title": new_order.title,
-            "description": new_order.description,
-            "status": new_order.status,
-            "client_id": new_order.client_id,
-            "equipment_id": new_order.equipment_id,
-            "user_id": new_order.user_id,
-            "created_at": new_order.created_at,
-            "updated_at": new_order.updated_at,
-            "client": {
-                "id": client.id,
-                "name": client.name,
-                "email": client.email,
-                "phone": client.phone,
-                "address": client.address,
-                "created_at": client.created_at
-            },
-            "equipment": {
-                "id": equipment.id,
-                "type": equipment.type,
-                "brand": equipment.brand,
-                "model": equipment.model,
-                "serial_number": equipment.serial_number,
-                "client_id": equipment.client_id,
-                "created_at": equipment.created_at
-            },
-            "user": {
-                "id": current_user.id,
-                "username": current_user.username,
-                "name": current_user.name,
-                "email": current_user.email,
-                "role": current_user.role,
-                "is_active": current_user.is_active,
-                "created_at": current_user.created_at
-            }
-        }
+        # Buscar a ordem criada com relacionamentos
+        return await load_order(db, result.inserted_primary_key[0])
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar ordem de serviço: {e}")
 
 @router.put("/{order_id}", response_model=ServiceOrderRead)
-def update_order(
+async def update_order(
     order_id: int,
     order_update: ServiceOrderUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Atualiza uma ordem de serviço"""
     # Verificar se ordem existe
-    existing_order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    existing_order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not existing_order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
@@ -331,92 +303,39 @@ def update_order(
     ).values(**update_data)
     
     try:
-        db.execute(stmt)
-        db.commit()
-        
-        # Buscar ordem atualizada
-        updated_order = db.execute(
-            select(service_orders_table).where(service_orders_table.c.id == order_id)
-        ).first()
-        
-        # Buscar dados relacionados
-        client = db.execute(
-            select(clients_table).where(clients_table.c.id == updated_order.client_id)
-        ).first()
-        
-        equipment = db.execute(
-            select(equipments_table).where(equipments_table.c.id == updated_order.equipment_id)
-        ).first()
+        await db.execute(stmt)
+        await db.commit()
         
-        user = db.execute(
-            select(users_table).where(users_table.c.id == updated_order.user_id)
-        ).first()
-        
-        return {
-            "id": updated_order.id,
-            "title": updated_order.title,
-            "description": updated_order.description,
-            "status": updated_order.status,
-            "client_id": updated_order.client_id,
-            "equipment_id": updated_order.equipment_id,
-            "user_id": updated_order.user_id,
-            "created_at": updated_order.created_at,
-            "updated_at": updated_order.updated_at,
-            "client": {
-                "id": client.id,
-                "name": client.name,
-                "email": client.email,
-                "phone": client.phone,
-                "address": client.address,
-                "created_at": client.created_at
-            } if client else None,
-            "equipment": {
-                "id": equipment.id,
-                "type": equipment.type,
-                "brand": equipment.brand,
-                "model": equipment.model,
-                "serial_number": equipment.serial_number,
-                "client_id": equipment.client_id,
-                "created_at": equipment.created_at
-            } if equipment else None,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "name": user.name,
-                "email": user.email,
-                "role": user.role,
-                "is_active": user.is_active,
-                "created_at": user.created_at
-            } if user else None
-        }
+        # Buscar ordem atualizada com relacionamentos
+        return await load_order(db, order_id)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar ordem de serviço: {e}")
 
 @router.put("/{order_id}/assign-technician")
-def assign_technician(
+async def assign_technician(
     order_id: int,
     technician_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Atribui ou reatribui um técnico a uma ordem de serviço"""
     # Verificar se ordem existe
-    existing_order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    existing_order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not existing_order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
     
     # Verificar se técnico existe e está ativo
-    technician = db.execute(
+    technician = (await db.execute(
         select(users_table).where(
             users_table.c.id == technician_id,
             users_table.c.is_active == True
         )
-    ).first()
+    )).first()
     
     if not technician:
         raise HTTPException(status_code=404, detail="Técnico não encontrado ou inativo")
@@ -430,29 +349,18 @@ def assign_technician(
     )
     
     try:
-        db.execute(stmt)
-        db.commit()
+        await db.execute(stmt)
+        await db.commit()
         
         # Buscar ordem atualizada
-        updated_order = db.execute(
-            select(service_orders_table).where(service_orders_table.c.id == order_id)
-        ).first()
-        
-        # Buscar dados relacionados
-        client = db.execute(
-            select(clients_table).where(clients_table.c.id == updated_order.client_id)
-        ).first()
-        
-        equipment = db.execute(
-            select(equipments_table).where(equipments_table.c.id == updated_order.equipment_id)
-        ).first()
+        updated_order = await load_order(db, order_id)
         
         return {
             "message": f"Técnico {technician.name or technician.username} atribuído com sucesso",
             "order": {
-                "id": updated_order.id,
-                "title": updated_order.title,
-                "status": updated_order.status,
+                "id": updated_order["id"],
+                "title": updated_order["title"],
+                "status": updated_order["status"],
                 "technician": {
                     "id": technician.id,
                     "username": technician.username,
@@ -460,25 +368,25 @@ def assign_technician(
                     "email": technician.email,
                     "role": technician.role
                 },
-                "updated_at": updated_order.updated_at
+                "updated_at": updated_order["updated_at"]
             }
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao atribuir técnico: {e}")
 
 @router.delete("/{order_id}")
-def delete_order(
+async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Exclui uma ordem de serviço"""
     # Verificar se ordem existe
-    existing_order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    existing_order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not existing_order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
@@ -487,8 +395,8 @@ def delete_order(
     stmt = service_orders_table.delete().where(service_orders_table.c.id == order_id)
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
@@ -496,7 +404,7 @@ def delete_order(
         return {"message": "Ordem de serviço excluída com sucesso"}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao excluir ordem de serviço: {e}")
 
 
@@ -505,16 +413,17 @@ def delete_order(
 # ===== TÉCNICOS =====
 
 @router.get("/technicians/")
-def list_technicians(
-    db: Session = Depends(get_db),
+async def list_technicians(
+    etag: Optional[str] = Depends(reference_cache.conditional("users")),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Lista todos os técnicos disponíveis"""
-    technicians = db.execute(
+    technicians = (await db.execute(
         select(users_table).where(users_table.c.is_active == True)
-    ).fetchall()
+    )).fetchall()
     
-    return [
+    return reference_cache.tagged(fast_response(List[dict], [
         {
             "id": tech.id,
             "username": tech.username,
@@ -524,7 +433,7 @@ def list_technicians(
             "is_active": tech.is_active
         }
         for tech in technicians
-    ]
+    ]), etag)
 
 
 
@@ -532,29 +441,47 @@ def list_technicians(
 # ===== CLIENTES =====
 
 @router.get("/clients/", response_model=List[ClientRead])
-def list_clients(
-    db: Session = Depends(get_db),
+async def list_clients(
+    fields: Optional[str] = Query(None, description="Campos da resposta, ex.: id,name"),
+    etag: Optional[str] = Depends(reference_cache.conditional("clients")),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista todos os clientes"""
-    clients = db.execute(select(clients_table)).fetchall()
+    """Lista todos os clientes (fields limita as colunas consultadas e os campos da resposta).
+
+    Responde 304 a If-None-Match com a ETag atual, sem consultar o banco.
+    """
+    projection = parse_fields(fields, CLIENT_FIELDS)
+    selected = projection[""] if projection is not None else CLIENT_FIELDS
+    clients = (await db.execute(select(*[clients_table.c[field] for field in selected]))).fetchall()
     
-    return [
-        {
-            "id": client.id,
-            "name": client.name,
-            "email": client.email,
-            "phone": client.phone,
-            "address": client.address,
-            "created_at": client.created_at
-        }
-        for client in clients
-    ]
+    if projection is not None:
+        return reference_cache.tagged(fast_response(List[partial_model(ClientRead, tuple(selected))], clients), etag)
+    return reference_cache.tagged(fast_response(List[ClientRead], clients), etag)
+
+@router.get("/clients/search", response_model=ClientSearchPage)
+async def search_clients(
+    q: str = Query(..., min_length=TYPEAHEAD_MIN_LENGTH, max_length=100, description="Nome, e-mail ou telefone (prefixo ou aproximado)"),
+    limit: int = Query(20, ge=1, le=TYPEAHEAD_MAX_LIMIT),
+    skip: int = Query(0, ge=0, le=TYPEAHEAD_MAX_SKIP),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Busca de clientes para o formulário de OS (índices pg_trgm).
+
+    Retorna as melhores correspondências primeiro (prefixo, depois
+    semelhança) em páginas de limit; has_more indica se há mais.
+    """
+    if len(q.strip()) < TYPEAHEAD_MIN_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Informe pelo menos {TYPEAHEAD_MIN_LENGTH} caracteres")
+    
+    clients = await fetch_search(db, search_clients_query(q, limit, skip))
+    return fast_response(ClientSearchPage, page(clients, limit))
 
 @router.post("/clients/", response_model=ClientRead)
-def create_client(
+async def create_client(
     client: ClientCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Cria um novo cliente"""
@@ -566,12 +493,13 @@ def create_client(
     )
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        await reference_cache.bump("clients")
         
-        new_client = db.execute(
+        new_client = (await db.execute(
             select(clients_table).where(clients_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        )).first()
         
         return {
             "id": new_client.id,
@@ -583,7 +511,7 @@ def create_client(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar cliente: {e}")
 
 
@@ -593,43 +521,59 @@ def create_client(
 # ===== EQUIPAMENTOS =====
 
 @router.get("/equipments/", response_model=List[EquipmentRead])
-def list_equipments(
+async def list_equipments(
     client_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Campos da resposta, ex.: id,type,brand,model"),
+    etag: Optional[str] = Depends(reference_cache.conditional("equipments")),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista equipamentos, opcionalmente filtrados por cliente"""
-    query = select(equipments_table)
+    """Lista equipamentos, opcionalmente filtrados por cliente (fields limita colunas e campos)"""
+    projection = parse_fields(fields, EQUIPMENT_FIELDS)
+    selected = projection[""] if projection is not None else EQUIPMENT_FIELDS
+    query = select(*[equipments_table.c[field] for field in selected])
     
     if client_id:
         query = query.where(equipments_table.c.client_id == client_id)
     
-    equipments = db.execute(query).fetchall()
+    equipments = (await db.execute(query)).fetchall()
     
-    return [
-        {
-            "id": equipment.id,
-            "type": equipment.type,
-            "brand": equipment.brand,
-            "model": equipment.model,
-            "serial_number": equipment.serial_number,
-            "client_id": equipment.client_id,
-            "created_at": equipment.created_at
-        }
-        for equipment in equipments
-    ]
+    if projection is not None:
+        return reference_cache.tagged(fast_response(List[partial_model(EquipmentRead, tuple(selected))], equipments), etag)
+    return reference_cache.tagged(fast_response(List[EquipmentRead], equipments), etag)
+
+@router.get("/equipments/search", response_model=EquipmentSearchPage)
+async def search_equipments(
+    q: Optional[str] = Query(None, max_length=100, description="Número de série, marca ou modelo"),
+    client_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=TYPEAHEAD_MAX_LIMIT),
+    skip: int = Query(0, ge=0, le=TYPEAHEAD_MAX_SKIP),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Busca de equipamentos (índices pg_trgm), opcionalmente de um cliente.
+
+    Sem q, pagina os equipamentos do client_id informado.
+    """
+    if q is not None and q.strip() and len(q.strip()) < TYPEAHEAD_MIN_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Informe pelo menos {TYPEAHEAD_MIN_LENGTH} caracteres")
+    if not (q and q.strip()) and not client_id:
+        raise HTTPException(status_code=400, detail="Informe q ou client_id")
+    
+    equipments = await fetch_search(db, search_equipments_query(q, client_id, limit, skip))
+    return fast_response(EquipmentSearchPage, page(equipments, limit))
 
 @router.post("/equipments/", response_model=EquipmentRead)
-def create_equipment(
+async def create_equipment(
     equipment: EquipmentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Cria um novo equipamento"""
     # Verificar se cliente existe
-    client = db.execute(
+    client = (await db.execute(
         select(clients_table).where(clients_table.c.id == equipment.client_id)
-    ).first()
+    )).first()
     
     if not client:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
@@ -643,12 +587,13 @@ def create_equipment(
     )
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        await reference_cache.bump("equipments")
         
-        new_equipment = db.execute(
+        new_equipment = (await db.execute(
             select(equipments_table).where(equipments_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        )).first()
         
         return {
             "id": new_equipment.id,
@@ -661,7 +606,7 @@ def create_equipment(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         if "unique" in str(e).lower():
             raise HTTPException(status_code=400, detail="Número de série já existe")
         raise HTTPException(status_code=400, detail=f"Erro ao criar equipamento: {e}")
@@ -673,52 +618,31 @@ def create_equipment(
 # ===== CHECKLISTS =====
 
 @router.get("/checklists/", response_model=List[ChecklistRead])
-def list_checklists(
-    db: Session = Depends(get_db),
+async def list_checklists(
+    etag: Optional[str] = Depends(reference_cache.conditional("checklists")),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista todos os checklists"""
-    checklists = db.execute(select(checklists_table)).fetchall()
-    
-    result = []
-    for checklist in checklists:
-        # Buscar itens do checklist
-        items = db.execute(
-            select(checklist_items_table).where(checklist_items_table.c.checklist_id == checklist.id)
-        ).fetchall()
-        
-        checklist_data = {
-            "id": checklist.id,
-            "name": checklist.name,
-            "items": [
-                {
-                    "id": item.id,
-                    "description": item.description,
-                    "checklist_id": item.checklist_id
-                }
-                for item in items
-            ]
-        }
-        result.append(checklist_data)
-    
-    return result
+    """Lista todos os checklists com seus itens (modelos em cache; 304 com If-None-Match)"""
+    return reference_cache.tagged(fast_response(List[ChecklistRead], await checklist_cache.get(db)), etag)
 
 @router.post("/checklists/", response_model=ChecklistRead)
-def create_checklist(
+async def create_checklist(
     checklist: ChecklistCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Cria um novo checklist (apenas admin)"""
     stmt = checklists_table.insert().values(name=checklist.name)
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        await reference_cache.bump("checklists")
         
-        new_checklist = db.execute(
+        new_checklist = (await db.execute(
             select(checklists_table).where(checklists_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        )).first()
         
         return {
             "id": new_checklist.id,
@@ -727,21 +651,21 @@ def create_checklist(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar checklist: {e}")
 
 @router.post("/checklists/{checklist_id}/items/", response_model=ChecklistItemRead)
-def create_checklist_item(
+async def create_checklist_item(
     checklist_id: int,
     item: ChecklistItemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Adiciona item a um checklist"""
     # Verificar se checklist existe
-    checklist = db.execute(
+    checklist = (await db.execute(
         select(checklists_table).where(checklists_table.c.id == checklist_id)
-    ).first()
+    )).first()
     
     if not checklist:
         raise HTTPException(status_code=404, detail="Checklist não encontrado")
@@ -752,12 +676,13 @@ def create_checklist_item(
     )
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        await reference_cache.bump("checklists")
         
-        new_item = db.execute(
+        new_item = (await db.execute(
             select(checklist_items_table).where(checklist_items_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        )).first()
         
         return {
             "id": new_item.id,
@@ -766,7 +691,7 @@ def create_checklist_item(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao criar item do checklist: {e}")
 
 
@@ -775,83 +700,92 @@ def create_checklist_item(
 
 # ===== RESPOSTAS DE CHECKLIST =====
 
-@router.get("/{order_id}/checklist-responses/")
-def get_checklist_responses(
+@router.get("/{order_id}/checklist-responses/", response_model=List[ChecklistResponseRead])
+async def get_checklist_responses(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Busca respostas do checklist de uma ordem de serviço"""
-    responses = db.execute(
-        select(os_checklist_responses_table).where(
-            os_checklist_responses_table.c.service_order_id == order_id
-        )
-    ).fetchall()
-    
-    result = []
-    for response in responses:
-        # Buscar item do checklist
-        item = db.execute(
-            select(checklist_items_table).where(
-                checklist_items_table.c.id == response.checklist_item_id
-            )
-        ).first()
-        
-        result.append({
-            "id": response.id,
-            "service_order_id": response.service_order_id,
-            "checklist_item_id": response.checklist_item_id,
-            "is_checked": response.is_checked,
-            "responded_at": response.responded_at,
-            "checklist_item": {
-                "id": item.id,
-                "description": item.description,
-                "checklist_id": item.checklist_id
-            } if item else None
-        })
-    
-    return result
+    # Respostas e itens em uma consulta
+    return fast_response(List[ChecklistResponseRead], await load_checklist_responses(db, order_id))
 
 @router.post("/{order_id}/checklist-responses/")
-def save_checklist_responses(
+async def save_checklist_responses(
     order_id: int,
     responses: List[ChecklistResponseCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Salva respostas do checklist de uma ordem de serviço"""
+    """Salva respostas do checklist de uma ordem de serviço.
+
+    As respostas enviadas substituem as gravadas, mas só o que mudou é
+    escrito: itens novos ou com is_checked diferente entram em um único
+    upsert multi-linhas (responded_at é atualizado só neles) e itens que
+    deixaram de ser enviados são removidos em um único DELETE.
+    """
     # Verificar se ordem existe
-    order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
     
+    # Em itens repetidos vale a última resposta enviada
+    submitted = {response.checklist_item_id: response.is_checked for response in responses}
+    
     try:
-        # Limpar respostas existentes
-        db.execute(
-            os_checklist_responses_table.delete().where(
-                os_checklist_responses_table.c.service_order_id == order_id
+        stored = {
+            row.checklist_item_id: row.is_checked
+            for row in await db.execute(
+                select(
+                    os_checklist_responses_table.c.checklist_item_id,
+                    os_checklist_responses_table.c.is_checked
+                ).where(os_checklist_responses_table.c.service_order_id == order_id)
             )
-        )
+        }
         
-        # Inserir novas respostas
-        for response in responses:
-            db.execute(
-                os_checklist_responses_table.insert().values(
-                    service_order_id=order_id,
-                    checklist_item_id=response.checklist_item_id,
-                    is_checked=response.is_checked
+        changed = [
+            {"service_order_id": order_id, "checklist_item_id": item_id, "is_checked": is_checked}
+            for item_id, is_checked in submitted.items()
+            if stored.get(item_id) != is_checked
+        ]
+        removed = [item_id for item_id in stored if item_id not in submitted]
+        
+        if removed:
+            await db.execute(
+                os_checklist_responses_table.delete().where(
+                    os_checklist_responses_table.c.service_order_id == order_id,
+                    os_checklist_responses_table.c.checklist_item_id.in_(removed)
                 )
             )
         
-        db.commit()
+        if changed:
+            stmt = insert(os_checklist_responses_table).values(changed)
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[
+                        os_checklist_responses_table.c.service_order_id,
+                        os_checklist_responses_table.c.checklist_item_id
+                    ],
+                    set_={"is_checked": stmt.excluded.is_checked, "responded_at": func.current_timestamp()},
+                    # Salvamento simultâneo pode já ter gravado o mesmo valor
+                    where=os_checklist_responses_table.c.is_checked != stmt.excluded.is_checked
+                )
+            )
         
-        return {"message": "Respostas do checklist salvas com sucesso"}
+        await db.commit()
+        
+        return {
+            "message": "Respostas do checklist salvas com sucesso",
+            "changed": len(changed),
+            "removed": len(removed),
+            "unchanged": len(submitted) - len(changed)
+        }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao salvar respostas: {e}")
 
 
@@ -859,32 +793,19 @@ def save_checklist_responses(
 # Endpoints para Fotos
 # =========================================
 
-# Configuração do diretório de upload
-UPLOAD_DIR = "/code/uploads"
-ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-
-def ensure_upload_dir():
-    """Garante que o diretório de upload existe"""
-    if not os.path.exists(UPLOAD_DIR):
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-def is_allowed_file(filename: str) -> bool:
-    """Verifica se o arquivo tem uma extensão permitida"""
-    return any(filename.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS)
-
 @router.post("/{order_id}/photos", response_model=PhotoRead)
 async def upload_photo(
     order_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Upload de uma foto para uma ordem de serviço"""
     # Verificar se ordem existe
-    order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
@@ -896,128 +817,427 @@ async def upload_photo(
             detail="Formato de arquivo não permitido. Use: jpg, jpeg, png, gif, bmp, webp"
         )
     
-    # Verificar tamanho do arquivo
-    file_content = await file.read()
-    if len(file_content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
+    # Copiar em blocos para um temporário (calculando o SHA-256), abortando ao passar de MAX_FILE_SIZE
+    temp_path, file_size, digest = await save_upload_to_temp(file)
     
+    photo_id = None
     try:
-        # Garantir que o diretório existe
-        ensure_upload_dir()
-        
-        # Gerar nome único para o arquivo
+        # Conteúdo endereçado pelo digest: bytes iguais são armazenados uma única vez
         file_extension = os.path.splitext(file.filename)[1].lower()
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        # Salvar arquivo
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+        stored_filename, ref_count = await acquire_blob(db, digest, f"{digest}{file_extension}", file_size)
         
         # Salvar referência no banco
-        photo_url = f"/uploads/{unique_filename}"
+        photo_url = f"/uploads/{stored_filename}"
         stmt = os_photos_table.insert().values(
             service_order_id=order_id,
-            photo_url=photo_url
+            photo_url=photo_url,
+            blob_digest=digest
         )
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        photo_id = result.inserted_primary_key[0]
+        
+        # Arquivo só aparece no armazenamento depois do commit;
+        # conteúdo repetido apenas descarta o temporário
+        await photo_storage.put(temp_path, stored_filename, overwrite=ref_count == 1)
         
         # Buscar foto criada
-        photo = db.execute(
-            select(os_photos_table).where(os_photos_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        photo = (await db.execute(
+            select(os_photos_table).where(os_photos_table.c.id == photo_id)
+        )).first()
+        
+        # Miniatura, média e WebP são geradas (ou reaproveitadas) depois da resposta
+        background_tasks.add_task(photo_variant_pipeline.generate, photo_id, stored_filename, digest)
         
         return {
             "id": photo.id,
             "service_order_id": photo.service_order_id,
             "photo_url": photo.photo_url,
-            "uploaded_at": photo.uploaded_at
+            "uploaded_at": photo.uploaded_at,
+            "thumbnail_url": thumbnail_url(photo.photo_url)
         }
         
     except Exception as e:
-        # Se houver erro, remover arquivo se foi criado
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        db.rollback()
+        # Se houver erro, remover o temporário e desfazer o registro já gravado
+        await discard_upload(temp_path)
+        await db.rollback()
+        if photo_id is not None:
+            await db.execute(os_photos_table.delete().where(os_photos_table.c.id == photo_id))
+            orphan_filename = await release_blob(db, digest)
+            await db.commit()
+            # Arquivo removido só depois do commit (como na exclusão de fotos)
+            if orphan_filename:
+                await remove_orphan_files(digest, [orphan_filename])
         raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
 
-@router.get("/{order_id}/photos", response_model=List[PhotoRead])
-def get_order_photos(
+@router.post("/{order_id}/photos/bulk", response_model=PhotoBulkUploadResponse)
+async def upload_photos_bulk(
     order_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista todas as fotos de uma ordem de serviço"""
-    # Verificar se ordem existe
-    order = db.execute(
-        select(service_orders_table).where(service_orders_table.c.id == order_id)
-    ).first()
+    """Upload de várias fotos de uma ordem de serviço em uma requisição.
+
+    Os arquivos são gravados em paralelo (até BULK_UPLOAD_CONCURRENCY por
+    vez); blobs e fotos são registrados com um INSERT em lote cada, em uma
+    única transação. Um arquivo recusado (formato, tamanho) não impede os
+    demais: o resultado é por arquivo, na ordem do envio.
+    """
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
     
-    # Buscar fotos
-    photos = db.execute(
-        select(os_photos_table).where(os_photos_table.c.service_order_id == order_id)
-        .order_by(os_photos_table.c.uploaded_at.desc())
-    ).fetchall()
+    if len(files) > MAX_BULK_UPLOAD_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_UPLOAD_FILES} arquivos por envio")
     
-    return [
-        {
+    results = [{"filename": file.filename, "status": "error", "photo": None, "detail": None} for file in files]
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_CONCURRENCY)
+    
+    async def save(file: UploadFile):
+        if not is_allowed_file(file.filename or ""):
+            raise HTTPException(
+                status_code=400,
+                detail="Formato de arquivo não permitido. Use: jpg, jpeg, png, gif, bmp, webp"
+            )
+        async with semaphore:
+            return await save_upload_to_temp(file)
+    
+    # Copiar cada arquivo para um temporário (com SHA-256), em paralelo
+    saved = await asyncio.gather(*(save(file) for file in files), return_exceptions=True)
+    pending = {}  # índice -> (temporário, tamanho, digest)
+    for index, outcome in enumerate(saved):
+        if isinstance(outcome, HTTPException):
+            results[index]["detail"] = outcome.detail
+        elif isinstance(outcome, BaseException):
+            results[index]["detail"] = f"Erro ao gravar arquivo: {outcome}"
+        else:
+            pending[index] = outcome
+    
+    indexes_by_digest = {}
+    for index, (_, _, digest) in pending.items():
+        indexes_by_digest.setdefault(digest, []).append(index)
+    
+    try:
+        try:
+            blobs = await acquire_blobs(db, [
+                {
+                    "digest": digest,
+                    "filename": f"{digest}{os.path.splitext(files[indexes[0]].filename)[1].lower()}",
+                    "size_bytes": pending[indexes[0]][1],
+                    "count": len(indexes)
+                }
+                for digest, indexes in indexes_by_digest.items()
+            ])
+            
+            photos = {}
+            if pending:
+                # Um único INSERT multi-linhas; RETURNING na ordem dos parâmetros
+                rows = (await db.execute(
+                    os_photos_table.insert().returning(
+                        os_photos_table.c.id,
+                        os_photos_table.c.service_order_id,
+                        os_photos_table.c.photo_url,
+                        os_photos_table.c.uploaded_at,
+                        sort_by_parameter_order=True
+                    ),
+                    [
+                        {
+                            "service_order_id": order_id,
+                            "photo_url": f"/uploads/{blobs[pending[index][2]][0]}",
+                            "blob_digest": pending[index][2]
+                        }
+                        for index in pending
+                    ]
+                )).fetchall()
+                photos = dict(zip(pending, rows))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
+        
+        # Arquivos só aparecem no armazenamento depois do commit; cada conteúdo
+        # é gravado uma vez, mesmo repetido no lote ou já armazenado
+        async def store(digest: str, indexes: List[int]):
+            stored_filename, _, is_new = blobs[digest]
+            async with semaphore:
+                await photo_storage.put(pending[indexes[0]][0], stored_filename, overwrite=is_new)
+        
+        digests = list(indexes_by_digest)
+        stored = await asyncio.gather(
+            *(store(digest, indexes_by_digest[digest]) for digest in digests), return_exceptions=True
+        )
+        
+        failures = {digest: outcome for digest, outcome in zip(digests, stored) if isinstance(outcome, BaseException)}
+        if failures:
+            # Desfazer as fotos cujo conteúdo não foi armazenado
+            failed_indexes = [index for digest in failures for index in indexes_by_digest[digest]]
+            await db.execute(os_photos_table.delete().where(
+                os_photos_table.c.id.in_([photos[index].id for index in failed_indexes])
+            ))
+            orphan_files = []
+            for digest, error in failures.items():
+                for index in indexes_by_digest[digest]:
+                    orphan_filename = await release_blob(db, digest)
+                    if orphan_filename:
+                        orphan_files.append((digest, orphan_filename))
+                    results[index]["detail"] = f"Erro ao armazenar arquivo: {error}"
+                    del photos[index]
+            await db.commit()
+            # Arquivos removidos depois do commit: um rollback não deixa fotos sem arquivo
+            for digest, orphan_filename in orphan_files:
+                background_tasks.add_task(remove_orphan_files, digest, [orphan_filename])
+    finally:
+        # Temporários não consumidos (repetidos no lote, conteúdo já armazenado, falhas)
+        for temp_path, _, _ in pending.values():
+            await discard_upload(temp_path)
+    
+    # Variantes geradas depois da resposta; repetidos reaproveitam as do primeiro
+    for index, photo in photos.items():
+        results[index].update(status="ok", photo={
             "id": photo.id,
             "service_order_id": photo.service_order_id,
             "photo_url": photo.photo_url,
-            "uploaded_at": photo.uploaded_at
-        }
-        for photo in photos
-    ]
+            "uploaded_at": photo.uploaded_at,
+            "thumbnail_url": thumbnail_url(photo.photo_url)
+        })
+        background_tasks.add_task(
+            photo_variant_pipeline.generate, photo.id, os.path.basename(photo.photo_url), pending[index][2]
+        )
+    
+    return {
+        "uploaded": len(photos),
+        "failed": len(results) - len(photos),
+        "results": results
+    }
+
+@router.post("/{order_id}/photos/upload-url", response_model=PhotoUploadUrl)
+async def create_photo_upload_url(
+    order_id: int,
+    upload: PhotoUploadUrlRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """URL pré-assinada para o cliente enviar a foto direto ao armazenamento.
+
+    O objeto é gravado com o nome definitivo (digest); o tamanho e o SHA-256
+    fazem parte da assinatura. Depois do envio o cliente chama
+    POST /orders/{id}/photos/complete com o upload_token recebido, que só
+    vale para este usuário, esta ordem e este arquivo.
+    """
+    if not photo_storage.supports_direct_upload:
+        raise HTTPException(
+            status_code=501,
+            detail="Upload direto não suportado pelo armazenamento atual; use POST /orders/{id}/photos"
+        )
+    
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
+    
+    if not is_allowed_file(upload.filename):
+        raise HTTPException(
+            status_code=400, 
+            detail="Formato de arquivo não permitido. Use: jpg, jpeg, png, gif, bmp, webp"
+        )
+    
+    if upload.size > MAX_FILE_SIZE:
+        raise file_too_large()
+    
+    filename = f"{upload.sha256}{os.path.splitext(upload.filename)[1].lower()}"
+    presigned = await photo_storage.presigned_upload(filename, upload.sha256, upload.size)
+    return {
+        **presigned,
+        "upload_token": create_upload_grant(current_user.id, order_id, filename, presigned["expires_in"])
+    }
+
+@router.post("/{order_id}/photos/complete", response_model=PhotoRead)
+async def complete_photo_upload(
+    order_id: int,
+    upload: PhotoUploadComplete,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Registra uma foto enviada direto ao armazenamento pela URL pré-assinada"""
+    if not photo_storage.supports_direct_upload:
+        raise HTTPException(status_code=501, detail="Upload direto não suportado pelo armazenamento atual")
+    
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
+    
+    if not is_allowed_file(upload.filename):
+        raise HTTPException(status_code=400, detail="Formato de arquivo não permitido")
+    
+    uploaded_filename = f"{upload.sha256}{os.path.splitext(upload.filename)[1].lower()}"
+    # Só o arquivo de uma URL pré-assinada emitida para este usuário e esta ordem
+    if not verify_upload_grant(upload.upload_token, current_user.id, order_id, uploaded_filename):
+        raise HTTPException(status_code=403, detail="Upload não autorizado para esta ordem")
+    
+    stored = await photo_storage.head(uploaded_filename)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado no armazenamento")
+    if stored["size"] > MAX_FILE_SIZE:
+        await photo_storage.delete(uploaded_filename)
+        raise file_too_large()
+    if stored["sha256"] is not None:
+        checksum_matches = stored["sha256"] == base64.b64encode(bytes.fromhex(upload.sha256)).decode("ascii")
+    else:
+        # Objeto sem checksum guardado pelo armazenamento: o nome (digest) só é
+        # confiável depois de conferir o conteúdo aqui
+        async with photo_storage.local_copy(uploaded_filename) as local_path:
+            checksum_matches = await run_in_threadpool(file_sha256, local_path) == upload.sha256
+    if not checksum_matches:
+        raise HTTPException(status_code=400, detail="Conteúdo não confere com o SHA-256 informado")
+    
+    try:
+        stored_filename, ref_count = await acquire_blob(db, upload.sha256, uploaded_filename, stored["size"])
+        
+        # Conteúdo novo: confirmar que o objeto não foi removido por uma
+        # exclusão simultânea da última referência ao mesmo digest
+        if ref_count == 1 and await photo_storage.head(stored_filename) is None:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Arquivo removido durante o registro; envie novamente")
+        
+        result = await db.execute(
+            os_photos_table.insert().values(
+                service_order_id=order_id,
+                photo_url=f"/uploads/{stored_filename}",
+                blob_digest=upload.sha256
+            )
+        )
+        await db.commit()
+        photo_id = result.inserted_primary_key[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao registrar foto: {str(e)}")
+    
+    # Mesmo conteúdo já armazenado com outra extensão: a cópia enviada sobra
+    if stored_filename != uploaded_filename:
+        await photo_storage.delete(uploaded_filename)
+    
+    photo = (await db.execute(
+        select(os_photos_table).where(os_photos_table.c.id == photo_id)
+    )).first()
+    
+    background_tasks.add_task(photo_variant_pipeline.generate, photo_id, stored_filename, upload.sha256)
+    
+    return {
+        "id": photo.id,
+        "service_order_id": photo.service_order_id,
+        "photo_url": photo.photo_url,
+        "uploaded_at": photo.uploaded_at,
+        "thumbnail_url": thumbnail_url(photo.photo_url)
+    }
+
+@router.get("/{order_id}/photos", response_model=List[PhotoRead])
+async def get_order_photos(
+    order_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Lista todas as fotos de uma ordem de serviço"""
+    # Verificar se ordem existe
+    order = (await db.execute(
+        select(service_orders_table.c.id).where(service_orders_table.c.id == order_id)
+    )).first()
+    
+    if not order:
+        raise HTTPException(status_code=404, detail="Ordem de serviço não encontrada")
+    
+    # Fotos e variantes em uma consulta
+    return fast_response(List[PhotoRead], (await load_photos(db, [order_id]))[order_id])
 
 @router.delete("/photos/{photo_id}")
-def delete_photo(
+async def delete_photo(
     photo_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Remove uma foto de uma ordem de serviço"""
     # Buscar foto
-    photo = db.execute(
+    photo = (await db.execute(
         select(os_photos_table).where(os_photos_table.c.id == photo_id)
-    ).first()
+    )).first()
     
     if not photo:
         raise HTTPException(status_code=404, detail="Foto não encontrada")
     
+    variants = (await db.execute(
+        select(os_photo_variants_table.c.photo_url).where(os_photo_variants_table.c.photo_id == photo_id)
+    )).fetchall()
+    
     try:
-        # Remover arquivo do sistema
-        file_path = os.path.join(UPLOAD_DIR, os.path.basename(photo.photo_url))
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # Remover registros do banco
+        await db.execute(os_photo_variants_table.delete().where(os_photo_variants_table.c.photo_id == photo_id))
+        await db.execute(os_photos_table.delete().where(os_photos_table.c.id == photo_id))
         
-        # Remover registro do banco
-        db.execute(os_photos_table.delete().where(os_photos_table.c.id == photo_id))
-        db.commit()
+        # Arquivos só saem do armazenamento quando nenhuma outra foto usa o conteúdo
+        orphan_files = []
+        if photo.blob_digest is not None:
+            orphan_filename = await release_blob(db, photo.blob_digest)
+            if orphan_filename:
+                orphan_files = [orphan_filename] + [
+                    variant_filename(orphan_filename, variant) for variant in PHOTO_VARIANTS
+                ]
+        else:
+            orphan_files = [os.path.basename(photo.photo_url)] + [
+                os.path.basename(variant.photo_url) for variant in variants
+            ]
         
-        return {"message": "Foto removida com sucesso"}
+        await db.commit()
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao remover foto: {str(e)}")
-
-@router.get("/uploads/{filename}")
-async def serve_uploaded_file(filename: str):
-    """Serve arquivos de upload"""
-    file_path = os.path.join(UPLOAD_DIR, filename)
     
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    # Arquivos removidos depois do commit: um rollback não deixa fotos sem arquivo
+    if orphan_files:
+        background_tasks.add_task(remove_orphan_files, photo.blob_digest, orphan_files)
     
+    return {"message": "Foto removida com sucesso"}
+
+@router.get("/uploads/{filename}")
+async def serve_uploaded_file(
+    request: Request,
+    filename: str,
+    size: Optional[str] = Query(None, pattern="^(thumb|medium|original)$"),
+    image_format: Optional[str] = Query(None, alias="format", pattern="^webp$")
+):
+    """Serve arquivos de upload.
+
+    Com size=thumb|medium serve a variante redimensionada (em WebP com
+    format=webp); enquanto ela não foi gerada, serve o original com cache
+    curto. No armazenamento local, respostas trazem ETag forte, aceitam
+    Range e respondem 304; no S3, redirecionam para uma URL pré-assinada.
+    """
     # Verificar se é uma imagem
     if not is_allowed_file(filename):
         raise HTTPException(status_code=403, detail="Tipo de arquivo não permitido")
     
-    from fastapi.responses import FileResponse
-    return FileResponse(file_path)
+    served_filename = filename
+    immutable = True
+    if size and size != "original":
+        served_filename = variant_filename(filename, variant_name(size, image_format))
+        if not await photo_storage.exists(served_filename):
+            served_filename = filename
+            immutable = False
+    
+    try:
+        return await photo_storage.serve(request, served_filename, immutable)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
@@ -1,78 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..models.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import get_db
 from ..models.auth import users_table
 from ..models.auth_models import UserBase, UserCreate, UserRead, UserUpdate
 from ..middleware.auth import get_current_active_user, require_admin
 from ..utils.security import get_password_hash
-from typing import List
+from ..utils.token_cache import token_cache
+from ..utils.order_loader import USER_FIELDS
+from ..utils.projection import parse_fields, partial_model
+from ..utils.serialization import fast_response
+from ..utils.reference_cache import reference_cache
+from typing import List, Optional
 
 router = APIRouter(
     prefix="/users",
     tags=["users"]
 )
 
-# Dependência para obter a sessão
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Rotas protegidas
 @router.get("/", response_model=List[UserRead])
-def list_users(
-    db: Session = Depends(get_db),
+async def list_users(
+    fields: Optional[str] = Query(None, description="Campos da resposta, ex.: id,name,username"),
+    etag: Optional[str] = Depends(reference_cache.conditional("users")),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Lista todos os usuários (requer autenticação)"""
-    query = db.execute(users_table.select()).fetchall()
-    
-    # Converter tuplas para dicionários
-    users = []
-    for row in query:
-        user_dict = {
-            "id": row.id,
-            "username": row.username,
-            "name": row.name,
-            "email": row.email,
-            "role": row.role,
-            "is_active": row.is_active,
-            "created_at": row.created_at
-        }
-        users.append(user_dict)
-    
-    return users
+    """Lista todos os usuários (requer autenticação; fields limita colunas e campos).
+
+    Responde 304 a If-None-Match com a ETag atual, sem consultar o banco.
+    """
+    projection = parse_fields(fields, USER_FIELDS)
+    selected = projection[""] if projection is not None else USER_FIELDS
+    users = (await db.execute(select(*[users_table.c[field] for field in selected]))).fetchall()
+    
+    # As linhas vão direto ao serializador do modelo (sem dicionários intermediários)
+    if projection is not None:
+        return reference_cache.tagged(fast_response(List[partial_model(UserRead, tuple(selected))], users), etag)
+    return reference_cache.tagged(fast_response(List[UserRead], users), etag)
 
 @router.get("/{user_id}", response_model=UserRead)
-def get_user(
+async def get_user(
     user_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
     """Busca um usuário por ID (requer autenticação)"""
-    query = db.execute(
+    query = (await db.execute(
         users_table.select().where(users_table.c.id == user_id)
-    ).first()
+    )).first()
     
     if not query:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
-    return {
-        "id": query.id,
-        "username": query.username,
-        "name": query.name,
-        "email": query.email,
-        "role": query.role,
-        "is_active": query.is_active,
-        "created_at": query.created_at
-    }
+    return fast_response(UserRead, query)
 
 @router.post("/", response_model=UserRead)
-def create_user(
+async def create_user(
     user: UserCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(require_admin)  # Apenas admin pode criar usuários
 ):
     """Cria um novo usuário (requer privilégios de administrador)"""
@@ -84,7 +70,7 @@ def create_user(
         raise HTTPException(status_code=400, detail="Email inválido")
     
     # Hash da senha
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     
     stmt = users_table.insert().values(
         username=user.username,
@@ -95,42 +81,35 @@ def create_user(
     )
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
+        await reference_cache.bump("users")
         
         # Buscar o usuário criado
-        new_user = db.execute(
+        new_user = (await db.execute(
             users_table.select().where(users_table.c.id == result.inserted_primary_key[0])
-        ).first()
+        )).first()
         
-        return {
-            "id": new_user.id,
-            "username": new_user.username,
-            "name": new_user.name,
-            "email": new_user.email,
-            "role": new_user.role,
-            "is_active": new_user.is_active,
-            "created_at": new_user.created_at
-        }
+        return fast_response(UserRead, new_user)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         if "unique" in str(e).lower():
             raise HTTPException(status_code=400, detail="Username ou email já existem")
         raise HTTPException(status_code=400, detail=f"Erro ao criar usuário: {e}")
 
 @router.put("/{user_id}", response_model=UserRead)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(require_admin)  # Apenas admin pode atualizar usuários
 ):
     """Atualiza um usuário (requer privilégios de administrador)"""
     # Verificar se usuário existe
-    existing_user = db.execute(
+    existing_user = (await db.execute(
         users_table.select().where(users_table.c.id == user_id)
-    ).first()
+    )).first()
     
     if not existing_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -150,7 +129,7 @@ def update_user(
     
     # Atualizar senha se fornecida
     if user_update.password is not None and user_update.password.strip():
-        update_data["password_hash"] = get_password_hash(user_update.password)
+        update_data["password_hash"] = await get_password_hash(user_update.password)
     
     if not update_data:
         raise HTTPException(status_code=400, detail="Nenhum dado fornecido para atualização")
@@ -161,44 +140,40 @@ def update_user(
     ).values(**update_data)
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
+        # Tokens em cache carregam o usuário antigo
+        token_cache.invalidate_user(user_id)
+        await reference_cache.bump("users")
+        
         # Buscar usuário atualizado
-        updated_user = db.execute(
+        updated_user = (await db.execute(
             users_table.select().where(users_table.c.id == user_id)
-        ).first()
+        )).first()
         
-        return {
-            "id": updated_user.id,
-            "username": updated_user.username,
-            "name": updated_user.name,
-            "email": updated_user.email,
-            "role": updated_user.role,
-            "is_active": updated_user.is_active,
-            "created_at": updated_user.created_at
-        }
+        return fast_response(UserRead, updated_user)
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         if "unique" in str(e).lower():
             raise HTTPException(status_code=400, detail="Username ou email já existem")
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar usuário: {e}")
 
 @router.delete("/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(require_admin)  # Apenas admin pode deletar usuários
 ):
     """Exclui um usuário permanentemente (requer privilégios de administrador)"""
     # Verificar se usuário existe
-    existing_user = db.execute(
+    existing_user = (await db.execute(
         users_table.select().where(users_table.c.id == user_id)
-    ).first()
+    )).first()
     
     if not existing_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
@@ -211,14 +186,17 @@ def delete_user(
     stmt = users_table.delete().where(users_table.c.id == user_id)
     
     try:
-        result = db.execute(stmt)
-        db.commit()
+        result = await db.execute(stmt)
+        await db.commit()
         
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
+        token_cache.invalidate_user(user_id)
+        await reference_cache.bump("users")
+        
         return {"message": "Usuário excluído com sucesso"}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Erro ao excluir usuário: {e}")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import threading
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.orders import checklists_table, checklist_items_table
+from .version_store import VERSION_STORE, VersionStore, version_store
+
+
+async def load_checklists(db: AsyncSession) -> List[dict]:
+    """Carrega todos os checklists com seus itens em uma única consulta"""
+    rows = (await db.execute(
+        select(
+            checklists_table.c.id,
+            checklists_table.c.name,
+            checklist_items_table.c.id.label("item_id"),
+            checklist_items_table.c.description
+        )
+        .select_from(checklists_table.outerjoin(
+            checklist_items_table, checklist_items_table.c.checklist_id == checklists_table.c.id
+        ))
+        .order_by(checklists_table.c.id, checklist_items_table.c.id)
+    )).fetchall()
+
+    checklists = {}
+    for row in rows:
+        checklist = checklists.setdefault(row.id, {"id": row.id, "name": row.name, "items": []})
+        if row.item_id is not None:
+            checklist["items"].append({
+                "id": row.item_id,
+                "description": row.description,
+                "checklist_id": row.id
+            })
+    return list(checklists.values())
+
+
+class ChecklistTemplateCache:
+    """Cache em memória dos modelos de checklist (checklists e itens).
+
+    Os modelos mudam pouco e são lidos a cada visualização de OS. A cópia
+    vale enquanto a versão de "checklists" no armazenamento de versões for
+    a mesma do carregamento; as escritas trocam essa versão após o commit
+    (reference_cache.bump), então com VERSION_STORE=redis uma escrita em
+    qualquer worker invalida o cache de todos. A versão é lida antes da
+    consulta: um carregamento concorrente com uma escrita fica guardado com
+    a versão anterior e é descartado na leitura seguinte.
+    """
+
+    resource = "checklists"
+
+    def __init__(self, store: VersionStore = version_store):
+        self.store = store
+        self._entry = None  # (versão, checklists)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession) -> List[dict]:
+        """Checklists com itens, do cache ou do banco"""
+        version = await self.store.get(self.resource)
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.invalidations += 1
+
+        checklists = await load_checklists(db)
+        with self._lock:
+            self._entry = (version, checklists)
+        return checklists
+
+    def stats(self) -> dict:
+        """Contadores do cache para monitoramento"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "store": VERSION_STORE,
+                "version": self._entry[0] if self._entry is not None else None,
+                "cached": self._entry is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# Instância compartilhada pelo processo
+checklist_cache = ChecklistTemplateCache()
@@ -0,0 +1,72 @@
+import os
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+
+# Cache dos arquivos de upload (os nomes são únicos e o conteúdo nunca muda)
+UPLOAD_CACHE_MAX_AGE_SECONDS = int(os.getenv("UPLOAD_CACHE_MAX_AGE_SECONDS", "31536000"))  # 1 ano
+# Resposta provisória (variante ainda não gerada): cache curto
+UPLOAD_FALLBACK_MAX_AGE_SECONDS = int(os.getenv("UPLOAD_FALLBACK_MAX_AGE_SECONDS", "60"))
+
+# Entrega dos bytes pelo proxy da frente: "" (desativado), "x-accel-redirect" (nginx) ou "x-sendfile"
+UPLOAD_SENDFILE_MODE = os.getenv("UPLOAD_SENDFILE_MODE", "").lower()
+UPLOAD_ACCEL_REDIRECT_PREFIX = os.getenv("UPLOAD_ACCEL_REDIRECT_PREFIX", "/internal-uploads/")
+
+
+def file_etag(filename: str) -> str:
+    """ETag forte derivado do nome do arquivo servido (imutável)"""
+    return f'"{filename}"'
+
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Avalia If-None-Match (prioritário) e If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def serve_file(request: Request, file_path: str, relative_path: str, immutable: bool = True) -> Response:
+    """Serve um arquivo de upload com validadores de cache, 304 e Range.
+
+    immutable=False é usado quando o conteúdo servido é provisório (ex.: o
+    original no lugar de uma variante ainda não gerada) e pode mudar na
+    mesma URL. Levanta FileNotFoundError se o arquivo não existir.
+    """
+    stat_result = await run_in_threadpool(os.stat, file_path)
+
+    if immutable:
+        cache_control = f"public, max-age={UPLOAD_CACHE_MAX_AGE_SECONDS}, immutable"
+    else:
+        cache_control = f"public, max-age={UPLOAD_FALLBACK_MAX_AGE_SECONDS}"
+    headers = {
+        "ETag": file_etag(os.path.basename(relative_path)),
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+
+    if is_not_modified(request, headers["ETag"], stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    if UPLOAD_SENDFILE_MODE == "x-accel-redirect":
+        headers["X-Accel-Redirect"] = UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path.lstrip("/")
+        return Response(headers=headers, media_type=media_type)
+    if UPLOAD_SENDFILE_MODE == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(file_path)
+        return Response(headers=headers, media_type=media_type)
+
+    # FileResponse trata Range/If-Range (206) e mantém os cabeçalhos acima
+    return FileResponse(file_path, headers=headers, media_type=media_type, stat_result=stat_result)
@@ -0,0 +1,55 @@
+import os
+from typing import List
+
+# Variantes geradas para cada foto: lado maior em pixels e formato
+PHOTO_VARIANTS = {
+    "thumb": {"max_size": 320, "format": "JPEG", "ext": ".jpg", "quality": 80},
+    "medium": {"max_size": 1280, "format": "JPEG", "ext": ".jpg", "quality": 82},
+    "thumb_webp": {"max_size": 320, "format": "WEBP", "ext": ".webp", "quality": 75},
+    "medium_webp": {"max_size": 1280, "format": "WEBP", "ext": ".webp", "quality": 78},
+}
+
+
+def variant_name(size: str, image_format: str = None) -> str:
+    """Nome da variante para o tamanho (thumb, medium) e formato pedidos"""
+    return f"{size}_webp" if image_format == "webp" else size
+
+
+def variant_filename(filename: str, variant: str) -> str:
+    """Nome do arquivo da variante, derivado do nome do original"""
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_{variant}{PHOTO_VARIANTS[variant]['ext']}"
+
+
+def render_variants(source_path: str, dest_dir: str, filename: str) -> List[dict]:
+    """Gera todas as variantes de uma foto (executa no pool de processos).
+
+    Cada variante é gravada em um temporário e renomeada, então um arquivo
+    parcial nunca é servido. Retorna os metadados de cada variante gerada.
+    """
+    from PIL import Image, ImageOps
+
+    results = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for name, spec in PHOTO_VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail((spec["max_size"], spec["max_size"]), Image.LANCZOS)
+
+            variant_file = variant_filename(filename, name)
+            path = os.path.join(dest_dir, variant_file)
+            temp_path = f"{path}.part"
+            variant.save(temp_path, format=spec["format"], quality=spec["quality"], optimize=True)
+            os.replace(temp_path, path)
+
+            results.append({
+                "variant": name,
+                "filename": variant_file,
+                "width": variant.width,
+                "height": variant.height,
+                "size_bytes": os.path.getsize(path)
+            })
+    return results
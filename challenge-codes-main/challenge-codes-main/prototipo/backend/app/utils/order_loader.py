@@ -0,0 +1,245 @@
+import os
+from sqlalchemy import select, func, literal_column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Sequence
+from datetime import datetime, timezone
+
+from ..models.orders import (
+    service_orders_table, clients_table, equipments_table, os_photos_table, os_photo_variants_table,
+    os_checklist_responses_table, checklist_items_table
+)
+from ..models.auth import users_table
+
+# Campos serializados de cada entidade
+ORDER_FIELDS = (
+    "id", "title", "description", "activities_description", "status",
+    "client_id", "equipment_id", "user_id", "created_at", "updated_at"
+)
+CLIENT_FIELDS = ("id", "name", "email", "phone", "address", "created_at")
+EQUIPMENT_FIELDS = ("id", "type", "brand", "model", "serial_number", "client_id", "created_at")
+USER_FIELDS = ("id", "username", "name", "email", "role", "is_active", "created_at")
+PHOTO_FIELDS = ("id", "service_order_id", "photo_url", "uploaded_at")
+
+# O asyncpg prepara as queries e, depois de algumas execuções, o PostgreSQL
+# pode passar a usar o plano genérico, que não conhece os valores. Na busca
+# textual a seletividade depende do termo: o plano é sempre o customizado
+CUSTOM_PLAN_SETTINGS = text("SET LOCAL plan_cache_mode = force_custom_plan")
+
+
+# Relacionamentos da ordem: nome -> (tabela, campos, coluna da ordem)
+ORDER_RELATIONS = {
+    "client": (clients_table, CLIENT_FIELDS, service_orders_table.c.client_id),
+    "equipment": (equipments_table, EQUIPMENT_FIELDS, service_orders_table.c.equipment_id),
+    "user": (users_table, USER_FIELDS, service_orders_table.c.user_id),
+}
+
+
+def orders_query(
+    relations: Sequence[str] = tuple(ORDER_RELATIONS),
+    fields: Optional[Dict[str, Sequence[str]]] = None
+):
+    """Query base: ordens com cliente, equipamento e técnico em um único JOIN.
+
+    relations limita os relacionamentos no JOIN; os demais ficam de fora do
+    SQL (e saem como None em load_orders). fields (ver
+    utils.projection.parse_fields) limita também as colunas: "" para a
+    ordem e o nome de cada relacionamento, que só entra no JOIN se pedido.
+    """
+    if fields is not None:
+        relations = [name for name in ORDER_RELATIONS if name in fields]
+    columns = [service_orders_table.c[field] for field in (fields[""] if fields is not None else ORDER_FIELDS)]
+    joined = service_orders_table
+    for name in relations:
+        table, related_fields, foreign_key = ORDER_RELATIONS[name]
+        if fields is not None:
+            related_fields = fields[name]
+        columns += [table.c[field] for field in related_fields]
+        joined = joined.outerjoin(table, table.c.id == foreign_key)
+    return select(*columns).select_from(joined)
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    """As colunas são TIMESTAMP sem fuso; o asyncpg não aceita datetimes com fuso"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def filter_orders(
+    query,
+    statuses: Optional[List[str]] = None,
+    user_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    equipment_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    updated_from: Optional[datetime] = None,
+    updated_to: Optional[datetime] = None,
+    search: Optional[str] = None
+):
+    """Aplica os filtros da listagem de ordens na query"""
+    orders = service_orders_table.c
+
+    if statuses:
+        query = query.where(orders.status.in_(statuses))
+    if user_id:
+        query = query.where(orders.user_id == user_id)
+    if client_id:
+        query = query.where(orders.client_id == client_id)
+    if equipment_id:
+        query = query.where(orders.equipment_id == equipment_id)
+    if created_from:
+        query = query.where(orders.created_at >= _as_naive_utc(created_from))
+    if created_to:
+        query = query.where(orders.created_at <= _as_naive_utc(created_to))
+    if updated_from:
+        query = query.where(orders.updated_at >= _as_naive_utc(updated_from))
+    if updated_to:
+        query = query.where(orders.updated_at <= _as_naive_utc(updated_to))
+
+    # Busca textual usando o search_vector (índice GIN)
+    if search and search.strip():
+        ts_query = func.websearch_to_tsquery(literal_column("'portuguese'::regconfig"), search.strip())
+        query = query.where(orders.search_vector.op("@@")(ts_query))
+
+    return query
+
+
+def _related(mapping, table, fields):
+    """Extrai os campos (selecionados) de uma tabela relacionada da linha do JOIN"""
+    if table.c.id not in mapping or mapping[table.c.id] is None:
+        return None
+    return {field: mapping[table.c[field]] for field in fields if table.c[field] in mapping}
+
+
+def _order_from_row(row) -> dict:
+    """Monta o dicionário da ordem a partir de uma linha de orders_query()"""
+    mapping = row._mapping
+    order = {
+        field: mapping[service_orders_table.c[field]]
+        for field in ORDER_FIELDS
+        if service_orders_table.c[field] in mapping
+    }
+    for name, (table, fields, _) in ORDER_RELATIONS.items():
+        order[name] = _related(mapping, table, fields)
+    return order
+
+
+def thumbnail_url(photo_url: str) -> str:
+    """URL da miniatura (o servidor entrega o original enquanto ela não existe)"""
+    return f"/orders/uploads/{os.path.basename(photo_url)}?size=thumb"
+
+
+def photos_query(order_ids: List[int]):
+    """Fotos de várias ordens com as variantes (JOIN + IN)"""
+    return (
+        select(
+            *[os_photos_table.c[field] for field in PHOTO_FIELDS],
+            os_photo_variants_table.c.variant,
+            os_photo_variants_table.c.photo_url.label("variant_url")
+        )
+        .select_from(os_photos_table.outerjoin(
+            os_photo_variants_table, os_photo_variants_table.c.photo_id == os_photos_table.c.id
+        ))
+        .where(os_photos_table.c.service_order_id.in_(order_ids))
+        .order_by(os_photos_table.c.uploaded_at.desc(), os_photos_table.c.id.desc())
+    )
+
+
+async def load_photos(db: AsyncSession, order_ids: List[int]) -> Dict[int, List[dict]]:
+    """Fotos de várias ordens, com variantes, em uma única query (JOIN + IN)"""
+    photos_by_order = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return photos_by_order
+
+    rows = (await db.execute(photos_query(order_ids))).fetchall()
+
+    photos = {}
+    for row in rows:
+        photo = photos.get(row.id)
+        if photo is None:
+            photo = photos[row.id] = {field: getattr(row, field) for field in PHOTO_FIELDS}
+            photo["variants"] = None
+            photo["thumbnail_url"] = thumbnail_url(row.photo_url)
+            photos_by_order[row.service_order_id].append(photo)
+        if row.variant is not None:
+            photo["variants"] = photo["variants"] or {}
+            photo["variants"][row.variant] = row.variant_url
+    return photos_by_order
+
+
+async def attach_photos(db: AsyncSession, orders: List[dict]) -> List[dict]:
+    """Carrega as fotos de várias ordens com uma única query"""
+    photos_by_order = await load_photos(db, [order["id"] for order in orders])
+    for order in orders:
+        order["photos"] = photos_by_order[order["id"]]
+    return orders
+
+
+async def load_orders(
+    db: AsyncSession, query, include_photos: bool = False, custom_plan: bool = False
+) -> List[dict]:
+    """Executa uma query derivada de orders_query() e monta as ordens.
+
+    Custa sempre 1 query (ou 2 com fotos), independente do número de linhas.
+    custom_plan planeja a query com os valores (ver CUSTOM_PLAN_SETTINGS).
+    """
+    if custom_plan:
+        await db.execute(CUSTOM_PLAN_SETTINGS)
+    orders = [_order_from_row(row) for row in (await db.execute(query)).fetchall()]
+    if include_photos:
+        await attach_photos(db, orders)
+    return orders
+
+
+async def load_order(
+    db: AsyncSession,
+    order_id: int,
+    include_photos: bool = False,
+    relations: Sequence[str] = tuple(ORDER_RELATIONS)
+) -> Optional[dict]:
+    """Busca uma única ordem com seus relacionamentos"""
+    orders = await load_orders(
+        db,
+        orders_query(relations).where(service_orders_table.c.id == order_id),
+        include_photos=include_photos
+    )
+    return orders[0] if orders else None
+
+
+def checklist_responses_query(order_id: int):
+    """Respostas do checklist de uma ordem com a descrição dos itens"""
+    return (
+        select(
+            os_checklist_responses_table,
+            checklist_items_table.c.description,
+            checklist_items_table.c.checklist_id
+        )
+        .select_from(os_checklist_responses_table.outerjoin(
+            checklist_items_table,
+            checklist_items_table.c.id == os_checklist_responses_table.c.checklist_item_id
+        ))
+        .where(os_checklist_responses_table.c.service_order_id == order_id)
+        .order_by(os_checklist_responses_table.c.id)
+    )
+
+
+async def load_checklist_responses(db: AsyncSession, order_id: int) -> List[dict]:
+    """Respostas do checklist de uma ordem com os itens, em uma única query"""
+    responses = (await db.execute(checklist_responses_query(order_id))).fetchall()
+
+    return [
+        {
+            "id": response.id,
+            "service_order_id": response.service_order_id,
+            "checklist_item_id": response.checklist_item_id,
+            "is_checked": response.is_checked,
+            "responded_at": response.responded_at,
+            "checklist_item": {
+                "id": response.checklist_item_id,
+                "description": response.description,
+                "checklist_id": response.checklist_id
+            } if response.checklist_id is not None else None
+        }
+        for response in responses
+    ]
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(sort: str, value: Optional[datetime], row_id: int, direction: str = "desc") -> str:
+    """Gera um cursor opaco a partir da chave (coluna de ordenação, id)"""
+    payload = {
+        "s": sort,
+        "d": direction,
+        "v": value.isoformat() if value else None,
+        "id": row_id
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, direction: str = "desc") -> Tuple[Optional[datetime], int]:
+    """Decodifica um cursor e valida se foi gerado para a mesma ordenação"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = datetime.fromisoformat(payload["v"]) if payload["v"] else None
+        row_id = int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if payload.get("s") != sort or payload.get("d", "desc") != direction:
+        raise HTTPException(status_code=400, detail="Cursor não corresponde à ordenação solicitada")
+
+    return value, row_id
+
+
+def order_by_key(query, sort_column, id_column, direction: str = "desc"):
+    """Ordenação estável por (coluna, id) na direção solicitada"""
+    if direction == "asc":
+        return query.order_by(sort_column.asc(), id_column.asc())
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+
+def apply_keyset(query, sort_column, id_column, cursor: Optional[str], sort: str, limit: int,
+                 direction: str = "desc"):
+    """Aplica ordenação estável (coluna, id) e o filtro de keyset.
+
+    Busca limit + 1 linhas para saber se existe uma próxima página sem COUNT.
+    """
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort, direction)
+        key = tuple_(sort_column, id_column)
+        if direction == "asc":
+            query = query.where(key > tuple_(value, row_id))
+        else:
+            query = query.where(key < tuple_(value, row_id))
+
+    return order_by_key(query, sort_column, id_column, direction).limit(limit + 1)
+
+
+def build_page(items: list, sort: str, limit: int, direction: str = "desc") -> dict:
+    """Monta a resposta paginada com o next_cursor a partir do último item"""
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, last[sort], last["id"], direction)
+
+    return {"items": items, "next_cursor": next_cursor}
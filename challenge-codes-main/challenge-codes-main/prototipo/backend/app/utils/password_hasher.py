@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import threading
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+
+# Configurações do hash de senhas
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "2"))
+
+
+class PasswordHasher:
+    """Executa bcrypt em um pool dedicado e limitado.
+
+    No máximo workers + queue_size operações ficam em andamento; acima disso
+    a chamada espera até queue_timeout e então responde 503, em vez de
+    acumular trabalho durante uma rajada de logins. O bcrypt libera o GIL,
+    então as threads do pool rodam em paralelo sem bloquear o event loop.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE_SIZE,
+        rounds: int = BCRYPT_ROUNDS,
+        queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._slots = asyncio.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        """Gera hash da senha com o custo configurado"""
+        return await self._run(
+            lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+        )
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verifica se a senha corresponde ao hash"""
+        return await self._run(
+            lambda: bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Indica se o hash foi gerado com um custo diferente do configurado"""
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self) -> dict:
+        """Profundidade da fila e latência do hash para monitoramento"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "rounds": self.rounds,
+                "in_flight": self.in_flight,
+                "running": self.running,
+                "queue_depth": self.in_flight - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+                "avg_hash_ms": round(self.total_hash_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_hash_ms": round(self.max_hash_seconds * 1000, 2)
+            }
+
+    async def _run(self, operation):
+        """Enfileira a operação no pool e aguarda o resultado"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado. Tente novamente em instantes.",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self.running += 1
+            try:
+                return operation()
+            finally:
+                finished_at = time.perf_counter()
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.total_wait_seconds += started_at - submitted_at
+                    self.total_hash_seconds += finished_at - started_at
+                    self.max_hash_seconds = max(self.max_hash_seconds, finished_at - started_at)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, task)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+
+# Instância compartilhada pelo processo
+password_hasher = PasswordHasher()
@@ -0,0 +1,177 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.database import SessionLocal
+from ..models.orders import photo_blobs_table, os_photos_table, os_photo_variants_table
+from .storage import photo_storage
+
+logger = logging.getLogger(__name__)
+
+
+def _digest_lock_key(digest: str) -> int:
+    """Chave do advisory lock de um conteúdo (60 bits do digest)"""
+    return int(digest[:15], 16)
+
+
+async def lock_digests(db: AsyncSession, digests: Iterable[str]):
+    """Trava os conteúdos até o fim da transação (pg_advisory_xact_lock).
+
+    Serializa o registro de um conteúdo (acquire_blob) com a remoção dos
+    seus arquivos (remove_orphan_files): a remoção nunca apaga os arquivos
+    de um reenvio que registrou o blob depois da sua verificação. Trava na
+    ordem dos digests, para que lotes simultâneos não entrem em deadlock.
+    """
+    keys = [_digest_lock_key(digest) for digest in sorted(set(digests))]
+    if keys:
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(key) FROM unnest(CAST(:keys AS BIGINT[])) AS key"),
+            {"keys": keys}
+        )
+
+
+async def acquire_blob(db: AsyncSession, digest: str, filename: str, size_bytes: int) -> Tuple[str, int]:
+    """Registra mais uma referência ao conteúdo, criando o blob se for novo.
+
+    Retorna (nome do arquivo armazenado, ref_count). ref_count == 1 indica
+    conteúdo novo; acima disso os bytes já estão armazenados e o upload é
+    deduplicado. Roda na transação do chamador, que fica com o conteúdo
+    travado até o commit (ver lock_digests).
+    """
+    await lock_digests(db, [digest])
+    stmt = insert(photo_blobs_table).values(
+        digest=digest,
+        filename=filename,
+        size_bytes=size_bytes,
+        ref_count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[photo_blobs_table.c.digest],
+        set_={"ref_count": photo_blobs_table.c.ref_count + 1}
+    ).returning(photo_blobs_table.c.filename, photo_blobs_table.c.ref_count)
+    blob = (await db.execute(stmt)).first()
+    return blob.filename, blob.ref_count
+
+
+async def acquire_blobs(db: AsyncSession, blobs: List[dict]) -> Dict[str, Tuple[str, int, bool]]:
+    """Versão em lote de acquire_blob: um único INSERT ... ON CONFLICT.
+
+    Cada item tem digest, filename, size_bytes e count (quantas fotos do lote
+    usam o conteúdo). Retorna digest -> (arquivo armazenado, ref_count, novo),
+    onde novo indica que os bytes ainda não estavam armazenados. As linhas
+    seguem a ordem dos digests, para que lotes simultâneos travem os blobs
+    sempre na mesma ordem.
+    """
+    if not blobs:
+        return {}
+    await lock_digests(db, [blob["digest"] for blob in blobs])
+    stmt = insert(photo_blobs_table).values([
+        {
+            "digest": blob["digest"],
+            "filename": blob["filename"],
+            "size_bytes": blob["size_bytes"],
+            "ref_count": blob["count"]
+        }
+        for blob in sorted(blobs, key=lambda blob: blob["digest"])
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[photo_blobs_table.c.digest],
+        set_={"ref_count": photo_blobs_table.c.ref_count + stmt.excluded.ref_count}
+    ).returning(photo_blobs_table.c.digest, photo_blobs_table.c.filename, photo_blobs_table.c.ref_count)
+
+    counts = {blob["digest"]: blob["count"] for blob in blobs}
+    return {
+        row.digest: (row.filename, row.ref_count, row.ref_count == counts[row.digest])
+        for row in await db.execute(stmt)
+    }
+
+
+async def release_blob(db: AsyncSession, digest: str) -> Optional[str]:
+    """Remove uma referência ao conteúdo.
+
+    Se era a última, apaga o registro do blob e retorna o nome do arquivo;
+    o chamador o remove do armazenamento só depois do commit (ver
+    remove_orphan_files), para um rollback não deixar fotos sem arquivo.
+    """
+    blob = (await db.execute(
+        photo_blobs_table.update()
+        .where(photo_blobs_table.c.digest == digest)
+        .values(ref_count=photo_blobs_table.c.ref_count - 1)
+        .returning(photo_blobs_table.c.filename, photo_blobs_table.c.ref_count)
+    )).first()
+    if blob is None or blob.ref_count > 0:
+        return None
+
+    await db.execute(photo_blobs_table.delete().where(photo_blobs_table.c.digest == digest))
+    return blob.filename
+
+
+async def remove_orphan_files(digest: Optional[str], filenames: List[str]):
+    """Remove do armazenamento os arquivos de uma foto excluída.
+
+    Roda depois do commit da exclusão (em BackgroundTasks). O conteúdo fica
+    travado da verificação até o fim das remoções: se o mesmo conteúdo foi
+    registrado de novo antes, o blob voltou a existir e os arquivos ficam;
+    um registro que chega durante a remoção espera e grava o arquivo de
+    novo depois. Sem digest (fotos antigas) os arquivos são da foto.
+    """
+    if digest is None:
+        await _delete_files(filenames)
+        return
+    async with SessionLocal() as db:
+        async with db.begin():
+            await lock_digests(db, [digest])
+            blob = (await db.execute(
+                select(photo_blobs_table.c.digest).where(photo_blobs_table.c.digest == digest)
+            )).first()
+            if blob is None:
+                await _delete_files(filenames)
+
+
+async def _delete_files(filenames: List[str]):
+    for filename in filenames:
+        try:
+            await photo_storage.delete(filename)
+        except Exception:
+            logger.exception("Erro ao remover o arquivo %s do armazenamento", filename)
+
+
+async def storage_report(db: AsyncSession) -> dict:
+    """Bytes armazenados versus referenciados e a economia da deduplicação"""
+    blobs = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(photo_blobs_table.c.size_bytes), 0),
+            func.coalesce(func.sum(photo_blobs_table.c.size_bytes * photo_blobs_table.c.ref_count), 0)
+        ).select_from(photo_blobs_table)
+    )).first()
+    photos, legacy_photos = (await db.execute(
+        select(
+            func.count(),
+            func.count().filter(os_photos_table.c.blob_digest.is_(None))
+        ).select_from(os_photos_table)
+    )).first()
+
+    # Arquivos de variantes são compartilhados entre fotos com o mesmo conteúdo
+    variant_files = (
+        select(os_photo_variants_table.c.photo_url, os_photo_variants_table.c.size_bytes)
+        .distinct()
+        .subquery()
+    )
+    variant_bytes = (await db.execute(
+        select(func.coalesce(func.sum(variant_files.c.size_bytes), 0))
+    )).scalar()
+
+    blob_count, stored_bytes, referenced_bytes = blobs
+    return {
+        "photos": photos,
+        "legacy_photos": legacy_photos,
+        "blobs": blob_count,
+        "stored_bytes": int(stored_bytes),
+        "referenced_bytes": int(referenced_bytes),
+        "saved_bytes": int(referenced_bytes - stored_bytes),
+        "dedup_ratio": round(referenced_bytes / stored_bytes, 4) if stored_bytes else 0.0,
+        "variant_bytes": int(variant_bytes)
+    }
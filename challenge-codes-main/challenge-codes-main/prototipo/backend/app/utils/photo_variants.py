@@ -0,0 +1,337 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from ..models.database import SessionLocal, engine
+from ..models.orders import os_photos_table, os_photo_variants_table, photo_blobs_table
+from .image_variants import PHOTO_VARIANTS, render_variants
+from .uploads import UPLOAD_DIR, ensure_upload_dir
+from .storage import photo_storage
+
+logger = logging.getLogger(__name__)
+
+# Processos dedicados ao Pillow (redimensionamento e recompressão)
+PHOTO_VARIANT_WORKERS = int(os.getenv("PHOTO_VARIANT_WORKERS", "2"))
+
+# Recuperação periódica das fotos sem variantes (geração que falhou ou foi
+# interrompida por um reinício antes de terminar)
+PHOTO_VARIANT_BACKFILL_INTERVAL_SECONDS = int(os.getenv("PHOTO_VARIANT_BACKFILL_INTERVAL_SECONDS", "600"))  # 0 desativa
+PHOTO_VARIANT_BACKFILL_BATCH_SIZE = int(os.getenv("PHOTO_VARIANT_BACKFILL_BATCH_SIZE", "50"))
+# Faixa de ids examinada por rodada: o custo de procurar não cresce com a tabela
+PHOTO_VARIANT_BACKFILL_SCAN_WINDOW = int(os.getenv("PHOTO_VARIANT_BACKFILL_SCAN_WINDOW", "10000"))
+# Fotos mais novas que isso ainda podem estar com a geração do upload em andamento
+PHOTO_VARIANT_BACKFILL_MIN_AGE_SECONDS = int(os.getenv("PHOTO_VARIANT_BACKFILL_MIN_AGE_SECONDS", "300"))
+# Advisory lock da recuperação: um worker por vez (a forma de duas chaves
+# não colide com os locks de conteúdo de photo_blobs.lock_digests)
+PHOTO_VARIANT_BACKFILL_LOCK = (1, 1)
+
+
+class PhotoVariantPipeline:
+    """Gera as variantes (miniatura, média, WebP) das fotos enviadas.
+
+    O trabalho do Pillow roda em um pool de processos, fora do event loop e
+    do caminho da requisição; o upload responde antes de as variantes
+    existirem e, até lá, o original é servido no lugar delas.
+    """
+
+    def __init__(self, workers: int = PHOTO_VARIANT_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self.generated = 0
+        self.failed = 0
+        self.reused = 0
+        self.total_seconds = 0.0
+
+    async def generate(self, photo_id: int, filename: str, digest: Optional[str] = None) -> bool:
+        """Gera e registra as variantes de uma foto já armazenada.
+
+        Se outra foto com o mesmo conteúdo (digest) já tem as variantes, os
+        arquivos são reaproveitados e só os registros são copiados. Retorna
+        se as variantes foram registradas.
+        """
+        started_at = time.perf_counter()
+        variants = await self._existing_variants(photo_id, digest)
+        if variants is not None:
+            self.reused += 1
+        else:
+            try:
+                variants = await self._render(filename)
+            except Exception:
+                self.failed += 1
+                logger.exception("Erro ao gerar variantes da foto %s", photo_id)
+                return False
+
+        async with SessionLocal() as db:
+            photo = (await db.execute(
+                select(os_photos_table.c.id).where(os_photos_table.c.id == photo_id)
+            )).first()
+            if photo is not None:
+                try:
+                    await db.execute(os_photo_variants_table.insert(), [
+                        {
+                            "photo_id": photo_id,
+                            "variant": variant["variant"],
+                            "photo_url": f"/uploads/{variant['filename']}",
+                            "width": variant["width"],
+                            "height": variant["height"],
+                            "size_bytes": variant["size_bytes"]
+                        }
+                        for variant in variants
+                    ])
+                    await db.commit()
+                except IntegrityError:
+                    await db.rollback()
+                    photo = None
+
+            # Foto excluída enquanto as variantes eram geradas; os arquivos só
+            # são removidos se nenhuma outra foto usa o mesmo conteúdo
+            if photo is None:
+                blob_in_use = digest is not None and (await db.execute(
+                    select(photo_blobs_table.c.digest).where(photo_blobs_table.c.digest == digest)
+                )).first() is not None
+                if not blob_in_use:
+                    await self.discard([variant["filename"] for variant in variants])
+                return False
+
+        self.generated += 1
+        self.total_seconds += time.perf_counter() - started_at
+        return True
+
+    async def discard(self, filenames):
+        """Remove arquivos de variantes do armazenamento"""
+        for filename in filenames:
+            await photo_storage.delete(filename)
+
+    async def _render(self, filename: str):
+        """Renderiza as variantes em um diretório temporário e as armazena"""
+        await run_in_threadpool(ensure_upload_dir)
+        render_dir = await run_in_threadpool(tempfile.mkdtemp, prefix=".variants-", dir=UPLOAD_DIR)
+        try:
+            async with photo_storage.local_copy(filename) as source_path:
+                variants = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), render_variants, source_path, render_dir, filename
+                )
+            for variant in variants:
+                await photo_storage.put(os.path.join(render_dir, variant["filename"]), variant["filename"])
+        finally:
+            await run_in_threadpool(shutil.rmtree, render_dir, True)
+        return variants
+
+    async def _existing_variants(self, photo_id: int, digest: Optional[str]):
+        """Variantes já geradas para outra foto com o mesmo conteúdo, se completas"""
+        if digest is None:
+            return None
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(
+                    os_photo_variants_table.c.variant,
+                    os_photo_variants_table.c.photo_url,
+                    os_photo_variants_table.c.width,
+                    os_photo_variants_table.c.height,
+                    os_photo_variants_table.c.size_bytes
+                )
+                .select_from(os_photo_variants_table.join(
+                    os_photos_table, os_photos_table.c.id == os_photo_variants_table.c.photo_id
+                ))
+                .where(os_photos_table.c.blob_digest == digest, os_photos_table.c.id != photo_id)
+                .distinct()
+            )).fetchall()
+
+        variants = {
+            row.variant: {
+                "variant": row.variant,
+                "filename": os.path.basename(row.photo_url),
+                "width": row.width,
+                "height": row.height,
+                "size_bytes": row.size_bytes
+            }
+            for row in rows
+        }
+        if set(variants) != set(PHOTO_VARIANTS):
+            return None
+        for variant in variants.values():
+            if not await photo_storage.exists(variant["filename"]):
+                return None
+        return list(variants.values())
+
+    def stats(self) -> dict:
+        """Contadores da geração de variantes para monitoramento"""
+        return {
+            "workers": self.workers,
+            "generated": self.generated,
+            "failed": self.failed,
+            "reused": self.reused,
+            "avg_ms": round(self.total_seconds / self.generated * 1000, 2) if self.generated else 0.0
+        }
+
+    def shutdown(self):
+        """Encerra o pool de processos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        # spawn: os processos filhos não herdam threads/conexões do servidor
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+
+# Instância compartilhada pelo processo
+photo_variant_pipeline = PhotoVariantPipeline()
+
+
+def missing_variants_query(after_id: int, batch_size: int, min_age_seconds: int = 0,
+                           scan_window: int = PHOTO_VARIANT_BACKFILL_SCAN_WINDOW):
+    """Fotos sem nenhuma variante registrada, em ordem de id, na faixa (after_id, after_id + scan_window]"""
+    # A faixa também nas variantes: o anti-join lê só a faixa do índice
+    # (photo_id, variant), em vez da tabela inteira
+    variant_photo_id = os_photo_variants_table.c.photo_id
+    has_variants = (
+        select(os_photo_variants_table.c.id)
+        .where(
+            variant_photo_id == os_photos_table.c.id,
+            variant_photo_id > after_id,
+            variant_photo_id <= after_id + scan_window
+        )
+        .exists()
+    )
+    return (
+        select(os_photos_table.c.id, os_photos_table.c.photo_url, os_photos_table.c.blob_digest)
+        .where(
+            os_photos_table.c.id > after_id,
+            os_photos_table.c.id <= after_id + scan_window,
+            ~has_variants,
+            os_photos_table.c.uploaded_at < func.localtimestamp() - timedelta(seconds=min_age_seconds)
+        )
+        .order_by(os_photos_table.c.id)
+        .limit(batch_size)
+    )
+
+
+class PhotoVariantBackfill:
+    """Tarefa em segundo plano que gera as variantes das fotos que ficaram sem.
+
+    A geração do upload roda em uma BackgroundTask: se ela falha ou o
+    processo reinicia antes de terminar, a foto fica só com o original. A
+    primeira rodada roda na inicialização e as seguintes a cada
+    interval_seconds. Cada rodada examina uma faixa de até scan_window ids
+    (ou para no fim de um lote) e a seguinte continua de onde ela parou,
+    voltando ao início depois do maior id; uma foto que sempre falha não
+    trava as demais.
+    """
+
+    def __init__(
+        self,
+        pipeline: PhotoVariantPipeline = photo_variant_pipeline,
+        interval_seconds: int = PHOTO_VARIANT_BACKFILL_INTERVAL_SECONDS,
+        batch_size: int = PHOTO_VARIANT_BACKFILL_BATCH_SIZE,
+        min_age_seconds: int = PHOTO_VARIANT_BACKFILL_MIN_AGE_SECONDS,
+        scan_window: int = PHOTO_VARIANT_BACKFILL_SCAN_WINDOW
+    ):
+        self.pipeline = pipeline
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.min_age_seconds = min_age_seconds
+        self.scan_window = scan_window
+        self.runs = 0
+        self.backfilled = 0
+        self.failed = 0
+        self.last_run_at = None
+        self._after_id = 0
+        self._task = None
+
+    def start(self):
+        """Inicia a tarefa de recuperação no event loop (interval_seconds <= 0 desativa)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="photo-variant-backfill")
+
+    async def stop(self):
+        """Cancela a tarefa e aguarda seu término"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """Gera as variantes de um lote de fotos sem elas; retorna quantas foram registradas.
+
+        Outro worker com a recuperação em andamento (advisory lock) faz
+        a rodada deste terminar sem processar nada.
+        """
+        async with engine.connect() as lock_connection:
+            locked = (await lock_connection.execute(
+                select(func.pg_try_advisory_lock(*PHOTO_VARIANT_BACKFILL_LOCK))
+            )).scalar()
+            await lock_connection.commit()
+            if not locked:
+                return 0
+            try:
+                async with SessionLocal() as db:
+                    photos = (await db.execute(missing_variants_query(
+                        self._after_id, self.batch_size, self.min_age_seconds, self.scan_window
+                    ))).fetchall()
+                    last_id = (await db.execute(select(func.max(os_photos_table.c.id)))).scalar() or 0
+
+                backfilled = 0
+                for photo in photos:
+                    if await self.pipeline.generate(photo.id, os.path.basename(photo.photo_url), photo.blob_digest):
+                        backfilled += 1
+                    else:
+                        self.failed += 1
+
+                # Lote cheio: a faixa continua depois da última foto; senão
+                # segue para a próxima faixa, ou volta ao início
+                if len(photos) == self.batch_size:
+                    self._after_id = photos[-1].id
+                else:
+                    self._after_id += self.scan_window
+                if self._after_id >= last_id:
+                    self._after_id = 0
+            finally:
+                await lock_connection.execute(select(func.pg_advisory_unlock(*PHOTO_VARIANT_BACKFILL_LOCK)))
+                await lock_connection.commit()
+
+        self.runs += 1
+        self.backfilled += backfilled
+        self.last_run_at = datetime.utcnow()
+        return backfilled
+
+    def stats(self) -> dict:
+        """Contadores da recuperação para monitoramento"""
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "backfilled": self.backfilled,
+            "failed": self.failed,
+            "last_run_at": self.last_run_at
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Erro ao recuperar variantes de fotos")
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Instância compartilhada pelo processo
+photo_variant_backfill = PhotoVariantBackfill()
@@ -0,0 +1,80 @@
+import time
+import threading
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """Contadores do pool de conexões do banco.
+
+    Registra quanto tempo cada checkout esperou por uma conexão livre (ou
+    pela abertura de uma nova), quantos checkouts estouraram o pool_timeout
+    e quantas conexões foram descartadas pelo pre-ping ou por erro.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidated = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_checkout(self, wait_seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_invalidated(self):
+        with self._lock:
+            self.invalidated += 1
+
+    def stats(self, pool=None) -> dict:
+        """Estado atual do pool e tempos de espera no checkout"""
+        with self._lock:
+            result = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidated": self.invalidated,
+                "avg_wait_ms": round(self.total_wait_seconds / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2)
+            }
+        if pool is not None and hasattr(pool, "checkedout"):
+            result.update({
+                "size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, pool.overflow())
+            })
+        return result
+
+
+# Instância compartilhada pelo processo
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool padrão do engine assíncrono que mede a espera de cada checkout"""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - started_at)
+        return connection
+
+
+def instrument_engine(engine):
+    """Conta as conexões invalidadas (pre-ping, reinício do Postgres etc.)"""
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.record_invalidated()
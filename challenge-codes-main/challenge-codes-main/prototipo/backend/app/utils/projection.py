@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+
+def parse_fields(
+    fields: Optional[str],
+    allowed: Sequence[str],
+    nested: Optional[Dict[str, Sequence[str]]] = None
+) -> Optional[Dict[str, List[str]]]:
+    """Interpreta o parâmetro fields (ex.: "id,title,client.name").
+
+    Retorna None sem fields (resposta completa) ou {"": campos da raiz,
+    relacionamento: campos}, na ordem de allowed. O id é sempre incluído; um
+    relacionamento sem subcampo ("client") traz todos os campos dele.
+    """
+    if fields is None:
+        return None
+    nested = nested or {}
+
+    selected = {"": {"id"}}
+    unknown = []
+    for item in (part.strip() for part in fields.split(",")):
+        if not item:
+            continue
+        name, _, subfield = item.partition(".")
+        if not subfield and name in allowed:
+            selected[""].add(name)
+        elif name in nested and (not subfield or subfield in nested[name]):
+            relation = selected.setdefault(name, {"id"})
+            relation.update([subfield] if subfield else nested[name])
+        else:
+            unknown.append(item)
+
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos em fields: {', '.join(unknown)}")
+
+    return {
+        name: [field for field in (allowed if name == "" else nested[name]) if field in chosen]
+        for name, chosen in selected.items()
+    }
+
+
+@lru_cache(maxsize=256)
+def partial_model(
+    model: Type[BaseModel],
+    fields: Tuple[str, ...],
+    nested: Tuple[Tuple[str, object], ...] = ()
+) -> Type[BaseModel]:
+    """Modelo com só alguns campos de model (mesmos tipos e validações).
+
+    nested substitui o tipo de campos relacionados, ex.: o client da ordem
+    por um modelo parcial de ClientRead. Usado como tipo da resposta em
+    utils.serialization.fast_response, que emite só os campos do modelo (o
+    response_model da rota completaria os ausentes com null).
+    """
+    definitions = {name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields}
+    for name, annotation in nested:
+        definitions[name] = (annotation, None)
+    return create_model(f"{model.__name__}Fields", **definitions)
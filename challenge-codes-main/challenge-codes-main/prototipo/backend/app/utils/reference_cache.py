@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.security import HTTPAuthorizationCredentials
+
+from ..middleware.auth import security
+from .token_cache import token_cache
+from .version_store import VERSION_STORE, VersionStore, version_store
+
+# Dados de referência com versão própria (técnicos usam a versão de users)
+REFERENCE_RESOURCES = ("users", "clients", "equipments", "checklists")
+
+
+class ReferenceCache:
+    """ETags por versão para os dados de referência (usuários, clientes...).
+
+    Cada recurso tem uma versão no armazenamento de versões, trocada pelas
+    escritas (bump). A ETag combina recurso, versão, caminho com query string
+    e o papel (ou o usuário) de quem pede; se o If-None-Match bate e o token
+    já está no cache de tokens, a resposta é 304 sem abrir sessão no banco.
+    Com VERSION_STORE=redis as versões são as mesmas em todos os workers:
+    uma escrita em qualquer um invalida as ETags de todos, e a revalidação
+    pode cair em outro worker.
+    """
+
+    def __init__(self, store: VersionStore = version_store):
+        self.store = store
+        self._counters = {resource: {"not_modified": 0, "full": 0, "untagged": 0} for resource in REFERENCE_RESOURCES}
+        self._lock = threading.Lock()
+
+    async def bump(self, *resources: str):
+        """Invalida as ETags dos recursos após uma escrita (chamar após o commit)"""
+        await self.store.bump(*resources)
+
+    async def etag(self, resource: str, request: Request, user, vary: str = "role") -> str:
+        """ETag fraca da resposta de resource para este pedido e usuário"""
+        version = await self.store.get(resource)
+        audience = f"user:{user.id}" if vary == "user" else f"role:{user.role}"
+        key = f"{resource}|{version}|{audience}|{request.url.path}?{request.url.query}"
+        return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+    def conditional(self, resource: str, vary: str = "role"):
+        """Dependência que responde 304 quando a cópia do cliente ainda vale.
+
+        Deve vir antes do get_db nos parâmetros da rota, para que o 304 saia
+        antes de a sessão pegar uma conexão. Retorna a ETag a enviar (ver
+        tagged) ou None quando o token ainda não está no cache de tokens; aí
+        a autenticação segue pelo banco e a resposta sai completa, sem ETag.
+        """
+        async def check(
+            request: Request,
+            credentials: HTTPAuthorizationCredentials = Depends(security)
+        ) -> Optional[str]:
+            user = token_cache.peek(credentials.credentials)
+            if user is None or not user.is_active:
+                self._count(resource, "untagged")
+                return None
+
+            etag = await self.etag(resource, request, user, vary)
+            if _matches(request.headers.get("if-none-match"), etag):
+                self._count(resource, "not_modified")
+                raise HTTPException(status_code=304, headers=_cache_headers(etag))
+            self._count(resource, "full")
+            return etag
+
+        return check
+
+    def tagged(self, response: Response, etag: Optional[str]) -> Response:
+        """Acrescenta ETag e cabeçalhos de revalidação à resposta completa"""
+        if etag is not None:
+            response.headers.update(_cache_headers(etag))
+        return response
+
+    def stats(self) -> dict:
+        """Contadores por recurso para monitoramento"""
+        with self._lock:
+            resources = {}
+            for resource, counters in self._counters.items():
+                conditional = counters["not_modified"] + counters["full"]
+                resources[resource] = {
+                    **counters,
+                    "hit_ratio": round(counters["not_modified"] / conditional, 4) if conditional else 0.0
+                }
+            not_modified = sum(counters["not_modified"] for counters in self._counters.values())
+            total = not_modified + sum(counters["full"] for counters in self._counters.values())
+            return {
+                "store": VERSION_STORE,
+                "hit_ratio": round(not_modified / total, 4) if total else 0.0,
+                "resources": resources
+            }
+
+    def _count(self, resource: str, outcome: str):
+        with self._lock:
+            self._counters[resource][outcome] += 1
+
+
+def _cache_headers(etag: str) -> dict:
+    # private + Vary: a cópia é de quem a pediu; no-cache: sempre revalidar
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (lista de ETags ou *)"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+# Instância compartilhada pelo processo
+reference_cache = ReferenceCache()
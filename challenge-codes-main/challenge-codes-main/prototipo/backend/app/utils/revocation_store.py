@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Configurações do armazenamento de revogações
+REVOCATION_STORE = os.getenv("REVOCATION_STORE", "memory")  # memory ou redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REVOCATION_KEY_PREFIX = "auth:revoked:"
+REVOCATION_CHANNEL = "auth:revocations"
+
+
+class RevocationStore:
+    """Interface do armazenamento de tokens revogados.
+
+    Os tokens são identificados pelo token_id (ver utils.security) e ficam
+    registrados apenas pelo tempo de vida restante do token.
+    """
+
+    async def revoke(self, token_id: str, ttl_seconds: int):
+        """Marca o token como revogado e avisa os demais workers"""
+        raise NotImplementedError
+
+    async def is_revoked(self, token_id: str) -> bool:
+        """Verifica se o token foi revogado"""
+        raise NotImplementedError
+
+    async def subscribe(self, callback: Callable[[str], None]):
+        """Registra um callback chamado para cada revogação (de qualquer worker)"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Libera conexões e tarefas do armazenamento"""
+        pass
+
+
+class MemoryRevocationStore(RevocationStore):
+    """Armazenamento local em memória (um único processo)"""
+
+    def __init__(self):
+        self._revoked = {}  # token_id -> expira_em
+        self._callbacks: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    async def revoke(self, token_id: str, ttl_seconds: int):
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._purge_expired()
+            self._revoked[token_id] = time.time() + ttl_seconds
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(token_id)
+
+    async def is_revoked(self, token_id: str) -> bool:
+        with self._lock:
+            expires_at = self._revoked.get(token_id)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._revoked[token_id]
+                return False
+            return True
+
+    async def subscribe(self, callback: Callable[[str], None]):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def _purge_expired(self):
+        """Remove revogações já expiradas (chamar com o lock adquirido)"""
+        now = time.time()
+        for token_id in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[token_id]
+
+
+class RedisRevocationStore(RevocationStore):
+    """Armazenamento compartilhado via protocolo Redis.
+
+    As revogações são chaves com TTL e cada revogação é publicada no canal
+    REVOCATION_CHANNEL para que todos os workers limpem seus caches locais.
+    Aceita um cliente já criado (ex.: fakeredis) para testes.
+    """
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("REVOCATION_STORE=redis requer o pacote 'redis' instalado")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._callbacks: List[Callable[[str], None]] = []
+        self._pubsub = None
+        self._listener = None
+
+    async def revoke(self, token_id: str, ttl_seconds: int):
+        if ttl_seconds <= 0:
+            return
+        await self._client.set(REVOCATION_KEY_PREFIX + token_id, 1, ex=int(ttl_seconds))
+        await self._client.publish(REVOCATION_CHANNEL, token_id)
+
+    async def is_revoked(self, token_id: str) -> bool:
+        return bool(await self._client.exists(REVOCATION_KEY_PREFIX + token_id))
+
+    async def subscribe(self, callback: Callable[[str], None]):
+        self._callbacks.append(callback)
+        if self._pubsub is None:
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(REVOCATION_CHANNEL)
+            self._listener = asyncio.create_task(self._listen(), name="revocation-listener")
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def _listen(self):
+        """Repassa as revogações publicadas no canal para os callbacks"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = message["data"]
+                    token_id = data.decode("utf-8") if isinstance(data, bytes) else data
+                    for callback in self._callbacks:
+                        callback(token_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Erro ao ouvir o canal de revogações; reconectando")
+                await asyncio.sleep(1.0)
+
+
+def create_revocation_store() -> RevocationStore:
+    """Cria o armazenamento configurado em REVOCATION_STORE"""
+    if REVOCATION_STORE == "redis":
+        return RedisRevocationStore(REDIS_URL)
+    if REVOCATION_STORE == "memory":
+        return MemoryRevocationStore()
+    raise RuntimeError(f"REVOCATION_STORE inválido: {REVOCATION_STORE}")
+
+
+# Instância compartilhada pelo processo
+revocation_store = create_revocation_store()
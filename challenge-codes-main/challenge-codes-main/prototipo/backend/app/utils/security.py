@@ -1,28 +1,36 @@
 import os
-import bcrypt
+import time
+import uuid
+import hashlib
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 # from passlib.context import CryptContext
 from typing import Optional
-from sqlalchemy.orm import Session
-from ..models.database import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.auth import users_table, auth_tokens_table
+from .token_cache import token_cache
+from .revocation_store import revocation_store
+from .password_hasher import password_hasher
 
 # Configurações de segurança
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Folga da autorização de registro de um upload direto além da validade da URL pré-assinada
+UPLOAD_GRANT_GRACE_SECONDS = int(os.getenv("UPLOAD_GRANT_GRACE_SECONDS", "900"))
+UPLOAD_GRANT_PURPOSE = "photo_upload"
 
 # Contexto para hash de senhas
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica se a senha está correta"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifica se a senha está correta (no pool dedicado de bcrypt)"""
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    """Gera hash da senha"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def get_password_hash(password: str) -> str:
+    """Gera hash da senha (no pool dedicado de bcrypt)"""
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria token JWT"""
@@ -32,7 +40,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti identifica o token no banco e nas revogações sem guardar o JWT
+    to_encode.update({"exp": expire, "jti": to_encode.get("jti") or uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -47,12 +56,62 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-def authenticate_user(db: Session, username: str, password: str):
+def create_upload_grant(user_id: int, order_id: int, filename: str, expires_in: int) -> str:
+    """Token que autoriza o usuário a registrar, na ordem, o arquivo enviado pela URL pré-assinada.
+
+    Não tem sub nem jti: não serve como token de acesso (verify_token o recusa).
+    """
+    return jwt.encode({
+        "purpose": UPLOAD_GRANT_PURPOSE,
+        "uid": user_id,
+        "order": order_id,
+        "file": filename,
+        "exp": datetime.utcnow() + timedelta(seconds=expires_in + UPLOAD_GRANT_GRACE_SECONDS)
+    }, SECRET_KEY, algorithm=ALGORITHM)
+
+def verify_upload_grant(token: str, user_id: int, order_id: int, filename: str) -> bool:
+    """Confere se o token foi emitido para este usuário, esta ordem e este arquivo"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    return (
+        payload.get("purpose") == UPLOAD_GRANT_PURPOSE
+        and payload.get("uid") == user_id
+        and payload.get("order") == order_id
+        and payload.get("file") == filename
+    )
+
+def get_token_id(token: str) -> Optional[str]:
+    """Digest SHA-256 (hex, 64 caracteres) do jti do token.
+
+    É a chave usada em auth_tokens, no armazenamento de revogações e no
+    cache de tokens. Retorna None para tokens malformados ou sem jti.
+    """
+    try:
+        jti = jwt.get_unverified_claims(token).get("jti")
+    except JWTError:
+        return None
+    if not jti:
+        return None
+    return hashlib.sha256(str(jti).encode("utf-8")).hexdigest()
+
+def get_token_ttl(token: str) -> int:
+    """Tempo de vida restante do token em segundos (0 se inválido ou expirado)"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return 0
+    if not exp:
+        return 0
+    return max(0, int(exp - time.time()))
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     """Autentica usuário com username e senha"""
     # Buscar usuário no banco
-    user = db.execute(
+    user = (await db.execute(
         users_table.select().where(users_table.c.username == username)
-    ).first()
+    )).first()
     
     if not user:
         return False
@@ -62,43 +121,64 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     
     # Verificar senha
-    if not verify_password(password, user.password_hash):
+    if not await verify_password(password, user.password_hash):
         return False
     
+    # Atualizar hash gerado com outro custo (BCRYPT_ROUNDS alterado)
+    if password_hasher.needs_rehash(user.password_hash):
+        await db.execute(
+            users_table.update().where(users_table.c.id == user.id)
+            .values(password_hash=await get_password_hash(password))
+        )
+        await db.commit()
+    
     return user
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """Busca usuário por username"""
-    user = db.execute(
+    user = (await db.execute(
         users_table.select().where(users_table.c.username == username)
-    ).first()
+    )).first()
     return user
 
-def create_token_record(db: Session, user_id: int, token: str, expires_at: datetime):
-    """Cria registro de token no banco"""
+async def create_token_record(db: AsyncSession, user_id: int, token: str, expires_at: datetime):
+    """Cria registro de token no banco (apenas o digest do jti é guardado)"""
     stmt = auth_tokens_table.insert().values(
         user_id=user_id,
-        token=token,
+        jti_hash=get_token_id(token),
         expires_at=expires_at
     )
-    db.execute(stmt)
-    db.commit()
+    await db.execute(stmt)
+    await db.commit()
 
-def revoke_token(db: Session, token: str):
-    """Revoga token no banco"""
+async def revoke_token(db: AsyncSession, token: str):
+    """Revoga token no banco e no armazenamento compartilhado de revogações"""
+    token_id = get_token_id(token)
+    token_cache.invalidate_token(token)
+    if token_id is None:
+        return
+    
     stmt = auth_tokens_table.update().where(
-        auth_tokens_table.c.token == token
+        auth_tokens_table.c.jti_hash == token_id
     ).values(is_revoked=True)
-    db.execute(stmt)
-    db.commit()
+    await db.execute(stmt)
+    await db.commit()
+    
+    # Revogação com TTL igual à vida restante; os outros workers são avisados
+    await revocation_store.revoke(token_id, get_token_ttl(token))
 
-def is_token_revoked(db: Session, token: str) -> bool:
+async def is_token_revoked(db: AsyncSession, token: str) -> bool:
     """Verifica se token foi revogado"""
-    result = db.execute(
-        auth_tokens_table.select().where(
-            auth_tokens_table.c.token == token
-        )
-    ).first()
+    token_id = get_token_id(token)
+    if token_id is None or await revocation_store.is_revoked(token_id):
+        return True
+    
+    result = (await db.execute(
+        select(
+            auth_tokens_table.c.is_revoked,
+            auth_tokens_table.c.expires_at
+        ).where(auth_tokens_table.c.jti_hash == token_id)
+    )).first()
     
     if not result:
         return True  # Token não existe = considerado revogado
@@ -0,0 +1,111 @@
+import os
+import types
+from functools import lru_cache
+from typing import Any, Callable, Union, get_args, get_origin
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+# Com true, toda resposta rápida também é validada contra o modelo (útil em
+# desenvolvimento e nos testes); em produção o contrato não é revalidado.
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "false").lower() == "true"
+
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _identity(value):
+    return value
+
+
+@lru_cache(maxsize=512)
+def compile_serializer(annotation) -> Callable[[Any], Any]:
+    """Serializador pré-compilado para um tipo de resposta.
+
+    Monta uma vez, por modelo, a função que reduz dicionários (ou linhas)
+    aos campos do modelo, com os mesmos defaults, sem validar os valores. O
+    resultado tem o mesmo formato do response_model e vai direto ao orjson.
+    """
+    return _compile(annotation)
+
+
+def _compile(annotation) -> Callable[[Any], Any]:
+    origin = get_origin(annotation)
+
+    if origin in (Union, types.UnionType):
+        options = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(options) != 1:
+            return _identity
+        inner = _compile(options[0])
+        if inner is _identity:
+            return _identity
+        return lambda value: None if value is None else inner(value)
+
+    if origin in (list, tuple, set):
+        args = get_args(annotation)
+        inner = _compile(args[0]) if args else _identity
+        if inner is _identity:
+            return list
+        return lambda values: [inner(value) for value in values]
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _compile_model(annotation)
+
+    return _identity
+
+
+def _compile_model(model) -> Callable[[Any], dict]:
+    # Referências adiantadas (ex.: List['PhotoRead']) são resolvidas pelo
+    # Pydantic; depois do rebuild as anotações de model_fields já são os tipos
+    model.model_rebuild()
+    # (nome, default, serializador dos modelos aninhados ou None)
+    fields = []
+    for name, field in model.model_fields.items():
+        serializer = _compile(field.annotation)
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        fields.append((name, default, None if serializer is _identity else serializer))
+    plain = [(name, default) for name, default, serializer in fields if serializer is None]
+    if len(plain) == len(fields):
+        def serialize(value) -> dict:
+            if isinstance(value, BaseModel):
+                return value.model_dump(mode="json")
+            get = (value if isinstance(value, dict) else value._mapping).get
+            return {name: get(name, default) for name, default in plain}
+        return serialize
+
+    def serialize(value) -> dict:
+        if isinstance(value, BaseModel):
+            return value.model_dump(mode="json")
+        get = (value if isinstance(value, dict) else value._mapping).get
+        result = {}
+        for name, default, serializer in fields:
+            item = get(name, default)
+            result[name] = item if serializer is None or item is None else serializer(item)
+        return result
+
+    return serialize
+
+
+@lru_cache(maxsize=256)
+def _adapter(annotation) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def dumps(data) -> bytes:
+    """Codifica em JSON com orjson (datetime em ISO 8601, UTC como Z)"""
+    return orjson.dumps(data, option=_ORJSON_OPTIONS)
+
+
+def fast_response(annotation, data, status_code: int = 200) -> Response:
+    """Resposta JSON sem a revalidação do response_model pelo FastAPI.
+
+    Os dados vêm do banco pelos loaders e já têm o formato do modelo; só o
+    serializador pré-compilado e o orjson são aplicados. O response_model
+    da rota continua documentando a resposta no OpenAPI.
+    """
+    if VALIDATE_RESPONSES:
+        _adapter(annotation).validate_python(data, from_attributes=True)
+    return Response(
+        content=dumps(compile_serializer(annotation)(data)),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -0,0 +1,374 @@
+import os
+import time
+import base64
+import uuid
+import mimetypes
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
+
+from .uploads import UPLOAD_DIR, ensure_upload_dir, relative_upload_path, upload_path, promote_upload, remove_file
+from .file_serving import UPLOAD_CACHE_MAX_AGE_SECONDS, UPLOAD_FALLBACK_MAX_AGE_SECONDS, serve_file
+
+# Backend de armazenamento das fotos: local (UPLOAD_DIR) ou s3 (S3/MinIO)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+
+# Configurações do backend S3 (qualquer serviço compatível com o protocolo)
+S3_BUCKET = os.getenv("S3_BUCKET", "photos")
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "uploads/")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # ex.: http://minio:9000
+# Endpoint usado nas URLs pré-assinadas entregues aos clientes (ex.: http://localhost:9000)
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or S3_ENDPOINT_URL
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "20"))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))  # 8MB
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024)))  # 8MB
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+S3_PRESIGN_EXPIRES_SECONDS = int(os.getenv("S3_PRESIGN_EXPIRES_SECONDS", "3600"))
+S3_KEY_CACHE_MAX_SIZE = int(os.getenv("S3_KEY_CACHE_MAX_SIZE", "10000"))
+
+
+class PhotoStorage:
+    """Interface do armazenamento dos arquivos de fotos e variantes.
+
+    Os arquivos são identificados pelo nome (ver uploads.relative_upload_path);
+    os temporários de upload e de geração de variantes continuam em
+    UPLOAD_DIR, que para backends remotos é só um diretório de trabalho.
+    """
+
+    name = "base"
+    # Se o backend entrega URLs pré-assinadas para upload direto pelo cliente
+    supports_direct_upload = False
+
+    async def put(self, local_path: str, filename: str, overwrite: bool = True):
+        """Armazena um arquivo local com o nome definitivo (o local é consumido).
+
+        Com overwrite=False, se o arquivo já existe (mesmo conteúdo, pois o
+        nome é o digest) o local é apenas removido.
+        """
+        raise NotImplementedError
+
+    async def delete(self, filename: str):
+        """Remove o arquivo, se existir"""
+        raise NotImplementedError
+
+    async def exists(self, filename: str) -> bool:
+        """Verifica se o arquivo está armazenado"""
+        raise NotImplementedError
+
+    async def head(self, filename: str) -> Optional[dict]:
+        """Tamanho (size) e SHA-256 em base64 (sha256, se conhecido) do arquivo"""
+        raise NotImplementedError
+
+    def local_copy(self, filename: str):
+        """Context manager assíncrono com um caminho local para leitura do arquivo"""
+        raise NotImplementedError
+
+    async def serve(self, request: Request, filename: str, immutable: bool = True) -> Response:
+        """Resposta HTTP que entrega o arquivo (levanta FileNotFoundError se não existir)"""
+        raise NotImplementedError
+
+    async def presigned_upload(self, filename: str, sha256_hex: str, size: int) -> dict:
+        """URL pré-assinada para o cliente enviar o arquivo direto ao armazenamento"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Contadores do armazenamento para monitoramento"""
+        return {"backend": self.name}
+
+    async def close(self):
+        """Libera conexões do armazenamento"""
+        pass
+
+
+class LocalPhotoStorage(PhotoStorage):
+    """Arquivos em UPLOAD_DIR, servidos pela própria API (ou pelo proxy via X-Accel-Redirect)"""
+
+    name = "local"
+
+    def __init__(self):
+        self.puts = 0
+        self.deletes = 0
+
+    async def put(self, local_path: str, filename: str, overwrite: bool = True):
+        await promote_upload(local_path, filename, overwrite=overwrite)
+        self.puts += 1
+
+    async def delete(self, filename: str):
+        await run_in_threadpool(remove_file, upload_path(filename))
+        self.deletes += 1
+
+    async def exists(self, filename: str) -> bool:
+        return await run_in_threadpool(os.path.exists, upload_path(filename))
+
+    async def head(self, filename: str) -> Optional[dict]:
+        try:
+            stat_result = await run_in_threadpool(os.stat, upload_path(filename))
+        except FileNotFoundError:
+            return None
+        return {"size": stat_result.st_size, "sha256": None}
+
+    @asynccontextmanager
+    async def local_copy(self, filename: str):
+        yield upload_path(filename)
+
+    async def serve(self, request: Request, filename: str, immutable: bool = True) -> Response:
+        return await serve_file(request, upload_path(filename), relative_upload_path(filename), immutable)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "puts": self.puts, "deletes": self.deletes}
+
+
+class S3PhotoStorage(PhotoStorage):
+    """Arquivos em um bucket S3 (ou compatível, como MinIO).
+
+    Um único cliente boto3 (thread-safe) é compartilhado, com pool de até
+    S3_MAX_POOL_CONNECTIONS conexões HTTP; as chamadas rodam no threadpool.
+    Arquivos acima de S3_MULTIPART_THRESHOLD são enviados em multipart.
+    Os downloads redirecionam o cliente para uma URL pré-assinada, então os
+    bytes não passam pela API. Aceita clientes já criados para testes.
+    """
+
+    name = "s3"
+    supports_direct_upload = True
+
+    def __init__(self, bucket: str = S3_BUCKET, client=None, presign_client=None):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requer o pacote 'boto3' instalado")
+
+        if client is None:
+            client = self._create_client(boto3, Config, S3_ENDPOINT_URL)
+        if presign_client is None:
+            presign_client = client
+            if S3_PUBLIC_ENDPOINT_URL != S3_ENDPOINT_URL:
+                presign_client = self._create_client(boto3, Config, S3_PUBLIC_ENDPOINT_URL)
+
+        self.bucket = bucket
+        self._client = client
+        self._presign_client = presign_client
+        self._transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MULTIPART_CONCURRENCY
+        )
+        self._lock = threading.Lock()
+        # Nomes são imutáveis (digest): chaves já vistas evitam um HEAD por requisição
+        self._known_keys = OrderedDict()
+        # URLs pré-assinadas reaproveitadas enquanto válidas, para o navegador
+        # encontrar no cache a mesma URL (e os mesmos bytes)
+        self._download_urls = OrderedDict()  # (chave, imutável) -> (expira_em, url)
+
+        self.puts = 0
+        self.multipart_puts = 0
+        self.bytes_uploaded = 0
+        self.deletes = 0
+        self.heads = 0
+        self.presigned_downloads = 0
+        self.presigned_uploads = 0
+
+    @staticmethod
+    def _create_client(boto3, Config, endpoint_url: Optional[str]):
+        config = Config(
+            signature_version="s3v4",
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 3, "mode": "standard"},
+            # MinIO e outros serviços locais não resolvem bucket.host
+            s3={"addressing_style": "path" if endpoint_url else "auto"}
+        )
+        return boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=S3_REGION,
+            aws_access_key_id=S3_ACCESS_KEY_ID,
+            aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+            config=config
+        )
+
+    def key(self, filename: str) -> str:
+        """Chave do objeto no bucket"""
+        return S3_KEY_PREFIX + relative_upload_path(filename)
+
+    async def put(self, local_path: str, filename: str, overwrite: bool = True):
+        key = self.key(filename)
+        try:
+            if not overwrite and await self.exists(filename):
+                return
+            size = await run_in_threadpool(os.path.getsize, local_path)
+            await run_in_threadpool(
+                self._client.upload_file, local_path, self.bucket, key,
+                ExtraArgs={
+                    "ContentType": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                    "CacheControl": f"public, max-age={UPLOAD_CACHE_MAX_AGE_SECONDS}, immutable"
+                },
+                Config=self._transfer_config
+            )
+        finally:
+            await run_in_threadpool(remove_file, local_path)
+
+        with self._lock:
+            self.puts += 1
+            self.bytes_uploaded += size
+            if size >= S3_MULTIPART_THRESHOLD:
+                self.multipart_puts += 1
+        self._remember(key)
+
+    async def delete(self, filename: str):
+        key = self.key(filename)
+        with self._lock:
+            self._known_keys.pop(key, None)
+            self._download_urls.pop((key, True), None)
+            self._download_urls.pop((key, False), None)
+            self.deletes += 1
+        await run_in_threadpool(self._client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def exists(self, filename: str) -> bool:
+        with self._lock:
+            if self.key(filename) in self._known_keys:
+                self._known_keys.move_to_end(self.key(filename))
+                return True
+        return await self.head(filename) is not None
+
+    async def head(self, filename: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        key = self.key(filename)
+        with self._lock:
+            self.heads += 1
+        try:
+            response = await run_in_threadpool(
+                self._client.head_object, Bucket=self.bucket, Key=key, ChecksumMode="ENABLED"
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        self._remember(key)
+        return {"size": response["ContentLength"], "sha256": response.get("ChecksumSHA256")}
+
+    @asynccontextmanager
+    async def local_copy(self, filename: str):
+        await run_in_threadpool(ensure_upload_dir)
+        local_path = os.path.join(UPLOAD_DIR, f".download-{uuid.uuid4().hex}{os.path.splitext(filename)[1]}")
+        try:
+            await run_in_threadpool(
+                self._client.download_file, self.bucket, self.key(filename), local_path,
+                Config=self._transfer_config
+            )
+            yield local_path
+        finally:
+            await run_in_threadpool(remove_file, local_path)
+
+    async def serve(self, request: Request, filename: str, immutable: bool = True) -> Response:
+        if not await self.exists(filename):
+            raise FileNotFoundError(filename)
+
+        expires_at, url = self._download_url(self.key(filename), immutable)
+        # O redirecionamento vale enquanto a URL assinada for válida (com folga)
+        max_age = max(int(expires_at - time.time()) - 60, 0)
+        if not immutable:
+            max_age = min(max_age, UPLOAD_FALLBACK_MAX_AGE_SECONDS)
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": f"private, max-age={max_age}"})
+
+    async def presigned_upload(self, filename: str, sha256_hex: str, size: int) -> dict:
+        # Content-Length e o SHA-256 entram na assinatura: o serviço recusa
+        # um corpo diferente do declarado, então a chave (o digest) é confiável
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode("ascii")
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        url = self._presign_client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.key(filename),
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+                "CacheControl": f"public, max-age={UPLOAD_CACHE_MAX_AGE_SECONDS}, immutable"
+            },
+            ExpiresIn=S3_PRESIGN_EXPIRES_SECONDS
+        )
+        with self._lock:
+            self.presigned_uploads += 1
+        return {
+            "url": url,
+            "method": "PUT",
+            "headers": {
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+                "Cache-Control": f"public, max-age={UPLOAD_CACHE_MAX_AGE_SECONDS}, immutable"
+            },
+            "expires_in": S3_PRESIGN_EXPIRES_SECONDS
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "bucket": self.bucket,
+                "max_pool_connections": S3_MAX_POOL_CONNECTIONS,
+                "puts": self.puts,
+                "multipart_puts": self.multipart_puts,
+                "bytes_uploaded": self.bytes_uploaded,
+                "deletes": self.deletes,
+                "heads": self.heads,
+                "known_keys": len(self._known_keys),
+                "presigned_downloads": self.presigned_downloads,
+                "presigned_uploads": self.presigned_uploads
+            }
+
+    async def close(self):
+        await run_in_threadpool(self._client.close)
+        if self._presign_client is not self._client:
+            await run_in_threadpool(self._presign_client.close)
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._known_keys[key] = True
+            self._known_keys.move_to_end(key)
+            while len(self._known_keys) > S3_KEY_CACHE_MAX_SIZE:
+                self._known_keys.popitem(last=False)
+
+    def _download_url(self, key: str, immutable: bool):
+        """URL pré-assinada de download, reaproveitada até a metade da validade"""
+        now = time.time()
+        with self._lock:
+            cached = self._download_urls.get((key, immutable))
+            if cached is not None and cached[0] - now > S3_PRESIGN_EXPIRES_SECONDS / 2:
+                return cached
+
+        params = {"Bucket": self.bucket, "Key": key}
+        if immutable:
+            params["ResponseCacheControl"] = f"public, max-age={UPLOAD_CACHE_MAX_AGE_SECONDS}, immutable"
+        url = self._presign_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=S3_PRESIGN_EXPIRES_SECONDS
+        )
+        entry = (now + S3_PRESIGN_EXPIRES_SECONDS, url)
+        with self._lock:
+            self.presigned_downloads += 1
+            self._download_urls[(key, immutable)] = entry
+            self._download_urls.move_to_end((key, immutable))
+            while len(self._download_urls) > S3_KEY_CACHE_MAX_SIZE:
+                self._download_urls.popitem(last=False)
+        return entry
+
+
+def create_photo_storage() -> PhotoStorage:
+    """Cria o armazenamento configurado em STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "s3":
+        return S3PhotoStorage(S3_BUCKET)
+    if STORAGE_BACKEND == "local":
+        return LocalPhotoStorage()
+    raise RuntimeError(f"STORAGE_BACKEND inválido: {STORAGE_BACKEND}")
+
+
+# Instância compartilhada pelo processo
+photo_storage = create_photo_storage()
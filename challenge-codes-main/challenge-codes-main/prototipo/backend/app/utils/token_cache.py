@@ -0,0 +1,141 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Configurações do cache de tokens validados
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+
+def hash_token(token: str) -> str:
+    """Gera a chave do cache (o token em si nunca é guardado)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Cache LRU com TTL de tokens já validados e seus usuários.
+
+    Cada entrada expira no menor valor entre o TTL do cache e o exp do JWT,
+    evitando as consultas a auth_tokens e users a cada requisição.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_MAX_SIZE, ttl_seconds: int = TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # chave -> (expira_em, user_id, token_id, usuário)
+        self._keys_by_user = {}        # user_id -> {chaves}
+        self._keys_by_token_id = {}    # token_id (jti) -> chave
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str):
+        """Retorna o usuário em cache para o token, ou None"""
+        key = hash_token(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, _, _, user = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user
+
+    def peek(self, token: str):
+        """Como get, mas sem contar acerto/erro nem mexer na ordem do LRU"""
+        with self._lock:
+            entry = self._entries.get(hash_token(token))
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[3]
+
+    def set(self, token: str, user, token_exp: Optional[float] = None, token_id: Optional[str] = None):
+        """Guarda o usuário validado, expirando no máximo no exp do token"""
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+
+        key = hash_token(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, user.id, token_id, user)
+            self._keys_by_user.setdefault(user.id, set()).add(key)
+            if token_id is not None:
+                self._keys_by_token_id[token_id] = key
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate_token(self, token: str):
+        """Remove um token do cache (ex.: logout)"""
+        with self._lock:
+            self._remove(hash_token(token))
+
+    def invalidate_token_id(self, token_id: str):
+        """Remove uma entrada pelo token_id (jti), usado nas revogações de outros workers"""
+        with self._lock:
+            key = self._keys_by_token_id.get(token_id)
+            if key is not None:
+                self._remove(key)
+
+    def invalidate_user(self, user_id: int):
+        """Remove todos os tokens de um usuário (ex.: usuário alterado ou excluído)"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._keys_by_token_id.clear()
+
+    def stats(self) -> dict:
+        """Contadores de acerto/erro para monitoramento"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _remove(self, key: str):
+        """Remove uma entrada (chamar com o lock adquirido)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, user_id, token_id, _ = entry
+        user_keys = self._keys_by_user.get(user_id)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[user_id]
+        if token_id is not None:
+            self._keys_by_token_id.pop(token_id, None)
+
+
+# Instância compartilhada pelo processo
+token_cache = TokenCache()
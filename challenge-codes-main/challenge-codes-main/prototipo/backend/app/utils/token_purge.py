@@ -0,0 +1,110 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import select, or_, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.database import SessionLocal
+from ..models.auth import auth_tokens_table
+
+logger = logging.getLogger(__name__)
+
+# Configurações da limpeza de tokens
+TOKEN_PURGE_INTERVAL_SECONDS = int(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS", "300"))
+TOKEN_PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
+
+
+def expired_tokens_query(batch_size: int = TOKEN_PURGE_BATCH_SIZE):
+    """Ids de um lote de tokens expirados ou revogados.
+
+    Os dois critérios não têm parâmetros: a hora vem do servidor e a
+    revogação é a própria coluna. Assim também o plano genérico do prepared
+    statement estima os expirados e usa o índice parcial WHERE is_revoked.
+    """
+    return (
+        select(auth_tokens_table.c.id)
+        .where(or_(
+            auth_tokens_table.c.expires_at < func.timezone(literal_column("'UTC'"), func.now()),
+            auth_tokens_table.c.is_revoked
+        ))
+        .limit(batch_size)
+    )
+
+
+async def purge_expired_tokens(db: AsyncSession, batch_size: int = TOKEN_PURGE_BATCH_SIZE) -> int:
+    """Remove tokens expirados ou revogados em lotes, retornando o total removido.
+
+    Cada lote é uma transação curta; linhas travadas por outro worker são
+    ignoradas (SKIP LOCKED) em vez de bloquear.
+    """
+    total = 0
+    while True:
+        batch_ids = expired_tokens_query(batch_size).with_for_update(skip_locked=True)
+        result = await db.execute(
+            auth_tokens_table.delete().where(auth_tokens_table.c.id.in_(batch_ids.scalar_subquery()))
+        )
+        await db.commit()
+
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+class TokenPurger:
+    """Tarefa em segundo plano que executa purge_expired_tokens periodicamente"""
+
+    def __init__(self, interval_seconds: int = TOKEN_PURGE_INTERVAL_SECONDS, batch_size: int = TOKEN_PURGE_BATCH_SIZE):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.runs = 0
+        self.purged = 0
+        self.last_run_at = None
+        self._task = None
+
+    def start(self):
+        """Inicia a tarefa de limpeza no event loop (interval_seconds <= 0 desativa)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="token-purger")
+
+    async def stop(self):
+        """Cancela a tarefa e aguarda seu término"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """Executa uma rodada de limpeza"""
+        async with SessionLocal() as db:
+            purged = await purge_expired_tokens(db, self.batch_size)
+        self.runs += 1
+        self.purged += purged
+        self.last_run_at = datetime.utcnow()
+        return purged
+
+    def stats(self) -> dict:
+        """Contadores da limpeza para monitoramento"""
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "purged": self.purged,
+            "last_run_at": self.last_run_at
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Erro ao limpar tokens expirados")
+
+
+# Instância compartilhada pelo processo
+token_purger = TokenPurger()
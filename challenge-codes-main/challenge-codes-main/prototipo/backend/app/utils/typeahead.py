@@ -0,0 +1,151 @@
+import re
+from typing import Optional
+from sqlalchemy import case, func, literal, literal_column, or_, select, text, union
+
+from ..models.orders import clients_table, equipments_table
+from .order_loader import CLIENT_FIELDS, EQUIPMENT_FIELDS
+
+# Tamanho máximo de uma página de sugestões
+TYPEAHEAD_MAX_LIMIT = 50
+# Maior skip aceito
+TYPEAHEAD_MAX_SKIP = 50
+# Candidatos lidos do índice por ramo da busca: o mesmo para todas as páginas
+# (com depth variando, os empates de distância trariam conjuntos diferentes
+# e as páginas repetiriam ou pulariam linhas)
+TYPEAHEAD_CANDIDATES = TYPEAHEAD_MAX_SKIP + TYPEAHEAD_MAX_LIMIT + 1
+# Tamanho mínimo do termo: o pg_trgm só filtra pelo índice a partir de um trigrama
+TYPEAHEAD_MIN_LENGTH = 3
+# Ajuste do planner nas buscas (ver fetch_search)
+SEARCH_PLANNER_SETTINGS = text("SET LOCAL enable_bitmapscan = off")
+# Colunas da busca de equipamentos
+SEARCH_EQUIPMENT_COLUMNS = ("serial_number", "brand", "model")
+# Telefones são comparados só pelos dígitos a partir deste tamanho
+PHONE_MIN_DIGITS = 3
+
+
+def escape_like(value: str) -> str:
+    """Escapa os curingas do LIKE para buscar o texto literal"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def phone_digits(column):
+    """Só os dígitos do telefone; a expressão é a mesma do índice em schema.sql
+    (as constantes vão literais no SQL para o planner casar com o índice)"""
+    return func.regexp_replace(column, literal_column(r"'\D'"), literal_column("''"), literal_column("'g'"))
+
+
+def _candidates(fields, column, term: str):
+    """Linhas que casam com o termo na coluna, as mais parecidas de cada forma.
+
+    Três ramos (prefixo, contém e semelhante pelo <% do pg_trgm), cada um
+    ordenado pela distância <<-> (1 - word_similarity) e limitado a
+    TYPEAHEAD_CANDIDATES: o índice GiST gist_trgm_ops da coluna filtra e
+    entrega as linhas já nessa ordem, então cada ramo lê no máximo esse
+    número de linhas, por mais comum que seja o termo (ver fetch_search).
+    """
+    distance = literal(term).op("<<->")(column)
+    escaped = escape_like(term)
+    return [
+        select(*fields).where(condition).order_by(distance).limit(TYPEAHEAD_CANDIDATES)
+        for condition in (
+            column.ilike(f"{escaped}%", escape="\\"),
+            column.ilike(f"%{escaped}%", escape="\\"),
+            literal(term).op("<%")(column)
+        )
+    ]
+
+
+def _rank(term: str, prefix_columns, similarity_columns):
+    """Ordenação: prefixo exato primeiro, depois a maior semelhança"""
+    prefix = f"{escape_like(term)}%"
+    return [
+        case(*[(column.ilike(prefix, escape="\\"), 0) for column in prefix_columns], else_=1),
+        func.greatest(*[func.coalesce(func.word_similarity(term, column), 0) for column in similarity_columns]).desc()
+    ]
+
+
+def search_clients_query(q: str, limit: int, skip: int = 0):
+    """Clientes por nome, e-mail ou telefone (prefixo ou aproximado).
+
+    A ordenação completa (_rank) só é calculada sobre os candidatos dos
+    índices, TYPEAHEAD_CANDIDATES por ramo: são eles que podem ocupar as
+    primeiras TYPEAHEAD_MAX_SKIP + TYPEAHEAD_MAX_LIMIT posições, e o custo
+    não cresce com a tabela.
+    """
+    term = q.strip()
+    clients = clients_table.c
+    fields = [clients[field] for field in CLIENT_FIELDS]
+    branches = _candidates(fields, clients.name, term) + _candidates(fields, clients.email, term)
+
+    digits = re.sub(r"\D", "", term)
+    if len(digits) >= PHONE_MIN_DIGITS:
+        phone = phone_digits(clients.phone)
+        branches.append(
+            select(*fields).where(phone.like(f"%{digits}%")).order_by(literal(digits).op("<<->")(phone))
+            .limit(TYPEAHEAD_CANDIDATES)
+        )
+
+    candidates = union(*branches).subquery().c
+    return (
+        select(*[candidates[field] for field in CLIENT_FIELDS])
+        .order_by(
+            *_rank(term, [candidates.name, candidates.email], [candidates.name, candidates.email]),
+            candidates.name, candidates.id
+        )
+        .offset(skip)
+        .limit(limit + 1)  # uma linha a mais indica se há próxima página
+    )
+
+
+def search_equipments_query(q: Optional[str], client_id: Optional[int], limit: int, skip: int = 0):
+    """Equipamentos por número de série, marca ou modelo, opcionalmente de um cliente.
+
+    Com client_id, os equipamentos do cliente (poucos, pelo índice
+    client_id, id) são filtrados e ordenados direto; sem ele, a ordenação
+    é calculada só sobre os candidatos dos índices, como na busca de clientes.
+    """
+    equipments = equipments_table.c
+    fields = [equipments[field] for field in EQUIPMENT_FIELDS]
+
+    if not (q and q.strip()):
+        return select(*fields).where(equipments.client_id == client_id).order_by(equipments.id).offset(skip).limit(limit + 1)
+
+    term = q.strip()
+    if client_id:
+        escaped = escape_like(term)
+        source = equipments
+        query = select(*fields).where(
+            equipments.client_id == client_id,
+            or_(*[
+                or_(equipments[column].ilike(f"%{escaped}%", escape="\\"), literal(term).op("<%")(equipments[column]))
+                for column in SEARCH_EQUIPMENT_COLUMNS
+            ])
+        )
+    else:
+        source = union(*[
+            branch for column in SEARCH_EQUIPMENT_COLUMNS
+            for branch in _candidates(fields, equipments[column], term)
+        ]).subquery().c
+        query = select(*[source[field] for field in EQUIPMENT_FIELDS])
+
+    columns = [source[column] for column in SEARCH_EQUIPMENT_COLUMNS]
+    return query.order_by(*_rank(term, columns, columns), source.id).offset(skip).limit(limit + 1)
+
+
+async def fetch_search(db, query):
+    """Linhas de uma consulta de busca, com a leitura ordenada do índice.
+
+    O planner não tem estatística útil para o <% e, com os parâmetros do
+    prepared statement, estima poucas correspondências: prefere então um
+    bitmap que lê todas as linhas parecidas para ordená-las depois (centenas
+    de ms com termos comuns em 1 milhão de linhas). Sem bitmap, cada ramo
+    para nas primeiras linhas do índice GiST. SET LOCAL vale até o fim da
+    transação da requisição.
+    """
+    await db.execute(SEARCH_PLANNER_SETTINGS)
+    return (await db.execute(query)).fetchall()
+
+
+def page(rows, limit: int) -> dict:
+    """Monta {items, has_more} a partir das limit + 1 linhas buscadas"""
+    return {"items": rows[:limit], "has_more": len(rows) > limit}
@@ -0,0 +1,133 @@
+import os
+import re
+import uuid
+import hashlib
+from typing import Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+# Configuração do diretório de upload
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/code/uploads")
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+# Envio em lote: arquivos por requisição e quantos são gravados ao mesmo tempo
+MAX_BULK_UPLOAD_FILES = int(os.getenv("MAX_BULK_UPLOAD_FILES", "30"))
+BULK_UPLOAD_CONCURRENCY = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "4"))
+
+# Arquivos endereçados pelo conteúdo: <sha256><ext> e variantes <sha256>_<variante><ext>
+CONTENT_ADDRESSED_NAME = re.compile(r"^[0-9a-f]{64}")
+
+
+def ensure_upload_dir():
+    """Garante que o diretório de upload existe"""
+    if not os.path.exists(UPLOAD_DIR):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def relative_upload_path(filename: str) -> str:
+    """Caminho relativo do arquivo armazenado (também a chave no bucket).
+
+    Arquivos endereçados pelo conteúdo ficam em subdiretórios pelos 4
+    primeiros caracteres do digest (ab/cd/abcd...), evitando um diretório
+    único com milhares de arquivos; uploads antigos (uuid) ficam na raiz.
+    """
+    if CONTENT_ADDRESSED_NAME.match(filename):
+        return f"{filename[:2]}/{filename[2:4]}/{filename}"
+    return filename
+
+
+def upload_path(filename: str) -> str:
+    """Caminho do arquivo em UPLOAD_DIR"""
+    return os.path.join(UPLOAD_DIR, *relative_upload_path(filename).split("/"))
+
+
+def is_allowed_file(filename: str) -> bool:
+    """Verifica se o arquivo tem uma extensão permitida"""
+    return any(filename.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS)
+
+
+def file_too_large() -> HTTPException:
+    """Erro padrão para arquivos acima de MAX_FILE_SIZE"""
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB"
+    )
+
+
+def remove_file(file_path: Optional[str]):
+    """Remove o arquivo do disco, se existir (executar fora do event loop)"""
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def _close_synced(buffer):
+    """Descarrega o arquivo no disco antes do rename"""
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+
+
+async def save_upload_to_temp(file: UploadFile, max_size: int = MAX_FILE_SIZE) -> Tuple[str, int, str]:
+    """Copia o upload em blocos para um arquivo temporário em UPLOAD_DIR.
+
+    A cópia é interrompida assim que o tamanho passa de max_size e o arquivo
+    parcial é removido. O SHA-256 é calculado durante a cópia. O temporário
+    fica no mesmo sistema de arquivos do destino para que promote_upload
+    seja um rename atômico. Retorna (caminho, tamanho, digest).
+    """
+    await run_in_threadpool(ensure_upload_dir)
+    temp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}.part")
+    buffer = await run_in_threadpool(open, temp_path, "wb")
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise file_too_large()
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+        await run_in_threadpool(_close_synced, buffer)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(remove_file, temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 (hex) do arquivo, lido em blocos (executar fora do event loop)"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as buffer:
+        for chunk in iter(lambda: buffer.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _promote(temp_path: str, final_path: str, overwrite: bool):
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if not overwrite and os.path.exists(final_path):
+        # Mesmo conteúdo já armazenado: o temporário é descartado
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, final_path)
+
+
+async def promote_upload(temp_path: str, filename: str, overwrite: bool = True) -> str:
+    """Move o temporário para o nome definitivo (rename atômico).
+
+    Com overwrite=False, se o arquivo já existe (conteúdo idêntico, pois o
+    nome é o digest) o temporário é apenas removido.
+    """
+    final_path = upload_path(filename)
+    await run_in_threadpool(_promote, temp_path, final_path, overwrite)
+    return final_path
+
+
+async def discard_upload(file_path: Optional[str]):
+    """Remove um upload temporário ou definitivo"""
+    await run_in_threadpool(remove_file, file_path)
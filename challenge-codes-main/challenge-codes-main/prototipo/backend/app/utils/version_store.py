@@ -0,0 +1,101 @@
+import os
+import secrets
+import threading
+
+from .revocation_store import REVOCATION_STORE, REDIS_URL
+
+# Onde ficam as versões dos dados de referência: memory (um único processo)
+# ou redis (compartilhadas por todos os workers e pods). Segue o
+# REVOCATION_STORE quando não informado.
+VERSION_STORE = os.getenv("VERSION_STORE", REVOCATION_STORE)
+VERSION_KEY_PREFIX = "reference:version:"
+
+
+class VersionStore:
+    """Interface do armazenamento de versões por recurso.
+
+    A versão é um valor opaco que muda a cada escrita no recurso (bump) e
+    nunca volta a um valor já usado, nem após reinícios.
+    """
+
+    async def get(self, resource: str) -> str:
+        """Versão atual do recurso"""
+        raise NotImplementedError
+
+    async def bump(self, *resources: str):
+        """Troca a versão dos recursos (chamar após o commit da escrita)"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Libera conexões do armazenamento"""
+        pass
+
+
+class MemoryVersionStore(VersionStore):
+    """Versões locais em memória (um único processo).
+
+    O identificador do processo entra na versão, então um reinício nunca
+    confirma uma cópia antiga.
+    """
+
+    def __init__(self):
+        self._instance = secrets.token_hex(4)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    async def get(self, resource: str) -> str:
+        with self._lock:
+            return f"{self._instance}:{self._versions.get(resource, 0)}"
+
+    async def bump(self, *resources: str):
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+
+
+class RedisVersionStore(VersionStore):
+    """Versões compartilhadas via protocolo Redis: um contador (INCR) por recurso.
+
+    Um contador ausente (Redis novo ou esvaziado) começa de um valor
+    aleatório, para não repetir versões de antes. Aceita um cliente já
+    criado (ex.: fakeredis) para testes.
+    """
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("VERSION_STORE=redis requer o pacote 'redis' instalado")
+            client = redis.Redis.from_url(url)
+        self._client = client
+
+    async def get(self, resource: str) -> str:
+        key = VERSION_KEY_PREFIX + resource
+        version = await self._client.get(key)
+        if version is None:
+            await self._client.set(key, secrets.randbits(48), nx=True)
+            version = await self._client.get(key)
+        return version.decode("utf-8") if isinstance(version, bytes) else str(version)
+
+    async def bump(self, *resources: str):
+        async with self._client.pipeline(transaction=False) as pipeline:
+            for resource in resources:
+                pipeline.incr(VERSION_KEY_PREFIX + resource)
+            await pipeline.execute()
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_version_store() -> VersionStore:
+    """Cria o armazenamento configurado em VERSION_STORE"""
+    if VERSION_STORE == "redis":
+        return RedisVersionStore(REDIS_URL)
+    if VERSION_STORE == "memory":
+        return MemoryVersionStore()
+    raise RuntimeError(f"VERSION_STORE inválido: {VERSION_STORE}")
+
+
+# Instância compartilhada pelo processo
+version_store = create_version_store()
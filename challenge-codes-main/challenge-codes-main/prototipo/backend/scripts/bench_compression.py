@@ -0,0 +1,165 @@
+"""Compressão das respostas: tamanho, CPU e atraso do event loop.
+
+Usa os corpos JSON da listagem de ordens (--orders ordens com relações e
+fotos, como em bench_serialization) e do detalhe de uma ordem (fotos,
+modelos de checklist e respostas) e mede, para gzip e brotli em alguns
+níveis, o tamanho comprimido e a CPU por resposta (o mesmo compressor
+incremental do CompressionMiddleware).
+
+Depois roda o CompressionMiddleware em processo, com --concurrency
+respostas simultâneas do maior corpo, e mede o atraso do event loop: uma
+tarefa acorda a cada 1 ms e registra quanto acordou atrasada, que é o
+tempo em que as demais requisições do worker ficam paradas. Compara a
+compressão no próprio event loop com a feita no threadpool (corpos a partir
+de COMPRESSION_THREAD_MIN_SIZE).
+
+    cd backend
+    PYTHONPATH=. python scripts/bench_compression.py --orders 100 --photos 3
+"""
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware, _Compressor
+from app.models.order_models import ServiceOrderRead
+from app.utils.serialization import dumps, fast_response
+
+from bench_http import percentile
+from bench_serialization import orders_page
+
+LEVELS = {"gzip": (1, 5, 6, 9), "br": (1, 4, 5, 6, 11)}
+
+
+def order_detail(photos: int, checklists: int, items: int) -> dict:
+    """Detalhe de uma ordem no formato de GET /orders/{id}"""
+    order = orders_page(1, photos)[0]
+    order["checklists"] = [
+        {"id": checklist + 1, "name": f"Checklist {checklist}", "items": [
+            {"id": checklist * items + item + 1, "description": f"Verificar componente {item} do equipamento",
+             "checklist_id": checklist + 1}
+            for item in range(items)
+        ]}
+        for checklist in range(checklists)
+    ]
+    order["checklist_responses"] = [
+        {"id": position + 1, "service_order_id": order["id"], "checklist_item_id": item["id"],
+         "is_checked": position % 3 != 0, "responded_at": order["created_at"], "checklist_item": item}
+        for position, item in enumerate(item for checklist in order["checklists"] for item in checklist["items"])
+    ]
+    return order
+
+
+def compress_once(body: bytes, encoding: str, level: int) -> _Compressor:
+    setting = "COMPRESSION_BROTLI_QUALITY" if encoding == "br" else "COMPRESSION_GZIP_LEVEL"
+    previous = getattr(compression, setting)
+    setattr(compression, setting, level)
+    try:
+        compressor = _Compressor(encoding)
+    finally:
+        setattr(compression, setting, previous)
+    compressor.compress(body, final=True)
+    return compressor
+
+
+def size_and_cpu(label: str, body: bytes, number: int):
+    print(f"{label}: {len(body) / 1024:.1f} KB")
+    for encoding, levels in LEVELS.items():
+        if encoding == "br" and compression.brotli is None:
+            print("  br: pacote brotli não instalado")
+            continue
+        for level in levels:
+            runs = [compress_once(body, encoding, level) for _ in range(number)]
+            cpu_ms = sorted(run.cpu_seconds * 1000 for run in runs)
+            print(
+                f"  {encoding} {level}: {runs[0].bytes_out / 1024:.1f} KB "
+                f"({runs[0].bytes_out / len(body):.1%}), CPU p50 {percentile(cpu_ms, 0.5):.2f} ms"
+            )
+
+
+async def loop_lag(body: bytes, accept_encoding: str, thread_min_size: int, concurrency: int, total: int) -> dict:
+    """Atraso do event loop enquanto total respostas passam pelo middleware"""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def send(message):
+        await asyncio.sleep(0)  # escrita no socket
+
+    middleware = CompressionMiddleware(app, thread_min_size=thread_min_size)
+    scope = {"type": "http", "method": "GET", "path": "/orders/",
+             "headers": [(b"accept-encoding", accept_encoding.encode("latin-1"))]}
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            started_at = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(max(0.0, time.perf_counter() - started_at - 0.001))
+
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await middleware(scope, None, send)
+
+    prober = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    stop.set()
+    await prober
+
+    lags.sort()
+    return {
+        "seconds": elapsed,
+        "p50_ms": percentile(lags, 0.50) * 1000,
+        "p99_ms": percentile(lags, 0.99) * 1000,
+        "max_ms": lags[-1] * 1000
+    }
+
+
+def main(args) -> int:
+    page = fast_response(List[ServiceOrderRead], orders_page(args.orders, args.photos)).body
+    detail = dumps(order_detail(args.detail_photos, args.checklists, args.items))
+
+    print(f"Tamanho e CPU por resposta (p50 de {args.number} compressões)")
+    size_and_cpu(f"GET /orders/ ({args.orders} ordens)", page, args.number)
+    size_and_cpu("GET /orders/{id}", detail, args.number)
+
+    body = max(page, detail, key=len)
+    print(f"\nAtraso do event loop: {args.requests} respostas de {len(body) / 1024:.1f} KB, "
+          f"c={args.concurrency} (níveis configurados: gzip {compression.COMPRESSION_GZIP_LEVEL}, "
+          f"br {compression.COMPRESSION_BROTLI_QUALITY})")
+    modes = (("event loop", len(body) + 1), ("threadpool", compression.COMPRESSION_THREAD_MIN_SIZE))
+    for accept_encoding in ("identity", "gzip", "br"):
+        if accept_encoding == "br" and compression.brotli is None:
+            continue
+        for mode, thread_min_size in modes[:1] if accept_encoding == "identity" else modes:
+            result = asyncio.run(loop_lag(body, accept_encoding, thread_min_size, args.concurrency, args.requests))
+            print(
+                f"  {accept_encoding} ({mode}): {args.requests / result['seconds']:.0f} resp/s | atraso p50 "
+                f"{result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, máx {result['max_ms']:.2f} ms"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tamanho, CPU e atraso do event loop da compressão")
+    parser.add_argument("--orders", type=int, default=100, help="ordens na página da listagem")
+    parser.add_argument("--photos", type=int, default=3, help="fotos por ordem na listagem")
+    parser.add_argument("--detail-photos", type=int, default=10, help="fotos no detalhe")
+    parser.add_argument("--checklists", type=int, default=5, help="modelos de checklist no detalhe")
+    parser.add_argument("--items", type=int, default=20, help="itens por checklist")
+    parser.add_argument("--number", type=int, default=50, help="compressões medidas por nível")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""GET /orders/ com e sem fields=: tamanho da resposta e latência.
+
+Para cada conjunto de campos (resposta completa, os campos da listagem do
+frontend e um mínimo), mede os bytes do JSON (sem compressão) e os bytes
+transferidos com Accept-Encoding: gzip, e roda uma carga concorrente
+(como bench_http) para a latência:
+
+    cd backend
+    uvicorn app.main:app --port 8000 --workers 1
+    python scripts/bench_fields.py --url http://localhost:8000 \\
+        --username admin --password 123456 --limit 100 --pagination cursor \\
+        --concurrency 20 --requests 1000
+
+O banco precisa ter pelo menos --limit ordens.
+"""
+import sys
+import asyncio
+import argparse
+from urllib.parse import urlencode
+
+import httpx
+
+from bench_http import login, print_result, run_load
+
+# Campos pedidos pela listagem de ordens do frontend (views/Orders.vue)
+ORDER_LIST_FIELDS = (
+    "id,title,status,description,created_at,"
+    "client.name,equipment.type,equipment.brand,equipment.model,equipment.serial_number,"
+    "user.name,user.username"
+)
+VARIANTS = (
+    ("completa", None),
+    ("listagem", ORDER_LIST_FIELDS),
+    ("mínima", "id,title,status"),
+)
+
+
+async def response_bytes(client: httpx.AsyncClient, path: str, headers, accept_encoding: str) -> int:
+    """Bytes recebidos pela rota com o Accept-Encoding dado"""
+    async with client.stream("GET", path, headers={**headers, "Accept-Encoding": accept_encoding}) as response:
+        if response.status_code != 200:
+            raise SystemExit(f"GET {path} falhou ({response.status_code})")
+        return sum([len(chunk) async for chunk in response.aiter_raw()])
+
+
+async def main(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+
+        failed = False
+        for label, fields in VARIANTS:
+            params = {"limit": args.limit, "pagination": args.pagination}
+            if args.include_photos:
+                params["include_photos"] = "true"
+            if fields is not None:
+                params["fields"] = fields
+            path = f"/orders/?{urlencode(params)}"
+
+            raw = await response_bytes(client, path, headers, "identity")
+            gzipped = await response_bytes(client, path, headers, "gzip")
+            print(f"{label}: JSON {raw} bytes, gzip {gzipped} bytes")
+
+            # Aquecimento (cache de tokens, pool, serializadores compilados)
+            await run_load(client, [path], headers, args.concurrency, args.concurrency)
+            result = await run_load(client, [path], headers, args.concurrency, args.requests)
+            print_result(f"  {label}", result)
+            failed = failed or result["errors"] > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tamanho e latência de GET /orders/ com e sem fields=")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pagination", default="cursor", choices=("offset", "cursor"))
+    parser.add_argument("--include-photos", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,105 @@
+"""Carga HTTP concorrente contra a API: requisições por segundo e latência.
+
+Para comparar duas versões (ex.: a pilha síncrona anterior e a assíncrona),
+suba cada uma com o mesmo banco e rode o script apontando --url para ela:
+
+    cd backend
+    uvicorn app.main:app --port 8000 --workers 1
+    python scripts/bench_http.py --url http://localhost:8000 \\
+        --username admin --password 123456 \\
+        --path "/orders/?limit=20" --path /orders/clients/ \\
+        --concurrency 50 --requests 2000
+
+As rotas de --path são pedidas em rodízio, todas com o mesmo token.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por posição (values já ordenado)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> Dict[str, str]:
+    """Cabeçalho Authorization de um login novo"""
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    if response.status_code != 200:
+        raise SystemExit(f"Falha no login ({response.status_code}): {response.text}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(client: httpx.AsyncClient, paths: List[str], headers: Dict[str, str],
+                   concurrency: int, total: int) -> dict:
+    """Dispara total requisições com até concurrency em paralelo"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    next_request = 0
+
+    async def worker():
+        nonlocal next_request
+        while next_request < total:
+            path = paths[next_request % len(paths)]
+            next_request += 1
+            started_at = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started_at)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1)
+    }
+
+
+def print_result(label: str, result: dict):
+    print(
+        f"{label}: {result['requests']} req em {result['seconds']}s = {result['rps']} req/s | "
+        f"p50 {result['p50_ms']} ms, p90 {result['p90_ms']} ms, p99 {result['p99_ms']} ms, "
+        f"máx {result['max_ms']} ms | erros {result['errors']} {result['statuses']}"
+    )
+
+
+async def main(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+        if args.warmup:
+            await run_load(client, args.path, headers, args.concurrency, args.warmup)
+        result = await run_load(client, args.path, headers, args.concurrency, args.requests)
+    print_result(f"{args.url} c={args.concurrency}", result)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requisições por segundo e latência sob carga concorrente")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--path", action="append", help="rota pedida (repetível; padrão /orders/?limit=20)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200, help="requisições descartadas antes da medição")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    args.path = args.path or ["/orders/?limit=20"]
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,63 @@
+"""Conexões do pool usadas por requisição (checkouts em GET /metrics/).
+
+Lê db_pool.checkouts antes e depois da carga e divide pelo número de
+requisições, descontando a própria leitura das métricas. Para medir o pior
+caso (todo pedido autentica no banco), suba a API sem cache de tokens:
+
+    cd backend
+    TOKEN_CACHE_MAX_SIZE=0 uvicorn app.main:app --port 8000 --workers 1
+    python scripts/bench_pool.py --url http://localhost:8000 \\
+        --username admin --password 123456 --path "/orders/?limit=20"
+
+O usuário precisa ser administrador (GET /metrics/).
+"""
+import sys
+import asyncio
+import argparse
+
+import httpx
+
+from bench_http import login, print_result, run_load
+
+
+async def _pool(client: httpx.AsyncClient, headers) -> dict:
+    response = await client.get("/metrics/", headers=headers)
+    if response.status_code != 200:
+        raise SystemExit(f"GET /metrics/ falhou ({response.status_code}): {response.text}")
+    return response.json()["db_pool"]
+
+
+async def main(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+
+        # Custo da leitura das métricas em si (autenticação sem cache usa o banco)
+        first = await _pool(client, headers)
+        before = await _pool(client, headers)
+        metrics_cost = before["checkouts"] - first["checkouts"]
+
+        result = await run_load(client, args.path, headers, args.concurrency, args.requests)
+        after = await _pool(client, headers)
+
+    checkouts = after["checkouts"] - before["checkouts"] - metrics_cost
+    print_result(f"{args.url} c={args.concurrency}", result)
+    print(
+        f"checkouts do pool: {checkouts} em {args.requests} req = {checkouts / args.requests:.2f} por requisição | "
+        f"espera média {after['avg_wait_ms']} ms, máx {after['max_wait_ms']} ms, timeouts {after['timeouts']}"
+    )
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conexões do pool por requisição")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--path", action="append", help="rota pedida (repetível; padrão /orders/?limit=20)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    args.path = args.path or ["/orders/?limit=20"]
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,104 @@
+"""Serialização de uma página de ordens: response_model x fast_response.
+
+Monta em memória uma página de --orders ordens no formato dos loaders
+(cliente, equipamento, técnico e --photos fotos com variantes) e mede, por
+página, o tempo de cada caminho até os bytes da resposta:
+
+- response_model: o que o FastAPI faz com o response_model da rota
+  (validação, dump_python em modo json e JSONResponse)
+- dump_json: validação e TypeAdapter.dump_json do Pydantic
+- fast_response: serializador pré-compilado + orjson (utils/serialization)
+
+Sem banco nem servidor; rode a partir de backend/:
+
+    cd backend
+    PYTHONPATH=. python scripts/bench_serialization.py --orders 100 --photos 3
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.models.order_models import ServiceOrderRead
+from app.utils.serialization import fast_response
+
+
+def orders_page(count: int, photos: int) -> List[dict]:
+    """Ordens no formato de load_orders (datetimes, relações aninhadas)"""
+    now = datetime(2026, 3, 14, 15, 9, 26, tzinfo=timezone.utc)
+    page = []
+    for index in range(count):
+        created_at = now - timedelta(minutes=index)
+        page.append({
+            "id": index + 1, "title": f"Ordem {index} – troca de tela", "description": "Descrição " * 20,
+            "activities_description": None, "status": ("open", "in_progress", "closed")[index % 3],
+            "client_id": index + 1, "equipment_id": index + 1, "user_id": 1 + index % 20,
+            "created_at": created_at, "updated_at": created_at,
+            "client": {"id": index + 1, "name": f"Cliente {index}", "email": f"c{index}@x.com",
+                       "phone": "11 99999-0000", "address": "Rua A, 10", "created_at": created_at},
+            "equipment": {"id": index + 1, "client_id": index + 1, "type": "Notebook", "brand": "Dell",
+                          "model": f"M{index}", "serial_number": f"SN-{index}", "created_at": created_at},
+            "user": {"id": 1 + index % 20, "username": f"tec{index % 20}", "name": f"Técnico {index % 20}",
+                     "email": None, "role": "tecnico", "is_active": True, "created_at": now},
+            "photos": [
+                {"id": index * photos + photo + 1, "service_order_id": index + 1,
+                 "photo_url": f"/uploads/{index:08x}{photo}.jpg", "uploaded_at": created_at,
+                 "thumbnail_url": f"/orders/uploads/{index:08x}{photo}.jpg?size=thumb",
+                 "variants": {"thumb": f"/uploads/{index:08x}{photo}_thumb.jpg",
+                              "medium": f"/uploads/{index:08x}{photo}_medium.jpg"}}
+                for photo in range(photos)
+            ]
+        })
+    return page
+
+
+def best_time(function, repeat: int, number: int) -> float:
+    """Melhor média por chamada (s) entre repeat rodadas de number chamadas"""
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - started_at) / number)
+    return best
+
+
+def main(args) -> int:
+    annotation = List[ServiceOrderRead]
+    adapter = TypeAdapter(annotation)
+    data = orders_page(args.orders, args.photos)
+
+    def response_model() -> bytes:
+        content = adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json")
+        return JSONResponse(content).body
+
+    def dump_json() -> bytes:
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+    def fast() -> bytes:
+        return fast_response(annotation, data).body
+
+    if fast() != dump_json():
+        print("Aviso: fast_response difere do dump_json do Pydantic", file=sys.stderr)
+
+    print(f"{args.orders} ordens, {args.photos} fotos cada, {len(fast()) / 1024:.1f} KB por página "
+          f"(melhor de {args.repeat}x{args.number})")
+    baseline = None
+    for label, function in (("response_model", response_model), ("dump_json", dump_json), ("fast_response", fast)):
+        seconds = best_time(function, args.repeat, args.number)
+        baseline = baseline or seconds
+        print(f"{label}: {seconds * 1000:.2f} ms por página ({baseline / seconds:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="response_model x fast_response em uma página de ordens")
+    parser.add_argument("--orders", type=int, default=100, help="ordens por página")
+    parser.add_argument("--photos", type=int, default=3, help="fotos por ordem")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    sys.exit(main(parser.parse_args()))
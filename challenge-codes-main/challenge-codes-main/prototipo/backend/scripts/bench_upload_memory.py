@@ -0,0 +1,104 @@
+"""Memória do servidor (RSS) durante uploads de fotos concorrentes.
+
+Envia --uploads arquivos de --size-mb MB para POST /orders/{id}/photos, até
+--concurrency ao mesmo tempo, e amostra o RSS do processo da API (--pid)
+enquanto a carga roda. Com o upload em blocos o pico deve ficar perto do
+valor inicial, sem crescer com o número de uploads simultâneos:
+
+    cd backend
+    uvicorn app.main:app --port 8000 --workers 1 & echo $!
+    python scripts/bench_upload_memory.py --url http://localhost:8000 \\
+        --username admin --password 123456 --order-id 1 --pid <pid do uvicorn> \\
+        --concurrency 30 --uploads 60
+
+O conteúdo de cada arquivo é aleatório (não há deduplicação entre eles).
+Com --size-mb acima de 10 os uploads são recusados com 413; o pico mostra
+quanto do corpo chega a ser lido antes da recusa.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+import httpx
+import psutil
+
+from bench_http import login
+
+MB = 1024 * 1024
+
+
+async def sample_rss(process: psutil.Process, samples: List[int], stop: asyncio.Event, interval: float):
+    """Lê o RSS do processo a cada interval segundos até stop"""
+    while not stop.is_set():
+        samples.append(process.memory_info().rss)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_uploads(client: httpx.AsyncClient, order_id: int, headers, size: int,
+                      concurrency: int, total: int) -> dict:
+    """Dispara total uploads com até concurrency em paralelo"""
+    statuses = {}
+    next_upload = 0
+
+    async def worker():
+        nonlocal next_upload
+        while next_upload < total:
+            next_upload += 1
+            content = os.urandom(size)
+            response = await client.post(
+                f"/orders/{order_id}/photos", headers=headers,
+                files={"file": ("bench.jpg", content, "image/jpeg")}
+            )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"statuses": statuses, "seconds": round(time.perf_counter() - started_at, 2)}
+
+
+async def main(args) -> int:
+    process = psutil.Process(args.pid)
+    size = int(args.size_mb * MB)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+        # Aquecimento: carrega os módulos do caminho de upload antes da linha de base
+        await run_uploads(client, args.order_id, headers, size, 1, 1)
+        baseline = process.memory_info().rss
+
+        samples: List[int] = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(process, samples, stop, args.interval))
+        result = await run_uploads(client, args.order_id, headers, size, args.concurrency, args.uploads)
+        stop.set()
+        await sampler
+
+    peak = max(samples + [baseline])
+    end = process.memory_info().rss
+    print(
+        f"{args.uploads} uploads de {args.size_mb} MB, c={args.concurrency}, em {result['seconds']}s "
+        f"{result['statuses']} | RSS inicial {baseline / MB:.1f} MB, pico {peak / MB:.1f} MB "
+        f"(+{(peak - baseline) / MB:.1f} MB), final {end / MB:.1f} MB"
+    )
+    return 1 if any(status >= 500 for status in result["statuses"]) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RSS do servidor durante uploads concorrentes")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--order-id", type=int, required=True)
+    parser.add_argument("--pid", type=int, required=True, help="pid do processo da API (uvicorn --workers 1)")
+    parser.add_argument("--size-mb", type=float, default=9.5, help="tamanho de cada arquivo")
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--uploads", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.05, help="intervalo entre amostras de RSS")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,180 @@
+"""Configuração dos testes.
+
+Os testes de banco rodam em um PostgreSQL real (as consultas usam tsvector,
+pg_trgm e ON CONFLICT): o banco TEST_DB_NAME (padrão os_test) é recriado a
+partir de initdb/schema.sql com as credenciais DB_HOST, DB_PORT, DB_USER e
+DB_PASSWORD. Sem servidor acessível, esses testes são pulados.
+
+    cd backend
+    DB_HOST=localhost DB_PORT=5432 pytest
+"""
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Antes de importar a aplicação: as configurações são lidas na importação
+os.environ["DB_NAME"] = os.getenv("TEST_DB_NAME", "os_test")
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="os-test-uploads-"))
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("TOKEN_PURGE_INTERVAL_SECONDS", "0")
+os.environ.setdefault("PHOTO_VARIANT_BACKFILL_INTERVAL_SECONDS", "0")
+
+import bcrypt
+import httpx
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.main import app
+from app.models.database import engine, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from app.models.auth import users_table
+from app.models.orders import (
+    clients_table, equipments_table, service_orders_table, os_photos_table, os_photo_variants_table
+)
+from app.utils.token_cache import token_cache
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "initdb" / "schema.sql"
+
+# Tabelas esvaziadas antes de cada teste (os checklists de exemplo ficam)
+DATA_TABLES = (
+    "auth_tokens", "os_photo_variants", "os_photos", "photo_blobs", "os_checklist_responses",
+    "service_orders", "equipments", "clients", "users"
+)
+
+TEST_PASSWORD = "senha-de-teste"
+
+
+def schema_statements(sql: str):
+    """Divide o schema.sql em comandos, respeitando blocos DO $$ ... $$.
+
+    Cada comando é enviado sozinho (como faz o psql): CREATE INDEX
+    CONCURRENTLY não roda dentro de um bloco de transação.
+    """
+    statement, in_dollar_quote = [], False
+    for line in sql.splitlines():
+        if not statement and (not line.strip() or line.lstrip().startswith("--")):
+            continue
+        statement.append(line)
+        if line.count("$$") % 2:
+            in_dollar_quote = not in_dollar_quote
+        if not in_dollar_quote and line.rstrip().endswith(";"):
+            yield "\n".join(statement)
+            statement = []
+
+
+async def _create_database():
+    import asyncpg
+
+    server = dict(host=DB_HOST, port=int(DB_PORT), user=DB_USER, password=DB_PASSWORD)
+    admin = await asyncpg.connect(database="postgres", **server)
+    try:
+        await admin.execute(f'DROP DATABASE IF EXISTS "{DB_NAME}" WITH (FORCE)')
+        await admin.execute(f'CREATE DATABASE "{DB_NAME}"')
+    finally:
+        await admin.close()
+
+    connection = await asyncpg.connect(database=DB_NAME, **server)
+    try:
+        for statement in schema_statements(SCHEMA_PATH.read_text(encoding="utf-8")):
+            await connection.execute(statement)
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Banco de testes recriado uma vez por sessão a partir do schema.sql"""
+    try:
+        asyncio.run(_create_database())
+    except (OSError, asyncio.TimeoutError) as error:
+        pytest.skip(f"PostgreSQL indisponível em {DB_HOST}:{DB_PORT}: {error}")
+    return DB_NAME
+
+
+@pytest.fixture
+async def db(database):
+    """Conexão com os dados de teste zerados; o pool é descartado no final
+    (as conexões do asyncpg pertencem ao loop de cada teste)"""
+    async with engine.begin() as connection:
+        await connection.execute(text(f"TRUNCATE {', '.join(DATA_TABLES)} RESTART IDENTITY CASCADE"))
+    token_cache.clear()
+    async with engine.connect() as connection:
+        yield connection
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(db):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+        yield http_client
+
+
+@pytest.fixture
+async def admin(db, client):
+    """Administrador logado: {"id", "headers"}"""
+    password_hash = bcrypt.hashpw(TEST_PASSWORD.encode("utf-8"), bcrypt.gensalt(4)).decode("utf-8")
+    result = await db.execute(insert(users_table).values(
+        username="admin-teste", password_hash=password_hash, name="Admin", role="administrador", is_active=True
+    ))
+    await db.commit()
+    response = await client.post("/auth/login", json={"username": "admin-teste", "password": TEST_PASSWORD})
+    assert response.status_code == 200, response.text
+    return {
+        "id": result.inserted_primary_key[0],
+        "headers": {"Authorization": f"Bearer {response.json()['access_token']}"}
+    }
+
+
+@pytest.fixture
+def seed_orders(db, admin):
+    """Cria count ordens (cada uma com cliente e equipamento próprios) e photos fotos por ordem"""
+    async def seed(count: int, photos: int = 0):
+        order_ids = []
+        for index in range(count):
+            client_id = (await db.execute(
+                insert(clients_table).values(name=f"Cliente {index}")
+            )).inserted_primary_key[0]
+            equipment_id = (await db.execute(
+                insert(equipments_table).values(client_id=client_id, type="Notebook", serial_number=f"SN-{index}")
+            )).inserted_primary_key[0]
+            order_id = (await db.execute(insert(service_orders_table).values(
+                client_id=client_id, equipment_id=equipment_id, user_id=admin["id"], title=f"Ordem {index}"
+            ))).inserted_primary_key[0]
+            for photo in range(photos):
+                photo_id = (await db.execute(insert(os_photos_table).values(
+                    service_order_id=order_id, photo_url=f"/uploads/{order_id}-{photo}.jpg"
+                ))).inserted_primary_key[0]
+                await db.execute(insert(os_photo_variants_table).values(
+                    photo_id=photo_id, variant="thumb", photo_url=f"/uploads/{order_id}-{photo}_thumb.jpg"
+                ))
+            order_ids.append(order_id)
+        await db.commit()
+        return order_ids
+
+    return seed
+
+
+@pytest.fixture
+def statements():
+    """Comandos SQL enviados ao banco enquanto o contexto está aberto"""
+    class Recorder:
+        def __init__(self):
+            self.executed = []
+
+        def __enter__(self):
+            event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+            return self.executed
+
+        def __exit__(self, *exc_info):
+            event.remove(engine.sync_engine, "before_cursor_execute", self._record)
+
+        def _record(self, connection, cursor, statement, parameters, context, executemany):
+            self.executed.append(statement)
+
+    return Recorder
@@ -0,0 +1,52 @@
+"""Uploads acima do limite recebem 413 com os cabeçalhos de CORS (o
+navegador só entrega o erro ao frontend se Access-Control-Allow-Origin vier)"""
+import httpx
+import pytest
+
+from app.main import app
+from app.middleware.body_limit import MULTIPART_OVERHEAD
+from app.utils.uploads import MAX_FILE_SIZE
+
+pytestmark = pytest.mark.anyio
+
+ORIGIN = "http://localhost:3000"
+
+
+@pytest.fixture
+async def http():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+        yield http_client
+
+
+async def test_content_length_over_limit_has_cors_headers(http):
+    body = b"x" * (MAX_FILE_SIZE + MULTIPART_OVERHEAD + 1)
+
+    response = await http.post(
+        "/orders/1/photos", content=body,
+        headers={"Origin": ORIGIN, "Content-Type": "multipart/form-data; boundary=x"}
+    )
+
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == ORIGIN
+
+
+async def test_chunked_body_over_limit_has_cors_headers(http):
+    # Multipart válido enviado em pedaços, sem Content-Length
+    async def chunks():
+        yield (
+            b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"foto.jpg\"\r\n"
+            b"Content-Type: image/jpeg\r\n\r\n"
+        )
+        chunk = b"x" * (1024 * 1024)
+        for _ in range(MAX_FILE_SIZE // len(chunk) + 2):
+            yield chunk
+        yield b"\r\n--x--\r\n"
+
+    response = await http.post(
+        "/orders/1/photos", content=chunks(),
+        headers={"Origin": ORIGIN, "Content-Type": "multipart/form-data; boundary=x"}
+    )
+
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == ORIGIN
@@ -0,0 +1,104 @@
+"""Modelos de checklist: carregamento em uma consulta e cache invalidado
+pela versão compartilhada de "checklists" (criar checklist ou item em
+qualquer worker descarta a cópia de todos)"""
+import fakeredis
+import pytest
+from sqlalchemy import delete, func, insert, or_, select
+
+from app.models.orders import checklists_table, checklist_items_table
+from app.utils.checklist_cache import ChecklistTemplateCache, load_checklists
+from app.utils.version_store import RedisVersionStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def checklists(db):
+    """Remove no final os checklists e itens criados pelo teste (as tabelas
+    de modelos não são zeradas entre os testes)"""
+    last_checklist = (await db.execute(select(func.coalesce(func.max(checklists_table.c.id), 0)))).scalar()
+    last_item = (await db.execute(select(func.coalesce(func.max(checklist_items_table.c.id), 0)))).scalar()
+    await db.commit()
+
+    async def create(name: str, *descriptions: str) -> int:
+        checklist_id = (await db.execute(insert(checklists_table).values(name=name))).inserted_primary_key[0]
+        for description in descriptions:
+            await db.execute(insert(checklist_items_table).values(checklist_id=checklist_id, description=description))
+        await db.commit()
+        return checklist_id
+
+    yield create
+    await db.rollback()
+    await db.execute(delete(checklist_items_table).where(or_(
+        checklist_items_table.c.id > last_item, checklist_items_table.c.checklist_id > last_checklist
+    )))
+    await db.execute(delete(checklists_table).where(checklists_table.c.id > last_checklist))
+    await db.commit()
+
+
+def _checklist_queries(executed) -> list:
+    return [statement for statement in executed if "FROM checklists" in statement]
+
+
+async def _list(client, admin) -> dict:
+    response = await client.get("/orders/checklists/", headers=admin["headers"])
+    assert response.status_code == 200, response.text
+    return {checklist["id"]: checklist for checklist in response.json()}
+
+
+async def test_load_checklists_uses_a_single_join(db, checklists, statements):
+    first = await checklists("Limpeza", "Remover poeira", "Trocar pasta térmica")
+    empty = await checklists("Sem itens")
+
+    with statements() as executed:
+        loaded = {checklist["id"]: checklist for checklist in await load_checklists(db)}
+
+    assert len(executed) == 1
+    assert [item["description"] for item in loaded[first]["items"]] == ["Remover poeira", "Trocar pasta térmica"]
+    assert {item["checklist_id"] for item in loaded[first]["items"]} == {first}
+    assert loaded[empty]["items"] == []
+
+
+async def test_created_checklist_and_item_invalidate_the_cache(client, admin, checklists, statements):
+    await _list(client, admin)
+    with statements() as executed:
+        before = await _list(client, admin)
+    assert _checklist_queries(executed) == []
+
+    created = await client.post("/orders/checklists/", headers=admin["headers"], json={"name": "Instalação de rede"})
+    assert created.status_code == 200, created.text
+    checklist_id = created.json()["id"]
+    listed = await _list(client, admin)
+    assert set(listed) == set(before) | {checklist_id}
+    assert listed[checklist_id]["items"] == []
+
+    item = await client.post(
+        f"/orders/checklists/{checklist_id}/items/", headers=admin["headers"],
+        json={"description": "Testar conectividade", "checklist_id": checklist_id}
+    )
+    assert item.status_code == 200, item.text
+    listed = await _list(client, admin)
+    assert [entry["description"] for entry in listed[checklist_id]["items"]] == ["Testar conectividade"]
+
+    # Sem novas escritas a cópia volta a ser usada
+    with statements() as executed:
+        assert await _list(client, admin) == listed
+    assert _checklist_queries(executed) == []
+
+
+async def test_write_in_another_worker_invalidates_the_cache(db, checklists):
+    server = fakeredis.FakeServer()
+    reader, writer = [
+        ChecklistTemplateCache(RedisVersionStore(client=fakeredis.FakeAsyncRedis(server=server)))
+        for _ in range(2)
+    ]
+    await reader.get(db)
+    await reader.get(db)
+    assert (reader.hits, reader.misses) == (1, 1)
+
+    checklist_id = await checklists("Reparo de fonte", "Medir tensões")
+    await writer.store.bump("checklists")
+
+    loaded = {checklist["id"]: checklist for checklist in await reader.get(db)}
+    assert [item["description"] for item in loaded[checklist_id]["items"]] == ["Medir tensões"]
+    assert (reader.misses, reader.invalidations) == (2, 1)
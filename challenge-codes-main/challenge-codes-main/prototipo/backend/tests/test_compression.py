@@ -0,0 +1,52 @@
+"""CompressionMiddleware: corpos comprimidos no event loop ou no threadpool
+(inteiros ou em pedaços) decodificam para o original"""
+import gzip
+
+import pytest
+
+from app.middleware import compression
+from app.middleware.compression import CompressionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"items":[' + b",".join(b'{"id":%d,"title":"Ordem %d"}' % (index, index) for index in range(5000)) + b"]}"
+
+
+def _decode(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return compression.brotli.decompress(body)
+    return gzip.decompress(body)
+
+
+async def _respond(encoding: str, chunks, thread_min_size: int):
+    """(cabeçalhos, corpo) da resposta de chunks passada pelo middleware"""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        for position, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": position < len(chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/orders/",
+             "headers": [(b"accept-encoding", encoding.encode("latin-1"))]}
+    await CompressionMiddleware(app, thread_min_size=thread_min_size)(scope, None, send)
+    return dict(sent[0]["headers"]), b"".join(message.get("body", b"") for message in sent[1:])
+
+
+@pytest.mark.parametrize("chunked", [False, True], ids=["inteiro", "pedacos"])
+@pytest.mark.parametrize("thread_min_size", [len(BODY) + 1, 1024], ids=["event-loop", "threadpool"])
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+async def test_compressed_body_decodes_to_original(encoding, thread_min_size, chunked):
+    if encoding == "br" and compression.brotli is None:
+        pytest.skip("pacote brotli não instalado")
+    chunks = [BODY[:len(BODY) // 2], BODY[len(BODY) // 2:]] if chunked else [BODY]
+
+    headers, compressed = await _respond(encoding, chunks, thread_min_size)
+
+    assert headers[b"content-encoding"] == encoding.encode("latin-1")
+    assert len(compressed) < len(BODY) // 5
+    assert _decode(encoding, compressed) == BODY
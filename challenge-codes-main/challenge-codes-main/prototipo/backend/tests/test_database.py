@@ -0,0 +1,30 @@
+"""get_db: a conexão só sai do pool na primeira consulta, em transação
+somente leitura para GET/HEAD"""
+import pytest
+from fastapi import Request
+from sqlalchemy import text
+
+from app.models.database import engine, get_db
+
+pytestmark = pytest.mark.anyio
+
+
+def _request(method: str) -> Request:
+    return Request({"type": "http", "method": method, "path": "/", "headers": []})
+
+
+@pytest.mark.parametrize("method, read_only", [("GET", "on"), ("HEAD", "on"), ("POST", "off")])
+async def test_session_takes_a_connection_on_first_query(db, method, read_only):
+    checked_out = engine.pool.checkedout()
+    async for session in get_db(_request(method)):
+        assert engine.pool.checkedout() == checked_out
+        assert (await session.execute(text("SHOW transaction_read_only"))).scalar() == read_only
+        assert engine.pool.checkedout() == checked_out + 1
+    assert engine.pool.checkedout() == checked_out
+
+
+async def test_read_only_option_does_not_leak_to_pooled_connections(db):
+    async for session in get_db(_request("GET")):
+        await session.execute(text("SELECT 1"))
+    async for session in get_db(_request("PUT")):
+        assert (await session.execute(text("SHOW transaction_read_only"))).scalar() == "off"
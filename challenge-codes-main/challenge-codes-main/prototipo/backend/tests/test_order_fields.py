@@ -0,0 +1,58 @@
+"""GET /orders/?fields=... devolve só os campos pedidos (mais o id)"""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _get(client, admin, **params):
+    response = await client.get("/orders/", headers=admin["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_offset_page_has_only_requested_fields(client, admin, seed_orders):
+    await seed_orders(3)
+
+    orders = await _get(client, admin, fields="title,client.name")
+
+    assert len(orders) == 3
+    assert all(set(order) == {"id", "title", "client"} for order in orders)
+    assert all(set(order["client"]) == {"id", "name"} for order in orders)
+
+
+@pytest.mark.parametrize("sort", ["created_at", "updated_at"])
+async def test_cursor_page_omits_sort_column_not_requested(client, admin, seed_orders, sort):
+    order_ids = await seed_orders(5)
+
+    page = await _get(client, admin, fields="title", pagination="cursor", sort=sort, limit=3)
+    assert all(set(order) == {"id", "title"} for order in page["items"])
+    assert page["next_cursor"]
+
+    # O cursor continua funcionando sem a coluna na resposta
+    rest = await _get(client, admin, fields="title", pagination="cursor", sort=sort, limit=3,
+                      cursor=page["next_cursor"])
+    assert all(set(order) == {"id", "title"} for order in rest["items"])
+    assert rest["next_cursor"] is None
+    ids = [order["id"] for order in page["items"] + rest["items"]]
+    assert sorted(ids) == sorted(order_ids)
+
+
+async def test_cursor_page_keeps_requested_sort_column(client, admin, seed_orders):
+    await seed_orders(2)
+
+    page = await _get(client, admin, fields="title,created_at", pagination="cursor")
+
+    assert all(set(order) == {"id", "title", "created_at"} for order in page["items"])
+
+
+async def test_user_relation_is_projected_like_the_others(client, admin, seed_orders):
+    await seed_orders(2)
+
+    named = await _get(client, admin, fields="title,user.name")
+    full = await _get(client, admin, fields="user")
+
+    assert all(order["user"] == {"id": admin["id"], "name": "Admin"} for order in named)
+    assert all(
+        set(order["user"]) == {"id", "username", "name", "email", "role", "is_active", "created_at"}
+        for order in full
+    )
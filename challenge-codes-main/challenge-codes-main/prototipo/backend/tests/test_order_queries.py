@@ -0,0 +1,52 @@
+"""GET /orders/ custa um número fixo de consultas, qualquer que seja o número
+de ordens: 1 (ordens com cliente, equipamento e técnico no mesmo JOIN) ou
+2 com include_photos (todas as fotos da página em uma consulta)."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _list_orders(client, admin, statements, **params):
+    # A primeira requisição valida o token no banco; as seguintes usam o cache
+    await client.get("/orders/", headers=admin["headers"], params={"limit": 1})
+    with statements() as executed:
+        response = await client.get("/orders/", headers=admin["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return response.json(), executed
+
+
+@pytest.mark.parametrize("count", [1, 5, 30])
+async def test_list_orders_uses_one_query(client, admin, seed_orders, statements, count):
+    await seed_orders(count, photos=2)
+
+    orders, executed = await _list_orders(client, admin, statements)
+
+    assert len(orders) == count
+    assert all(order["client"] and order["equipment"] and order["user"] for order in orders)
+    assert len(executed) == 1, executed
+
+
+@pytest.mark.parametrize("count", [1, 5, 30])
+async def test_list_orders_with_photos_uses_two_queries(client, admin, seed_orders, statements, count):
+    await seed_orders(count, photos=2)
+
+    orders, executed = await _list_orders(client, admin, statements, include_photos="true")
+
+    assert len(orders) == count
+    assert all(len(order["photos"]) == 2 for order in orders)
+    assert all(order["photos"][0]["variants"]["thumb"] for order in orders)
+    assert len(executed) == 2, executed
+
+
+async def test_cursor_pages_use_one_query_each(client, admin, seed_orders, statements):
+    await seed_orders(12)
+
+    page, executed = await _list_orders(client, admin, statements, pagination="cursor", limit=5)
+    assert len(page["items"]) == 5 and page["next_cursor"]
+    assert len(executed) == 1, executed
+
+    page, executed = await _list_orders(
+        client, admin, statements, pagination="cursor", limit=5, cursor=page["next_cursor"]
+    )
+    assert len(page["items"]) == 5
+    assert len(executed) == 1, executed
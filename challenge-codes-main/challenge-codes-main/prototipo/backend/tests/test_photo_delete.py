@@ -0,0 +1,133 @@
+"""DELETE /orders/photos/{id} só remove os arquivos depois do commit, e só
+os que nenhuma outra foto usa"""
+import os
+import asyncio
+
+import pytest
+from fastapi import Request
+
+from app.main import app
+from app.models.database import get_db
+from app.routers import orders
+from app.utils.photo_blobs import remove_orphan_files
+from app.utils.storage import photo_storage
+from app.utils.photo_variants import photo_variant_pipeline
+from app.utils.uploads import upload_path
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def upload(client, admin, monkeypatch):
+    """Envia uma foto (sem gerar variantes) e retorna (foto, caminho do arquivo)"""
+    async def generate(photo_id, filename, digest=None):
+        pass
+
+    monkeypatch.setattr(photo_variant_pipeline, "generate", generate)
+
+    async def send(order_id: int, content: bytes):
+        response = await client.post(
+            f"/orders/{order_id}/photos", headers=admin["headers"],
+            files={"file": ("foto.jpg", content, "image/jpeg")}
+        )
+        assert response.status_code == 200, response.text
+        photo = response.json()
+        return photo, upload_path(os.path.basename(photo["photo_url"]))
+
+    return send
+
+
+async def test_delete_removes_file_of_last_reference(client, admin, seed_orders, upload):
+    [order_id] = await seed_orders(1)
+    photo, path = await upload(order_id, b"conteudo unico")
+    assert os.path.exists(path)
+
+    response = await client.delete(f"/orders/photos/{photo['id']}", headers=admin["headers"])
+
+    assert response.status_code == 200
+    assert not os.path.exists(path)
+
+
+async def test_delete_keeps_file_shared_with_other_photo(client, admin, seed_orders, upload):
+    first_order, second_order = await seed_orders(2)
+    photo, path = await upload(first_order, b"mesmo conteudo")
+    other, other_path = await upload(second_order, b"mesmo conteudo")
+    assert other_path == path
+
+    response = await client.delete(f"/orders/photos/{photo['id']}", headers=admin["headers"])
+
+    assert response.status_code == 200
+    assert os.path.exists(path)
+    photos = await client.get(f"/orders/{second_order}/photos", headers=admin["headers"])
+    assert [item["id"] for item in photos.json()] == [other["id"]]
+
+
+async def test_failed_commit_keeps_photo_and_file(client, admin, seed_orders, upload):
+    [order_id] = await seed_orders(1)
+    photo, path = await upload(order_id, b"conteudo preservado")
+
+    async def db_with_failing_commit(request: Request):
+        async for db in get_db(request):
+            async def commit():
+                raise RuntimeError("falha no commit")
+            db.commit = commit
+            yield db
+
+    app.dependency_overrides[get_db] = db_with_failing_commit
+    try:
+        response = await client.delete(f"/orders/photos/{photo['id']}", headers=admin["headers"])
+    finally:
+        app.dependency_overrides.pop(get_db)
+
+    assert response.status_code == 500
+    assert os.path.exists(path)
+    photos = await client.get(f"/orders/{order_id}/photos", headers=admin["headers"])
+    assert [item["id"] for item in photos.json()] == [photo["id"]]
+
+
+async def test_content_uploaded_again_before_removal_is_kept(admin, seed_orders, upload):
+    [order_id] = await seed_orders(1)
+    photo, path = await upload(order_id, b"enviado de novo")
+    digest = os.path.splitext(os.path.basename(path))[0]
+
+    # O blob existe: a remoção agendada pela exclusão anterior não apaga nada
+    await remove_orphan_files(digest, [os.path.basename(path)])
+
+    assert os.path.exists(path)
+
+
+async def test_upload_during_removal_keeps_its_file(client, admin, seed_orders, upload, monkeypatch):
+    [order_id] = await seed_orders(1)
+    photo, path = await upload(order_id, b"reenviado durante a remocao")
+    digest = os.path.splitext(os.path.basename(path))[0]
+
+    # Exclusão sem a remoção dos arquivos, que é disparada abaixo à mão
+    scheduled = []
+
+    async def record(*args):
+        scheduled.append(args)
+
+    monkeypatch.setattr(orders, "remove_orphan_files", record)
+    response = await client.delete(f"/orders/photos/{photo['id']}", headers=admin["headers"])
+    assert response.status_code == 200
+    assert scheduled[0][0] == digest and os.path.basename(path) in scheduled[0][1]
+
+    # O mesmo conteúdo chega depois da verificação do blob e antes da remoção
+    delete = photo_storage.delete
+    reupload, blocked = None, None
+
+    async def delete_after_reupload(filename):
+        nonlocal reupload, blocked
+        if reupload is None:
+            reupload = asyncio.create_task(upload(order_id, b"reenviado durante a remocao"))
+            await asyncio.sleep(0.3)
+            blocked = not reupload.done()
+        await delete(filename)
+
+    monkeypatch.setattr(photo_storage, "delete", delete_after_reupload)
+    await remove_orphan_files(*scheduled[0])
+    again, again_path = await reupload
+
+    assert blocked  # o reenvio esperou a trava do conteúdo
+    assert again_path == path
+    assert os.path.exists(path)
@@ -0,0 +1,124 @@
+"""Os uploads de foto devolvem a mesma thumbnail_url da listagem e do detalhe;
+uma falha ao armazenar desfaz a foto e só depois remove o arquivo"""
+import hashlib
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.orders import os_photos_table, photo_blobs_table
+from app.utils.photo_variants import photo_variant_pipeline
+from app.utils.storage import photo_storage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_variants(monkeypatch):
+    async def generate(photo_id, filename, digest=None):
+        pass
+
+    monkeypatch.setattr(photo_variant_pipeline, "generate", generate)
+
+
+async def _listed_thumbnails(client, admin, order_id):
+    photos = await client.get(f"/orders/{order_id}/photos", headers=admin["headers"])
+    return {photo["id"]: photo["thumbnail_url"] for photo in photos.json()}
+
+
+async def test_single_upload_returns_thumbnail_url(client, admin, seed_orders):
+    [order_id] = await seed_orders(1)
+
+    response = await client.post(
+        f"/orders/{order_id}/photos", headers=admin["headers"],
+        files={"file": ("foto.jpg", b"foto avulsa", "image/jpeg")}
+    )
+
+    assert response.status_code == 200, response.text
+    photo = response.json()
+    assert photo["thumbnail_url"].endswith("?size=thumb")
+    assert await _listed_thumbnails(client, admin, order_id) == {photo["id"]: photo["thumbnail_url"]}
+
+
+async def test_bulk_upload_returns_thumbnail_url(client, admin, seed_orders):
+    [order_id] = await seed_orders(1)
+
+    response = await client.post(
+        f"/orders/{order_id}/photos/bulk", headers=admin["headers"],
+        files=[("files", (f"foto{index}.jpg", f"foto {index}".encode(), "image/jpeg")) for index in range(3)]
+    )
+
+    assert response.status_code == 200, response.text
+    photos = [result["photo"] for result in response.json()["results"]]
+    assert all(photo["thumbnail_url"] for photo in photos)
+    assert await _listed_thumbnails(client, admin, order_id) == {
+        photo["id"]: photo["thumbnail_url"] for photo in photos
+    }
+
+
+@pytest.fixture
+def failing_storage(db, monkeypatch):
+    """put falha para os nomes em fail_on; delete registra se o blob ainda
+    existia no banco (commit feito antes?) e falha também"""
+    state = {"fail_on": None, "deleted": []}
+    put = photo_storage.put
+
+    async def failing_put(local_path, filename, overwrite=True):
+        if state["fail_on"] is None or filename.startswith(state["fail_on"]):
+            raise RuntimeError("disco cheio")
+        await put(local_path, filename, overwrite=overwrite)
+
+    async def failing_delete(filename):
+        blobs = (await db.execute(
+            select(func.count()).select_from(photo_blobs_table)
+            .where(photo_blobs_table.c.filename == filename)
+        )).scalar()
+        await db.rollback()
+        state["deleted"].append((filename, blobs))
+        raise OSError("armazenamento indisponível")
+
+    monkeypatch.setattr(photo_storage, "put", failing_put)
+    monkeypatch.setattr(photo_storage, "delete", failing_delete)
+    return state
+
+
+async def _count(db, table) -> int:
+    count = (await db.execute(select(func.count()).select_from(table))).scalar()
+    await db.rollback()
+    return count
+
+
+async def test_failed_store_undoes_photo_before_removing_file(client, admin, seed_orders, db, failing_storage):
+    [order_id] = await seed_orders(1)
+
+    response = await client.post(
+        f"/orders/{order_id}/photos", headers=admin["headers"],
+        files={"file": ("foto.jpg", b"sem espaco", "image/jpeg")}
+    )
+
+    # O erro original chega ao cliente, mesmo com a remoção do arquivo falhando
+    assert response.status_code == 500
+    assert "disco cheio" in response.json()["detail"]
+    assert await _count(db, os_photos_table) == 0
+    assert await _count(db, photo_blobs_table) == 0
+    [(filename, blobs_at_delete)] = failing_storage["deleted"]
+    assert blobs_at_delete == 0  # o blob já tinha saído (commit) quando o arquivo foi removido
+
+
+async def test_bulk_failed_store_removes_file_after_commit(client, admin, seed_orders, db, failing_storage):
+    [order_id] = await seed_orders(1)
+    contents = [b"primeira foto", b"segunda foto"]
+    failing_storage["fail_on"] = hashlib.sha256(contents[1]).hexdigest()
+
+    response = await client.post(
+        f"/orders/{order_id}/photos/bulk", headers=admin["headers"],
+        files=[("files", (f"foto{index}.jpg", content, "image/jpeg")) for index, content in enumerate(contents)]
+    )
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["uploaded"], body["failed"]) == (1, 1)
+    assert [result["status"] for result in body["results"]] == ["ok", "error"]
+    assert await _count(db, os_photos_table) == 1
+    assert await _count(db, photo_blobs_table) == 1
+    [(filename, blobs_at_delete)] = failing_storage["deleted"]
+    assert filename.startswith(failing_storage["fail_on"]) and blobs_at_delete == 0
@@ -0,0 +1,152 @@
+"""Variantes das fotos: geração (e reaproveitamento entre fotos com o mesmo
+conteúdo) e a recuperação das fotos que ficaram sem variantes"""
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from PIL import Image
+from sqlalchemy import func, select, text, update
+
+from app.models.orders import os_photos_table, os_photo_variants_table
+from app.utils.image_variants import PHOTO_VARIANTS
+from app.utils.photo_variants import (
+    PHOTO_VARIANT_BACKFILL_LOCK, PhotoVariantBackfill, PhotoVariantPipeline, photo_variant_pipeline
+)
+from app.utils.storage import photo_storage
+from app.utils.uploads import upload_path
+
+pytestmark = pytest.mark.anyio
+
+
+def _jpeg(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (1600, 1200), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = PhotoVariantPipeline(workers=1)
+    yield pipeline
+    pipeline.shutdown()
+
+
+@pytest.fixture
+def upload(client, admin, monkeypatch):
+    """Envia uma foto sem gerar as variantes (como se a geração tivesse falhado)"""
+    async def skip_generation(photo_id, filename, digest=None):
+        return False
+
+    monkeypatch.setattr(photo_variant_pipeline, "generate", skip_generation)
+
+    async def send(order_id: int, content: bytes) -> dict:
+        response = await client.post(
+            f"/orders/{order_id}/photos", headers=admin["headers"],
+            files={"file": ("foto.jpg", content, "image/jpeg")}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return send
+
+
+async def _variants(db, photo_id: int) -> dict:
+    rows = (await db.execute(
+        select(os_photo_variants_table).where(os_photo_variants_table.c.photo_id == photo_id)
+    )).fetchall()
+    return {row.variant: row for row in rows}
+
+
+async def _age(db, *photo_ids, minutes: int = 10):
+    await db.execute(
+        update(os_photos_table).where(os_photos_table.c.id.in_(photo_ids))
+        .values(uploaded_at=func.localtimestamp() - timedelta(minutes=minutes))
+    )
+    await db.commit()
+
+
+async def _generate(pipeline, db, photo: dict) -> bool:
+    digest = (await db.execute(
+        select(os_photos_table.c.blob_digest).where(os_photos_table.c.id == photo["id"])
+    )).scalar()
+    return await pipeline.generate(photo["id"], os.path.basename(photo["photo_url"]), digest)
+
+
+async def test_generate_registers_every_variant_and_reuses_same_content(db, seed_orders, upload, pipeline):
+    first_order, second_order = await seed_orders(2)
+    content = _jpeg("red")
+    first, second = await upload(first_order, content), await upload(second_order, content)
+
+    assert await _generate(pipeline, db, first)
+    variants = await _variants(db, first["id"])
+    assert set(variants) == set(PHOTO_VARIANTS)
+    for name, spec in PHOTO_VARIANTS.items():
+        assert max(variants[name].width, variants[name].height) == spec["max_size"]
+        assert await photo_storage.exists(os.path.basename(variants[name].photo_url))
+
+    # Mesmo conteúdo: os arquivos da primeira foto são reaproveitados
+    assert await _generate(pipeline, db, second)
+    reused = await _variants(db, second["id"])
+    assert {name: row.photo_url for name, row in reused.items()} == {
+        name: row.photo_url for name, row in variants.items()
+    }
+    assert (pipeline.generated, pipeline.reused) == (2, 1)
+
+
+async def test_backfill_generates_missing_variants_of_old_photos(db, seed_orders, upload, pipeline):
+    [order_id] = await seed_orders(1)
+    old, broken, later, recent = [await upload(order_id, _jpeg(color)) for color in ("red", "green", "blue", "white")]
+    await _age(db, old["id"], broken["id"], later["id"])
+    # Original ausente: a geração falha, mas não impede as fotos seguintes
+    os.remove(upload_path(os.path.basename(broken["photo_url"])))
+
+    backfill = PhotoVariantBackfill(pipeline, interval_seconds=0, batch_size=2, min_age_seconds=60)
+    assert await backfill.run_once() == 1
+    assert await backfill.run_once() == 1
+
+    assert set(await _variants(db, old["id"])) == set(PHOTO_VARIANTS)
+    assert set(await _variants(db, later["id"])) == set(PHOTO_VARIANTS)
+    assert await _variants(db, broken["id"]) == {}
+    # Enviada há pouco: a geração do upload ainda pode estar em andamento
+    assert await _variants(db, recent["id"]) == {}
+    assert backfill.stats()["backfilled"] == 2
+    assert backfill.stats()["failed"] == 1
+
+    # Depois de um lote incompleto, a rodada seguinte recomeça do início
+    await _age(db, recent["id"])
+    assert await backfill.run_once() == 1
+    assert set(await _variants(db, recent["id"])) == set(PHOTO_VARIANTS)
+
+
+async def test_backfill_skips_round_while_another_worker_holds_the_lock(db, seed_orders, upload, pipeline):
+    [order_id] = await seed_orders(1)
+    photo = await upload(order_id, _jpeg("red"))
+    await _age(db, photo["id"])
+    backfill = PhotoVariantBackfill(pipeline, interval_seconds=0, min_age_seconds=60)
+    lock = dict(zip(("first", "second"), PHOTO_VARIANT_BACKFILL_LOCK))
+
+    await db.execute(text("SELECT pg_advisory_lock(:first, :second)"), lock)
+    try:
+        assert await backfill.run_once() == 0
+    finally:
+        await db.execute(text("SELECT pg_advisory_unlock(:first, :second)"), lock)
+        await db.commit()
+
+    assert await backfill.run_once() == 1
+    assert set(await _variants(db, photo["id"])) == set(PHOTO_VARIANTS)
+
+
+
+async def test_backfill_scans_one_window_of_ids_per_round(db, seed_orders, upload, pipeline):
+    [order_id] = await seed_orders(1)
+    photos = [await upload(order_id, _jpeg(color)) for color in ("red", "green", "blue")]
+    await _age(db, *[photo["id"] for photo in photos])
+    backfill = PhotoVariantBackfill(pipeline, interval_seconds=0, min_age_seconds=60, scan_window=2)
+
+    assert await backfill.run_once() == 2
+    assert await _variants(db, photos[2]["id"]) == {}
+    assert await backfill.run_once() == 1
+    # Depois do maior id, volta ao início (agora sem nada a gerar)
+    assert await backfill.run_once() == 0
+    assert backfill.stats()["backfilled"] == 3
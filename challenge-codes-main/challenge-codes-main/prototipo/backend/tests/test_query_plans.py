@@ -0,0 +1,290 @@
+"""As consultas quentes dos routers usam índice nas tabelas que crescem.
+
+Uma massa de dados de uso (SEED_ORDERS ordens, com fotos, variantes,
+respostas de checklist e tokens) é semeada em uma transação desfeita no
+final; depois do ANALYZE, o EXPLAIN de cada consulta, montada pelas mesmas
+funções que os routers usam, não pode ter Seq Scan em uma tabela quente.
+
+Cada consulta é verificada nos dois planos que o PostgreSQL usa: o
+customizado (valores literais) e o genérico, que o asyncpg passa a receber
+depois de algumas execuções do mesmo prepared statement e que não conhece
+os valores (status, técnico, LIMIT).
+"""
+import json
+from typing import Dict, List
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models.orders import service_orders_table, clients_table, equipments_table
+from app.models.auth import auth_tokens_table
+from app.utils.order_loader import (
+    EQUIPMENT_FIELDS, orders_query, filter_orders, photos_query, checklist_responses_query
+)
+from app.utils.pagination import apply_keyset, encode_cursor, order_by_key
+from app.utils.typeahead import search_clients_query, search_equipments_query
+from app.utils.token_purge import expired_tokens_query
+from app.utils.photo_variants import missing_variants_query
+
+pytestmark = pytest.mark.anyio
+
+# Tabelas que crescem com o uso: nelas as consultas quentes não podem fazer Seq Scan
+HOT_TABLES = (
+    "service_orders", "os_photos", "os_photo_variants", "os_checklist_responses",
+    "clients", "equipments", "auth_tokens"
+)
+
+# Página padrão da listagem de ordens
+PAGE_SIZE = 100
+
+# Consultas que os routers sempre executam com o plano customizado
+# (load_orders(custom_plan=True)): não têm plano genérico a verificar
+CUSTOM_PLAN_QUERIES = ("orders: busca textual",)
+
+# Ordens semeadas: o bastante para o planejador preferir índices a Seq Scan
+SEED_ORDERS = 100_000
+
+# Massa semeada: (tabela, SQL). :orders é o número de ordens; as demais
+# tabelas crescem na proporção de uma base em uso (70% das ordens encerradas).
+# Os textos variam entre as ordens, como os reais: com todas iguais, o
+# planejador não tem estatísticas para estimar a busca textual
+SEED_STATEMENTS = (
+    ("users", """
+        INSERT INTO users (username, password_hash, name, role)
+        SELECT 'plan_user_' || g, 'x', 'Técnico ' || g, 'tecnico'
+        FROM generate_series(1, 50) g
+    """),
+    ("clients", """
+        INSERT INTO clients (name, email, phone)
+        SELECT 'Cliente ' || g, 'cliente' || g || '@exemplo.com', '(92) 9' || lpad(g::text, 8, '0')
+        FROM generate_series(1, greatest(:orders / 10, 1)) g
+    """),
+    ("equipments", """
+        INSERT INTO equipments (client_id, type, brand, model, serial_number)
+        SELECT c.ids[1 + g % array_length(c.ids, 1)], 'Notebook', 'Marca ' || g % 20, 'Modelo ' || g % 200,
+               'PLAN-SN-' || g
+        FROM generate_series(1, greatest(:orders / 5, 1)) g,
+             (SELECT array_agg(id) AS ids FROM clients) c
+    """),
+    ("service_orders", """
+        INSERT INTO service_orders (client_id, equipment_id, user_id, title, description, status,
+                                    created_at, updated_at)
+        SELECT e.client_id, e.id, u.ids[1 + g % array_length(u.ids, 1)],
+               'Ordem ' || g || ' ' || (ARRAY['tela', 'teclado', 'bateria', 'carregador', 'placa', 'fonte',
+                                              'ventoinha', 'disco', 'memória', 'dobradiça'])[1 + g % 10],
+               'Descrição da ordem ' || g || ', lote L' || g % 997,
+               CASE WHEN g % 10 < 7 THEN 'closed' WHEN g % 10 < 9 THEN 'open' ELSE 'in_progress' END,
+               now() - g * interval '5 minutes',
+               now() - g * interval '5 minutes' + (g % 100) * interval '1 hour'
+        FROM generate_series(1, :orders) g
+        JOIN (SELECT id, client_id, row_number() OVER (ORDER BY id) AS n FROM equipments) e
+          ON e.n = 1 + g % (SELECT count(*) FROM equipments),
+             (SELECT array_agg(id) AS ids FROM users) u
+    """),
+    ("os_photos", """
+        INSERT INTO os_photos (service_order_id, photo_url, uploaded_at)
+        SELECT o.id, '/uploads/plan_' || o.id || '_' || n || '.jpg', o.created_at + n * interval '1 minute'
+        FROM service_orders o, generate_series(1, 2) n
+        WHERE o.title LIKE 'Ordem %'
+    """),
+    ("os_photo_variants", """
+        INSERT INTO os_photo_variants (photo_id, variant, photo_url)
+        SELECT id, 'thumb', photo_url || '.thumb.jpg' FROM os_photos
+        ON CONFLICT DO NOTHING
+    """),
+    ("checklist_items", """
+        INSERT INTO checklist_items (checklist_id, description)
+        SELECT c.id, 'Item ' || n
+        FROM checklists c, generate_series(1, 10) n
+    """),
+    ("os_checklist_responses", """
+        INSERT INTO os_checklist_responses (service_order_id, checklist_item_id, is_checked)
+        SELECT o.id, i.ids[1 + (o.id * k) % array_length(i.ids, 1)], (o.id + k) % 2 = 0
+        FROM service_orders o, generate_series(1, 4) k,
+             (SELECT array_agg(id) AS ids FROM checklist_items) i
+        ON CONFLICT DO NOTHING
+    """),
+    ("auth_tokens", """
+        INSERT INTO auth_tokens (user_id, jti_hash, expires_at, is_revoked)
+        SELECT u.ids[1 + g % array_length(u.ids, 1)], encode(sha256(('plan-token-' || g)::bytea), 'hex'),
+               now() + CASE WHEN g % 100 = 0 THEN interval '-1 day' ELSE interval '1 day' END,
+               g % 100 = 1
+        FROM generate_series(1, :orders) g,
+             (SELECT array_agg(id) AS ids FROM users) u
+    """),
+)
+
+
+async def seed(connection, orders: int):
+    """Semeia a massa de dados na transação corrente e atualiza as estatísticas.
+
+    Cada tabela é analisada logo depois de semeada: as seguintes (e as
+    verificações de chave estrangeira delas) não são planejadas com as
+    estatísticas da tabela vazia deixadas por outros testes.
+    """
+    for table, statement in SEED_STATEMENTS:
+        await connection.execute(text(statement), {"orders": orders})
+        await connection.execute(text(f"ANALYZE {table}"))
+
+
+async def _sample(connection) -> dict:
+    """Valores reais usados nos filtros: uma ordem em aberto e a primeira página"""
+    orders = service_orders_table.c
+    order = (await connection.execute(
+        select(orders.id, orders.client_id, orders.equipment_id, orders.user_id, orders.title, orders.created_at)
+        .where(orders.status == "open")
+        .order_by(orders.id.desc())
+        .limit(1)
+    )).first()
+    page_ids = (await connection.execute(
+        order_by_key(select(orders.id), orders.created_at, orders.id).limit(PAGE_SIZE)
+    )).scalars().all()
+    jti_hash = (await connection.execute(
+        select(auth_tokens_table.c.jti_hash).limit(1)
+    )).scalar()
+    client = (await connection.execute(
+        select(clients_table.c.name, clients_table.c.phone).where(clients_table.c.id == order.client_id)
+    )).first()
+    serial_number = (await connection.execute(
+        select(equipments_table.c.serial_number).where(equipments_table.c.id == order.equipment_id)
+    )).scalar()
+    return {
+        **order._asdict(), "page_ids": list(page_ids), "jti_hash": jti_hash,
+        "client_name": client.name, "client_phone": client.phone, "serial_number": serial_number
+    }
+
+
+def _orders_page(sort: str = "created_at", cursor=None, **filters):
+    """A query de GET /orders/ (mesmos filtros, ordenação e página)"""
+    sort_column = service_orders_table.c[sort]
+    query = filter_orders(orders_query(), **filters)
+    if cursor is not None:
+        return apply_keyset(query, sort_column, service_orders_table.c.id, cursor, sort, PAGE_SIZE)
+    return order_by_key(query, sort_column, service_orders_table.c.id).limit(PAGE_SIZE)
+
+
+def hot_queries(sample: dict) -> Dict[str, object]:
+    """Consultas quentes dos routers, montadas pelas mesmas funções que eles usam"""
+    active = ["open", "in_progress"]
+    cursor = encode_cursor("created_at", sample["created_at"], sample["id"])
+    tokens = auth_tokens_table.c
+    return {
+        "orders: página": _orders_page(),
+        "orders: página por updated_at": _orders_page("updated_at"),
+        "orders: status": _orders_page(statuses=["open"]),
+        "orders: encerradas": _orders_page(statuses=["closed"]),
+        "orders: status por updated_at": _orders_page("updated_at", statuses=["open"]),
+        "orders: em aberto": _orders_page(statuses=active),
+        "orders: em aberto do técnico": _orders_page(statuses=active, user_id=sample["user_id"]),
+        "orders: técnico": _orders_page(user_id=sample["user_id"]),
+        "orders: cliente": _orders_page(client_id=sample["client_id"]),
+        "orders: equipamento": _orders_page(equipment_id=sample["equipment_id"]),
+        "orders: status com cursor": _orders_page(statuses=["open"], cursor=cursor),
+        "orders: busca textual": _orders_page(search=sample["title"]),
+        "orders: detalhe": orders_query().where(service_orders_table.c.id == sample["id"]),
+        "fotos da página": photos_query(sample["page_ids"]),
+        "respostas do checklist": checklist_responses_query(sample["id"]),
+        "fotos sem variantes (recuperação)": missing_variants_query(sample["page_ids"][-1], 50, 300),
+        "equipamentos do cliente": select(*[equipments_table.c[field] for field in EQUIPMENT_FIELDS])
+            .where(equipments_table.c.client_id == sample["client_id"]),
+        "busca de equipamentos do cliente": search_equipments_query(None, sample["client_id"], 20),
+        "busca de equipamentos do cliente por termo": search_equipments_query("Modelo", sample["client_id"], 20),
+        # Termos comuns (casam com quase todas as linhas), raros e com erro de digitação
+        "busca de clientes: prefixo comum": search_clients_query("Clien", 20),
+        "busca de clientes: nome": search_clients_query(sample["client_name"], 20),
+        "busca de clientes: aproximada": search_clients_query("Clietne", 20),
+        "busca de clientes: telefone": search_clients_query(sample["client_phone"][-6:], 20, skip=20),
+        "busca de equipamentos: marca": search_equipments_query("Marca 7", None, 20),
+        "busca de equipamentos: série": search_equipments_query(sample["serial_number"], None, 20),
+        "token por jti": select(tokens.is_revoked, tokens.expires_at).where(tokens.jti_hash == sample["jti_hash"]),
+        "tokens do usuário (cascade)": select(tokens.id).where(tokens.user_id == sample["user_id"]),
+        "limpeza de tokens": expired_tokens_query(),
+    }
+
+
+def _scans(plan: dict) -> List[dict]:
+    """Nós de leitura de tabela do plano (Seq/Index/Bitmap Scan), recursivamente"""
+    scans = []
+    if "Relation Name" in plan:
+        index = plan.get("Index Name")
+        if plan["Node Type"] == "Bitmap Heap Scan":
+            # Os índices do bitmap ficam nos nós Bitmap Index Scan abaixo
+            index = "+".join(_bitmap_indexes(plan))
+        scans.append({"node": plan["Node Type"], "table": plan["Relation Name"], "index": index})
+    for child in plan.get("Plans", []):
+        scans.extend(_scans(child))
+    return scans
+
+
+def _bitmap_indexes(plan: dict) -> List[str]:
+    indexes = []
+    for child in plan.get("Plans", []):
+        if child["Node Type"] == "Bitmap Index Scan":
+            indexes.append(child["Index Name"])
+        else:
+            indexes.extend(_bitmap_indexes(child))
+    return indexes
+
+
+def _sql_literal(value) -> str:
+    """Valor como literal SQL sem tipo: o PREPARE já fixou o tipo de cada parâmetro"""
+    if value is None:
+        return "NULL"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+async def explain(connection, query, generic: bool = False) -> dict:
+    """Plano (EXPLAIN FORMAT JSON) da query.
+
+    Sem generic, com os valores literais, como no plano customizado. Com
+    generic, a query é preparada com os parâmetros ($1, $2, ...) que o
+    asyncpg envia e executada com plan_cache_mode = force_generic_plan.
+    """
+    if not generic:
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+    else:
+        compiled = query.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+        values = ", ".join(_sql_literal(compiled.params[name]) for name in compiled.positiontup)
+        await connection.exec_driver_sql(f"PREPARE hot_query AS {compiled}")
+        try:
+            result = await connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) EXECUTE hot_query{f'({values})' if values else ''}"
+            )
+        finally:
+            await connection.exec_driver_sql("DEALLOCATE hot_query")
+    plan = result.scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+async def check_plans(connection) -> List[dict]:
+    """Plano customizado e genérico de cada consulta quente e se alguma tabela quente é lida por Seq Scan"""
+    results = []
+    await connection.exec_driver_sql("SET LOCAL plan_cache_mode = force_generic_plan")
+    for name, query in hot_queries(await _sample(connection)).items():
+        for plan, generic in (("customizado", False), ("genérico", True)):
+            if generic and name in CUSTOM_PLAN_QUERIES:
+                continue
+            scans = _scans(await explain(connection, query, generic))
+            seq_scans = [
+                scan["table"] for scan in scans if scan["node"] == "Seq Scan" and scan["table"] in HOT_TABLES
+            ]
+            results.append({"query": f"{name} ({plan})", "scans": scans, "seq_scans": seq_scans})
+    return results
+
+
+async def test_hot_queries_use_indexes(db):
+    transaction = await db.begin()
+    try:
+        # A semeadura passa do statement_timeout das requisições
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+        await seed(db, SEED_ORDERS)
+        results = await check_plans(db)
+    finally:
+        await transaction.rollback()
+
+    failures = {
+        result["query"]: [f"{scan['table']}:{scan['index'] or scan['node']}" for scan in result["scans"]]
+        for result in results if result["seq_scans"]
+    }
+    assert not failures, f"Seq Scan em tabela quente: {failures}"
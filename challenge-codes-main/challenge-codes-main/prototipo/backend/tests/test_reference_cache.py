@@ -0,0 +1,83 @@
+"""ETags dos dados de referência: 304 enquanto nada muda, 200 depois de uma
+escrita, e versões compartilhadas entre workers via Redis (fakeredis)"""
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from starlette.requests import Request
+
+from app.utils.reference_cache import ReferenceCache
+from app.utils.version_store import RedisVersionStore
+
+pytestmark = pytest.mark.anyio
+
+
+async def _etag(client, admin, path):
+    # O primeiro pedido autentica pelo banco e põe o token no cache de tokens
+    await client.get(path, headers=admin["headers"])
+    response = await client.get(path, headers=admin["headers"])
+    assert response.status_code == 200, response.text
+    return response.headers["etag"]
+
+
+async def test_unchanged_resource_answers_304(client, admin):
+    etag = await _etag(client, admin, "/orders/clients/")
+
+    response = await client.get("/orders/clients/", headers={**admin["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_write_invalidates_etag(client, admin):
+    etag = await _etag(client, admin, "/orders/clients/")
+
+    created = await client.post("/orders/clients/", headers=admin["headers"], json={"name": "Cliente novo"})
+    assert created.status_code == 200, created.text
+    response = await client.get("/orders/clients/", headers={**admin["headers"], "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [item["name"] for item in response.json()] == ["Cliente novo"]
+    again = await client.get("/orders/clients/", headers={**admin["headers"], "If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def _request(path: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+@pytest.fixture
+def workers():
+    """Dois workers com versões no mesmo Redis"""
+    server = fakeredis.FakeServer()
+    return [
+        ReferenceCache(RedisVersionStore(client=fakeredis.FakeAsyncRedis(server=server)))
+        for _ in range(2)
+    ]
+
+
+async def test_workers_share_etags_and_invalidation(workers):
+    first, second = workers
+    user = SimpleNamespace(id=1, role="administrador")
+    request = _request("/orders/clients/")
+
+    etag = await first.etag("clients", request, user)
+    assert await second.etag("clients", request, user) == etag
+
+    await first.bump("clients")
+
+    changed = await second.etag("clients", request, user)
+    assert changed != etag
+    assert await first.etag("clients", request, user) == changed
+    assert await second.etag("equipments", request, user) == await first.etag("equipments", request, user)
+
+
+async def test_missing_counter_does_not_restart_from_zero():
+    server = fakeredis.FakeServer()
+    store = RedisVersionStore(client=fakeredis.FakeAsyncRedis(server=server))
+    first = await store.get("users")
+
+    await fakeredis.FakeAsyncRedis(server=server).flushall()
+
+    assert await store.get("users") not in (first, "0")
@@ -0,0 +1,80 @@
+"""RedisRevocationStore contra um servidor Redis simulado (fakeredis)"""
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.utils.revocation_store import RedisRevocationStore, REVOCATION_KEY_PREFIX
+from app.utils.token_cache import token_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+async def store(server):
+    store = RedisRevocationStore(client=fakeredis.FakeAsyncRedis(server=server))
+    yield store
+    await store.close()
+
+
+async def _wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condição não atendida no prazo")
+        await asyncio.sleep(0.01)
+
+
+async def test_revoke_marks_token_as_revoked(store):
+    assert not await store.is_revoked("jti-1")
+
+    await store.revoke("jti-1", ttl_seconds=60)
+
+    assert await store.is_revoked("jti-1")
+    assert not await store.is_revoked("jti-2")
+
+
+async def test_revocation_key_expires_with_the_token(store, server):
+    redis = fakeredis.FakeAsyncRedis(server=server)
+
+    await store.revoke("jti-1", ttl_seconds=1)
+
+    assert 0 < await redis.ttl(REVOCATION_KEY_PREFIX + "jti-1") <= 1
+    await asyncio.sleep(1.1)
+    assert not await store.is_revoked("jti-1")
+    assert not await redis.exists(REVOCATION_KEY_PREFIX + "jti-1")
+
+
+async def test_expired_token_is_not_stored(store, server):
+    await store.revoke("jti-1", ttl_seconds=0)
+
+    assert not await store.is_revoked("jti-1")
+    assert await fakeredis.FakeAsyncRedis(server=server).dbsize() == 0
+
+
+async def test_revocation_reaches_token_cache_of_other_workers(server):
+    # Dois workers: cada um com seu cliente, ligados ao mesmo servidor
+    revoking_worker = RedisRevocationStore(client=fakeredis.FakeAsyncRedis(server=server))
+    other_worker = RedisRevocationStore(client=fakeredis.FakeAsyncRedis(server=server))
+    user = SimpleNamespace(id=1, is_active=True)
+    token_cache.set("token-revogado", user, token_id="jti-1")
+    token_cache.set("token-ativo", user, token_id="jti-2")
+    try:
+        await other_worker.subscribe(token_cache.invalidate_token_id)
+        await asyncio.sleep(0.05)  # inscrição ativa antes da publicação
+
+        await revoking_worker.revoke("jti-1", ttl_seconds=60)
+
+        await _wait_for(lambda: token_cache.peek("token-revogado") is None)
+        assert token_cache.peek("token-ativo") is user
+        assert await other_worker.is_revoked("jti-1")
+    finally:
+        token_cache.clear()
+        await other_worker.close()
+        await revoking_worker.close()
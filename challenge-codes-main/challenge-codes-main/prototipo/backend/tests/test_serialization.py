@@ -0,0 +1,84 @@
+"""fast_response produz o mesmo JSON que o response_model validado pelo
+Pydantic (TypeAdapter.dump_json), para todos os modelos de resposta das rotas"""
+import types
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union, get_args, get_origin
+
+import pytest
+from pydantic import BaseModel, TypeAdapter
+
+from app.models.auth_models import UserRead
+from app.models.order_models import ClientRead, EquipmentRead, PhotoRead, ServiceOrderPage, ServiceOrderRead
+from app.routers import auth, metrics, orders, users
+from app.utils.projection import partial_model
+from app.utils.serialization import fast_response
+
+SAMPLE_DATETIMES = (
+    datetime(2026, 3, 14, 15, 9, 26, 535897, tzinfo=timezone.utc),
+    datetime(2026, 3, 14, 12, 9, 26, tzinfo=timezone(timedelta(hours=-3))),
+)
+
+
+def _members(annotation):
+    if get_origin(annotation) in (Union, types.UnionType):
+        return [arg for arg in get_args(annotation) if arg is not type(None)]
+    return [annotation]
+
+
+def _response_annotations():
+    """response_model de cada rota (membros de Union separados), sem repetição"""
+    annotations = []
+    for router in (auth.router, users.router, orders.router, metrics.router):
+        for route in router.routes:
+            for annotation in _members(route.response_model) if route.response_model else []:
+                if annotation not in annotations:
+                    annotations.append(annotation)
+    # Modelos parciais de /orders/?fields=..., com e sem cursor
+    client = partial_model(ClientRead, ("id", "name"))
+    equipment = partial_model(EquipmentRead, ("id", "serial_number"))
+    user = partial_model(UserRead, ("id", "name", "role"))
+    item = partial_model(ServiceOrderRead, ("id", "title", "status"), (
+        ("client", Optional[client]), ("equipment", Optional[equipment]),
+        ("user", Optional[user]), ("photos", Optional[List[PhotoRead]])
+    ))
+    annotations.append(List[item])
+    annotations.append(partial_model(ServiceOrderPage, ("next_cursor",), (("items", List[item]),)))
+    return annotations
+
+
+def _sample(annotation, full: bool, index: int = 0):
+    """Dados no formato dos loaders: full preenche os campos opcionais"""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        return _sample(_members(annotation)[0], full, index)
+    if origin in (list, tuple, set):
+        return [_sample(get_args(annotation)[0], full, position) for position in range(2)]
+    if origin is dict or annotation is dict:
+        return {"thumb": f"/uploads/{index}_thumb.jpg", "medium": f"/uploads/{index}_medium.jpg"}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        annotation.model_rebuild()
+        return {
+            name: _sample(field.annotation, full, index)
+            for name, field in annotation.model_fields.items()
+            if full or field.is_required()
+        }
+    if annotation is bool:
+        return index % 2 == 0
+    if annotation is int:
+        return 40 + index
+    if annotation is datetime:
+        return SAMPLE_DATETIMES[index % len(SAMPLE_DATETIMES)]
+    if annotation is str:
+        return f"valor {index} – ção"
+    raise AssertionError(f"sem dado de exemplo para {annotation!r}")
+
+
+@pytest.mark.parametrize("full", [True, False], ids=["completo", "obrigatorios"])
+@pytest.mark.parametrize("annotation", _response_annotations(), ids=repr)
+def test_fast_response_matches_pydantic(annotation, full):
+    data = _sample(annotation, full)
+    adapter = TypeAdapter(annotation)
+
+    expected = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+    assert fast_response(annotation, data).body == expected
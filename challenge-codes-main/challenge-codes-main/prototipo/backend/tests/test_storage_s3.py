@@ -0,0 +1,297 @@
+"""S3PhotoStorage contra um S3 simulado (moto).
+
+O moto não confere assinaturas nem o checksum dos envios: para as URLs
+pré-assinadas verifica-se quais cabeçalhos entram na assinatura.
+"""
+import os
+import base64
+import hashlib
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from moto import mock_aws
+
+from app.routers import orders
+from app.utils import storage as storage_module
+from app.utils.photo_variants import photo_variant_pipeline
+from app.utils.security import create_upload_grant
+from app.utils.storage import S3PhotoStorage, S3_KEY_PREFIX
+from app.utils.uploads import MAX_FILE_SIZE, UPLOAD_DIR, ensure_upload_dir
+
+pytestmark = pytest.mark.anyio
+
+BUCKET = "photos-test"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    for name, value in (("AWS_ACCESS_KEY_ID", "teste"), ("AWS_SECRET_ACCESS_KEY", "teste"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+async def s3(aws):
+    storage = S3PhotoStorage(BUCKET)
+    storage._client.create_bucket(Bucket=BUCKET)
+    yield storage
+    await storage.close()
+
+
+def _local_file(content: bytes) -> str:
+    """Arquivo temporário em UPLOAD_DIR, como os de upload"""
+    ensure_upload_dir()
+    path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}.part")
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+    return path
+
+
+def _stored_name(content: bytes, extension: str = ".jpg") -> str:
+    return hashlib.sha256(content).hexdigest() + extension
+
+
+def _get_object(storage: S3PhotoStorage, filename: str) -> dict:
+    return storage._client.get_object(Bucket=BUCKET, Key=storage.key(filename))
+
+
+async def test_put_stores_object_and_consumes_local_file(s3):
+    content = b"foto" * 1000
+    filename = _stored_name(content)
+    local_path = _local_file(content)
+
+    await s3.put(local_path, filename)
+
+    stored = _get_object(s3, filename)
+    assert stored["Body"].read() == content
+    assert stored["ContentType"] == "image/jpeg"
+    assert stored["CacheControl"].endswith("immutable")
+    assert s3.key(filename) == f"{S3_KEY_PREFIX}{filename[:2]}/{filename[2:4]}/{filename}"
+    assert not os.path.exists(local_path)
+    assert s3.stats()["puts"] == 1 and s3.stats()["multipart_puts"] == 0
+
+
+async def test_put_without_overwrite_keeps_existing_object(s3):
+    content = b"original"
+    filename = _stored_name(content)
+    await s3.put(_local_file(content), filename)
+
+    local_path = _local_file(b"outro conteudo")
+    await s3.put(local_path, filename, overwrite=False)
+
+    assert _get_object(s3, filename)["Body"].read() == content
+    assert not os.path.exists(local_path)
+    assert s3.stats()["puts"] == 1
+
+
+async def test_large_file_is_uploaded_in_parts(aws, monkeypatch):
+    monkeypatch.setattr(storage_module, "S3_MULTIPART_THRESHOLD", 5 * MB)
+    monkeypatch.setattr(storage_module, "S3_MULTIPART_CHUNK_SIZE", 5 * MB)
+    storage = S3PhotoStorage(BUCKET)
+    storage._client.create_bucket(Bucket=BUCKET)
+    content = os.urandom(12 * MB)
+    filename = _stored_name(content)
+
+    await storage.put(_local_file(content), filename)
+
+    stored = _get_object(storage, filename)
+    assert stored["Body"].read() == content
+    assert stored["ETag"].strip('"').endswith("-3")  # 5 + 5 + 2 MB
+    assert storage.stats()["multipart_puts"] == 1
+    await storage.close()
+
+
+async def test_local_copy_downloads_and_removes_the_copy(s3):
+    content = b"conteudo para variantes"
+    filename = _stored_name(content)
+    await s3.put(_local_file(content), filename)
+
+    async with s3.local_copy(filename) as local_path:
+        with open(local_path, "rb") as buffer:
+            assert buffer.read() == content
+
+    assert not os.path.exists(local_path)
+
+
+async def test_serve_redirects_to_presigned_download(s3):
+    content = b"bytes servidos pelo bucket"
+    filename = _stored_name(content)
+    await s3.put(_local_file(content), filename)
+
+    response = await s3.serve(None, filename)
+    again = await s3.serve(None, filename)
+
+    assert response.status_code == 307
+    assert "private, max-age=" in response.headers["cache-control"]
+    assert again.headers["location"] == response.headers["location"]
+    assert s3.stats()["presigned_downloads"] == 1
+    download = requests.get(response.headers["location"])
+    assert download.status_code == 200 and download.content == content
+
+    with pytest.raises(FileNotFoundError):
+        await s3.serve(None, _stored_name(b"inexistente"))
+
+
+async def test_presigned_upload_signs_length_and_checksum(s3):
+    content = b"enviado direto pelo cliente"
+    sha256_hex = hashlib.sha256(content).hexdigest()
+    filename = f"{sha256_hex}.png"
+
+    upload = await s3.presigned_upload(filename, sha256_hex, len(content))
+
+    query = parse_qs(urlparse(upload["url"]).query)
+    signed_headers = query["X-Amz-SignedHeaders"][0].split(";")
+    assert {"content-length", "content-type", "x-amz-checksum-sha256"} <= set(signed_headers)
+    assert upload["method"] == "PUT"
+    assert upload["headers"]["x-amz-checksum-sha256"] == base64.b64encode(bytes.fromhex(sha256_hex)).decode()
+    assert upload["headers"]["Content-Type"] == "image/png"
+
+    sent = requests.put(upload["url"], data=content, headers=upload["headers"])
+    assert sent.status_code == 200
+    assert (await s3.head(filename))["size"] == len(content)
+    assert _get_object(s3, filename)["Body"].read() == content
+
+
+async def test_presigned_download_signs_cache_control(s3):
+    content = b"miniatura"
+    filename = _stored_name(content)
+    await s3.put(_local_file(content), filename)
+
+    immutable = (await s3.serve(None, filename)).headers["location"]
+    fallback = (await s3.serve(None, filename, immutable=False)).headers["location"]
+
+    assert "immutable" in parse_qs(urlparse(immutable).query)["response-cache-control"][0]
+    assert "response-cache-control" not in parse_qs(urlparse(fallback).query)
+
+
+async def test_delete_removes_object_and_cached_key(s3):
+    content = b"removida"
+    filename = _stored_name(content)
+    await s3.put(_local_file(content), filename)
+    assert await s3.exists(filename)
+
+    await s3.delete(filename)
+
+    assert await s3.head(filename) is None
+    assert not await s3.exists(filename)
+    assert s3.stats()["deletes"] == 1
+
+
+@pytest.fixture
+async def s3_api(s3, monkeypatch):
+    """API usando o S3 simulado; a geração de variantes só é registrada"""
+    generated = []
+
+    async def generate(photo_id, filename, digest=None):
+        generated.append((photo_id, filename, digest))
+
+    monkeypatch.setattr(orders, "photo_storage", s3)
+    monkeypatch.setattr(photo_variant_pipeline, "generate", generate)
+    return generated
+
+
+async def _upload_url(client, admin, order_id, content, filename="foto.jpg") -> dict:
+    response = await client.post(
+        f"/orders/{order_id}/photos/upload-url", headers=admin["headers"],
+        json={"filename": filename, "sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def _upload_directly(client, admin, order_id, content, filename="foto.jpg"):
+    """Envia pela URL pré-assinada: (sha256, upload_token)"""
+    upload = await _upload_url(client, admin, order_id, content, filename)
+    assert requests.put(upload["url"], data=content, headers=upload["headers"]).status_code == 200
+    return hashlib.sha256(content).hexdigest(), upload["upload_token"]
+
+
+async def _complete(client, admin, order_id, sha256_hex, upload_token, filename="foto.jpg"):
+    return await client.post(
+        f"/orders/{order_id}/photos/complete", headers=admin["headers"],
+        json={"filename": filename, "sha256": sha256_hex, "upload_token": upload_token}
+    )
+
+
+async def test_complete_registers_directly_uploaded_photo(client, admin, seed_orders, s3, s3_api):
+    [order_id] = await seed_orders(1)
+    content = b"foto enviada pela URL assinada"
+    sha256_hex, upload_token = await _upload_directly(client, admin, order_id, content)
+
+    response = await _complete(client, admin, order_id, sha256_hex, upload_token)
+
+    assert response.status_code == 200, response.text
+    photo = response.json()
+    assert photo["service_order_id"] == order_id
+    assert photo["photo_url"] == f"/uploads/{sha256_hex}.jpg"
+    assert photo["thumbnail_url"] == f"/orders/uploads/{sha256_hex}.jpg?size=thumb"
+    assert s3_api == [(photo["id"], f"{sha256_hex}.jpg", sha256_hex)]
+
+    photos = await client.get(f"/orders/{order_id}/photos", headers=admin["headers"])
+    assert [(item["id"], item["thumbnail_url"]) for item in photos.json()] == [(photo["id"], photo["thumbnail_url"])]
+
+
+async def test_complete_rejects_missing_and_oversized_objects(client, admin, seed_orders, s3, s3_api):
+    [order_id] = await seed_orders(1)
+
+    not_uploaded = await _upload_url(client, admin, order_id, b"nunca enviada")
+    missing = await _complete(
+        client, admin, order_id, hashlib.sha256(b"nunca enviada").hexdigest(), not_uploaded["upload_token"]
+    )
+    assert missing.status_code == 404
+
+    # O moto não confere o Content-Length assinado: o objeto grande é gravado direto
+    content = b"x" * (MAX_FILE_SIZE + 1)
+    sha256_hex = hashlib.sha256(content).hexdigest()
+    upload_token = create_upload_grant(admin["id"], order_id, f"{sha256_hex}.jpg", 60)
+    s3._client.put_object(Bucket=BUCKET, Key=s3.key(f"{sha256_hex}.jpg"), Body=content)
+
+    oversized = await _complete(client, admin, order_id, sha256_hex, upload_token)
+    assert oversized.status_code == 413
+    assert await s3.head(f"{sha256_hex}.jpg") is None
+    assert s3_api == []
+
+
+async def test_complete_requires_the_grant_of_the_caller_and_order(client, admin, seed_orders, s3, s3_api):
+    order_id, other_order_id = await seed_orders(2)
+    content = b"foto de outra ordem"
+    sha256_hex, upload_token = await _upload_directly(client, admin, order_id, content)
+    filename = f"{sha256_hex}.jpg"
+
+    for order, token in (
+        (other_order_id, upload_token),
+        (order_id, create_upload_grant(admin["id"] + 1, order_id, filename, 60)),
+        (order_id, create_upload_grant(admin["id"], order_id, f"{'0' * 64}.jpg", 60)),
+        (order_id, "token-invalido"),
+    ):
+        response = await _complete(client, admin, order, sha256_hex, token)
+        assert response.status_code == 403, response.text
+
+    # O token de acesso não serve como autorização de upload
+    access_token = admin["headers"]["Authorization"].split()[1]
+    assert (await _complete(client, admin, order_id, sha256_hex, access_token)).status_code == 403
+    assert s3_api == []
+
+
+async def test_complete_hashes_objects_stored_without_checksum(client, admin, seed_orders, s3, s3_api):
+    [order_id] = await seed_orders(1)
+    content = b"enviada sem checksum"
+    sha256_hex = hashlib.sha256(content).hexdigest()
+    upload_token = create_upload_grant(admin["id"], order_id, f"{sha256_hex}.jpg", 60)
+
+    # Conteúdo diferente do digest do nome: recusado depois de calculado o SHA-256
+    s3._client.put_object(Bucket=BUCKET, Key=s3.key(f"{sha256_hex}.jpg"), Body=b"outro conteudo")
+    assert (await s3.head(f"{sha256_hex}.jpg"))["sha256"] is None
+    mismatched = await _complete(client, admin, order_id, sha256_hex, upload_token)
+    assert mismatched.status_code == 400
+    assert s3_api == []
+
+    s3._client.put_object(Bucket=BUCKET, Key=s3.key(f"{sha256_hex}.jpg"), Body=content)
+    response = await _complete(client, admin, order_id, sha256_hex, upload_token)
+    assert response.status_code == 200, response.text
+    assert s3_api == [(response.json()["id"], f"{sha256_hex}.jpg", sha256_hex)]
@@ -0,0 +1,87 @@
+"""Busca (typeahead) de clientes e equipamentos: termo mínimo, ordenação
+(prefixo antes da semelhança) e páginas iguais às da ordenação completa,
+mesmo com os candidatos limitados por ramo."""
+import pytest
+from sqlalchemy import insert
+
+from app.models.orders import clients_table, equipments_table
+
+pytestmark = pytest.mark.anyio
+
+
+async def _clients(db, *rows):
+    ids = []
+    for row in rows:
+        ids.append((await db.execute(insert(clients_table).values(**row))).inserted_primary_key[0])
+    await db.commit()
+    return ids
+
+
+async def _search(client, admin, path, **params):
+    response = await client.get(path, headers=admin["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_short_terms_are_rejected(client, admin):
+    # Com menos de um trigrama o índice não filtra
+    response = await client.get("/orders/clients/search", headers=admin["headers"], params={"q": "an"})
+    assert response.status_code == 422
+    response = await client.get("/orders/clients/search", headers=admin["headers"], params={"q": " an "})
+    assert response.status_code == 400
+    response = await client.get("/orders/equipments/search", headers=admin["headers"], params={"q": "sn"})
+    assert response.status_code == 400
+
+
+async def test_prefix_matches_rank_first(db, client, admin):
+    await _clients(db, {"name": "Mariana Souza"}, {"name": "Ana Silva"}, {"name": "Silva Ana"},
+                   {"name": "Anabela Costa"}, {"name": "Bruno Lima"})
+
+    result = await _search(client, admin, "/orders/clients/search", q="ana")
+
+    names = [item["name"] for item in result["items"]]
+    assert sorted(names[:2]) == ["Ana Silva", "Anabela Costa"]
+    assert sorted(names[2:]) == ["Mariana Souza", "Silva Ana"]
+    assert result["has_more"] is False
+
+
+async def test_pages_follow_the_full_ranking(db, client, admin):
+    await _clients(db, *[{"name": f"Cliente {index}", "email": f"cliente{index}@exemplo.com"} for index in range(30)])
+    full = await _search(client, admin, "/orders/clients/search", q="cliente", limit=50)
+    assert len(full["items"]) == 30
+
+    paged, skip = [], 0
+    while True:
+        result = await _search(client, admin, "/orders/clients/search", q="cliente", limit=7, skip=skip)
+        paged += result["items"]
+        skip += 7
+        assert result["has_more"] == (skip < 30)
+        if not result["has_more"]:
+            break
+
+    assert [item["id"] for item in paged] == [item["id"] for item in full["items"]]
+
+
+async def test_clients_match_phone_digits_and_typos(db, client, admin):
+    phone_id, name_id = await _clients(db, {"name": "Carlos", "phone": "(92) 98765-4321"}, {"name": "Fernandes"})
+
+    by_phone = await _search(client, admin, "/orders/clients/search", q="8765-43")
+    by_typo = await _search(client, admin, "/orders/clients/search", q="Fernandez")
+
+    assert [item["id"] for item in by_phone["items"]] == [phone_id]
+    assert [item["id"] for item in by_typo["items"]] == [name_id]
+
+
+async def test_equipments_search_with_and_without_client(db, client, admin):
+    first, second = await _clients(db, {"name": "Cliente A"}, {"name": "Cliente B"})
+    for client_id, serial_number in ((first, "ABC-1001"), (first, "XYZ-2002"), (second, "ABC-1003")):
+        await db.execute(insert(equipments_table).values(
+            client_id=client_id, type="Notebook", brand="Dell", serial_number=serial_number
+        ))
+    await db.commit()
+
+    everyone = await _search(client, admin, "/orders/equipments/search", q="abc-10")
+    of_client = await _search(client, admin, "/orders/equipments/search", q="abc-10", client_id=first)
+
+    assert sorted(item["serial_number"] for item in everyone["items"]) == ["ABC-1001", "ABC-1003"]
+    assert [item["serial_number"] for item in of_client["items"]] == ["ABC-1001"]
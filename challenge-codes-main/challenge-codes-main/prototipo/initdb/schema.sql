@@ -1,3 +1,8 @@
+-- O script pode ser reaplicado em bancos já em uso (IF NOT EXISTS e as
+-- migrações em blocos DO). Por isso todos os índices são criados com
+-- CONCURRENTLY, que não trava as escritas na tabela; o psql envia cada
+-- comando fora de um bloco de transação, como o CONCURRENTLY exige.
+
 -- =========================================
 -- Usuários (técnicos da empresa)
 -- =========================================
@@ -53,6 +58,31 @@ SELECT id, 'Notebook', 'Dell', 'Inspiron 15', 'SN123456789'
 FROM clients WHERE name = 'Kodigos'
 ON CONFLICT DO NOTHING;
 
+-- Equipamentos de um cliente (filtro client_id da listagem e da busca, ordem por id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_equipments_client_id_id
+    ON equipments (client_id, id);
+
+-- Busca (typeahead) de clientes e equipamentos: índices GiST de trigramas,
+-- que atendem ILIKE '%termo%' e a semelhança aproximada (<%) do pg_trgm e
+-- entregam as linhas já ordenadas pela distância (<<->), para a busca ler só
+-- as primeiras de cada ramo (utils/typeahead._candidates)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_name_trgm
+    ON clients USING GIST (name gist_trgm_ops(siglen=64));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_email_trgm
+    ON clients USING GIST (email gist_trgm_ops(siglen=64));
+-- Telefone só pelos dígitos (mesma expressão de utils/typeahead.phone_digits)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_phone_digits_trgm
+    ON clients USING GIST ((regexp_replace(phone, '\D', '', 'g')) gist_trgm_ops(siglen=64));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_equipments_serial_number_trgm
+    ON equipments USING GIST (serial_number gist_trgm_ops(siglen=64));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_equipments_brand_trgm
+    ON equipments USING GIST (brand gist_trgm_ops(siglen=64));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_equipments_model_trgm
+    ON equipments USING GIST (model gist_trgm_ops(siglen=64));
+
 -- =========================================
 -- Ordem de Serviço
 -- =========================================
@@ -63,11 +93,49 @@ CREATE TABLE IF NOT EXISTS service_orders (
     user_id INT NOT NULL REFERENCES users(id), -- técnico responsável
     title VARCHAR(150) NOT NULL,
     description TEXT,
+    activities_description TEXT,       -- descrição das atividades realizadas
     status VARCHAR(20) DEFAULT 'open', -- open, in_progress, closed
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Vetor de busca textual (título > descrição > atividades), mantido pelo banco
+ALTER TABLE service_orders ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(activities_description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_search_vector
+    ON service_orders USING GIN (search_vector);
+
+-- Índices para paginação por cursor (keyset) em (created_at, id) / (updated_at, id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_created_at_id
+    ON service_orders (created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_updated_at_id
+    ON service_orders (updated_at DESC, id DESC);
+
+-- Mesma chave combinada com os filtros de técnico, cliente, equipamento e status
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_user_created_at_id
+    ON service_orders (user_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_client_created_at_id
+    ON service_orders (client_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_equipment_created_at_id
+    ON service_orders (equipment_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_status_created_at_id
+    ON service_orders (status, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_status_updated_at_id
+    ON service_orders (status, updated_at DESC, id DESC);
+
+-- Ordens não encerradas (?status=open&status=in_progress), já na ordem da
+-- listagem. Índice parcial: só a minoria da tabela. O plano genérico dos
+-- prepared statements (status = $1) não pode usá-lo; nele um só status
+-- segue o índice (status, created_at, id) acima
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_service_orders_active_created_at_id
+    ON service_orders (created_at DESC, id DESC)
+    WHERE status IN ('open', 'in_progress');
+
 -- Ordem de serviço exemplo
 INSERT INTO service_orders (client_id, equipment_id, user_id, title, description, status)
 SELECT c.id, e.id, u.id, 
@@ -127,9 +195,30 @@ CREATE TABLE IF NOT EXISTS os_checklist_responses (
     service_order_id INT NOT NULL REFERENCES service_orders(id),
     checklist_item_id INT NOT NULL REFERENCES checklist_items(id),
     is_checked BOOLEAN NOT NULL,
-    responded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    responded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_os_checklist_responses_order_item UNIQUE (service_order_id, checklist_item_id)
 );
 
+-- As respostas de uma ordem (service_order_id = X) usam o índice da
+-- restrição uq_os_checklist_responses_order_item, que começa pela ordem
+
+-- Migração de bancos sem a restrição: mantém só a resposta mais recente de
+-- cada item (o salvamento antigo apagava e reinseria todas as respostas)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_os_checklist_responses_order_item'
+    ) THEN
+        DELETE FROM os_checklist_responses r
+        USING os_checklist_responses newer
+        WHERE newer.service_order_id = r.service_order_id
+          AND newer.checklist_item_id = r.checklist_item_id
+          AND newer.id > r.id;
+        ALTER TABLE os_checklist_responses
+            ADD CONSTRAINT uq_os_checklist_responses_order_item UNIQUE (service_order_id, checklist_item_id);
+    END IF;
+END $$;
+
 -- =========================================
 -- Fotos da OS
 -- =========================================
@@ -140,13 +229,69 @@ CREATE TABLE IF NOT EXISTS os_photos (
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Fotos das ordens (service_order_id IN (...)) já na ordem de exibição
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_os_photos_service_order_uploaded_at_id
+    ON os_photos (service_order_id, uploaded_at DESC, id DESC);
+
+-- Conteúdo das fotos endereçado pelo SHA-256: bytes iguais são guardados uma
+-- vez e compartilhados entre as fotos (ref_count); o arquivo é removido
+-- quando a última foto que o usa é excluída
+CREATE TABLE IF NOT EXISTS photo_blobs (
+    digest CHAR(64) PRIMARY KEY,       -- SHA-256 (hex) do conteúdo
+    filename TEXT NOT NULL,            -- <digest><ext>
+    size_bytes BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Fotos antigas (nome uuid) ficam com blob_digest nulo
+ALTER TABLE os_photos ADD COLUMN IF NOT EXISTS blob_digest CHAR(64) REFERENCES photo_blobs(digest);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_os_photos_blob_digest ON os_photos (blob_digest);
+
+-- Variantes redimensionadas das fotos, geradas após o upload
+CREATE TABLE IF NOT EXISTS os_photo_variants (
+    id SERIAL PRIMARY KEY,
+    photo_id INT NOT NULL REFERENCES os_photos(id) ON DELETE CASCADE,
+    variant VARCHAR(20) NOT NULL,      -- thumb, medium, thumb_webp, medium_webp
+    photo_url TEXT NOT NULL,
+    width INT,
+    height INT,
+    size_bytes INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (photo_id, variant)
+);
+
 
 -- Tabela de tokens de autenticação
 CREATE TABLE IF NOT EXISTS auth_tokens (
     id SERIAL PRIMARY KEY,
     user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    token TEXT UNIQUE NOT NULL, -- JWT ou UUID
+    jti_hash CHAR(64) UNIQUE NOT NULL, -- SHA-256 (hex) do jti do JWT
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    expires_at TIMESTAMP,       -- tempo de validade do token
+    expires_at TIMESTAMP,              -- tempo de validade do token
     is_revoked BOOLEAN DEFAULT FALSE
 );
+
+-- Migração de bancos que guardavam o JWT inteiro em auth_tokens.token.
+-- Os registros antigos são descartados (os usuários fazem login novamente).
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'auth_tokens' AND column_name = 'token'
+    ) THEN
+        DELETE FROM auth_tokens;
+        ALTER TABLE auth_tokens DROP COLUMN token;
+        ALTER TABLE auth_tokens ADD COLUMN jti_hash CHAR(64) UNIQUE NOT NULL;
+    END IF;
+END $$;
+
+-- Índices usados pela limpeza periódica de tokens expirados/revogados
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auth_tokens_expires_at
+    ON auth_tokens (expires_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auth_tokens_revoked
+    ON auth_tokens (id) WHERE is_revoked;
+
+-- Tokens de um usuário (ON DELETE CASCADE ao excluir o usuário)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auth_tokens_user_id
+    ON auth_tokens (user_id);